@@ -0,0 +1,86 @@
+"""
+Benchmark: uncached ORM auth graph (get_user_from_jwt_token) vs single
+round-trip Core loader (get_principal_from_jwt_token), the principal cache is
+cleared before every call so only the cold path is measured.
+
+Needs a database configured through settings (DB_*) and a live session
+token issued by /auth/login:
+
+    BENCH_TOKEN=<jwt> python -m benchmarks.bench_auth_loader [iterations]
+
+Reports per request: statements sent, wall time (ms) and python allocations
+(tracemalloc: allocated KiB and number of allocated blocks).
+"""
+import asyncio
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from sqlalchemy import event
+from models import async_session, engine
+from core.security import (
+    get_principal_from_jwt_token,
+    get_user_from_jwt_token,
+    invalidate_principal_cache,
+)
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, *args, **kwargs):
+        self.count += 1
+
+
+async def measure(name, loader, token, iterations):
+    counter = QueryCounter()
+    event.listen(engine.sync_engine, "before_cursor_execute", counter)
+    timings, queries, sizes, blocks = [], [], [], []
+    try:
+        for _ in range(iterations):
+            invalidate_principal_cache()
+            async with async_session() as db:
+                counter.count = 0
+                tracemalloc.start()
+                before = tracemalloc.take_snapshot()
+                started = time.perf_counter()
+                result = await loader(db, token)
+                elapsed = time.perf_counter() - started
+                after = tracemalloc.take_snapshot()
+                tracemalloc.stop()
+                if result is None:
+                    raise SystemExit(f"{name}: token did not resolve, check BENCH_TOKEN")
+                stats = after.compare_to(before, "filename")
+                sizes.append(sum(x.size_diff for x in stats if x.size_diff > 0) / 1024)
+                blocks.append(sum(x.count_diff for x in stats if x.count_diff > 0))
+                timings.append(elapsed * 1000)
+                queries.append(counter.count)
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", counter)
+
+    print(
+        f"{name:<10} queries={statistics.mean(queries):.1f} "
+        f"ms p50={statistics.median(timings):.2f} "
+        f"p95={sorted(timings)[int(len(timings) * 0.95) - 1]:.2f} "
+        f"alloc={statistics.mean(sizes):.1f}KiB blocks={statistics.mean(blocks):.0f}"
+    )
+
+
+async def run(iterations: int):
+    token = os.environ.get("BENCH_TOKEN")
+    if not token:
+        raise SystemExit("set BENCH_TOKEN to a valid session token")
+    # warm up connections and statement caches
+    async with async_session() as db:
+        await get_user_from_jwt_token(db, token)
+        await get_principal_from_jwt_token(db, token)
+
+    await measure("orm", get_user_from_jwt_token, token, iterations)
+    await measure("core", get_principal_from_jwt_token, token, iterations)
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(run(int(sys.argv[1]) if len(sys.argv) > 1 else 200))
@@ -0,0 +1,121 @@
+"""
+Benchmark: trigram user search (repository.auth.search_user).
+
+Seeds fixture users set-based inside postgres (emails end with
+@bench.local so they can be removed again), then runs a fixed list of
+queries and reports the latency per query. Run `python migrate.py` first so
+the pg_trgm indexes (m007 GIN, m009 GiST) exist. `explain` prints the plan
+of the exact query search_user sends; every column branch should be a KNN
+index scan on ix_user_<column>_trgm_gist that stops after `limit` rows.
+
+    python -m benchmarks.bench_user_search seed 1000000
+    python -m benchmarks.bench_user_search run [iterations]
+    python -m benchmarks.bench_user_search explain <q>
+    python -m benchmarks.bench_user_search drop
+"""
+import asyncio
+import statistics
+import sys
+import time
+from sqlalchemy import text
+from models import async_session, engine
+from repository.auth import search_user, search_user_query
+
+FIXTURE_DOMAIN = "bench.local"
+FIRST_NAMES = [
+    "Rafi", "Budi", "Siti", "Agus", "Dewi", "Andi", "Putri", "Rizky", "Ayu", "Dimas",
+    "Intan", "Fajar", "Nur", "Yusuf", "Lestari", "Hendra", "Maya", "Bayu", "Citra", "Eko",
+]
+LAST_NAMES = [
+    "Santoso", "Wijaya", "Saputra", "Pratama", "Hidayat", "Kurniawan", "Siregar", "Nasution",
+    "Halim", "Gunawan", "Setiawan", "Permana", "Utomo", "Wibowo", "Lubis", "Harahap",
+]
+QUERIES = ["rafi", "santoso", "dewi wij", "putri saputra", "0812345", "andi.hal", "xyzq", "budi"]
+
+
+async def seed(total: int, batch: int = 100000):
+    first = "ARRAY[" + ",".join(f"'{x}'" for x in FIRST_NAMES) + "]"
+    last = "ARRAY[" + ",".join(f"'{x}'" for x in LAST_NAMES) + "]"
+    done = 0
+    while done < total:
+        size = min(batch, total - done)
+        async with engine.begin() as conn:
+            await conn.execute(
+                text(
+                    f"""
+                    INSERT INTO "user" (
+                        id, created_by, updated_by, email, name, npwp, phone, address,
+                        face_id, password, first_login, birth_date, created_at, isact
+                    )
+                    SELECT
+                        gen_random_uuid()::text, 'bench', 'bench',
+                        lower(f) || '.' || lower(l) || '.' || n || '@{FIXTURE_DOMAIN}',
+                        f || ' ' || l,
+                        '-', '08' || lpad((n * 7919 % 1000000000)::text, 10, '0'), '-',
+                        '-', '-', 'false', '1990-01-01',
+                        now() - n * interval '1 second', true
+                    FROM (
+                        SELECT
+                            n,
+                            ({first})[1 + n % {len(FIRST_NAMES)}] AS f,
+                            ({last})[1 + (n / {len(FIRST_NAMES)}) % {len(LAST_NAMES)}] AS l
+                        FROM generate_series(:start, :stop) AS n
+                    ) s
+                    """
+                ),
+                {"start": done + 1, "stop": done + size},
+            )
+        done += size
+        print(f"seeded {done}/{total}")
+    async with engine.begin() as conn:
+        await conn.execute(text('ANALYZE "user"'))
+
+
+async def drop():
+    async with engine.begin() as conn:
+        result = await conn.execute(
+            text('DELETE FROM "user" WHERE email LIKE :pattern'),
+            {"pattern": f"%@{FIXTURE_DOMAIN}"},
+        )
+    print(f"deleted {result.rowcount} fixture users")
+
+
+async def explain(q: str, limit: int = 20):
+    async with async_session() as db:
+        # compiled by the connected asyncpg dialect, so % and \ are not escaped twice
+        await db.connection()
+        sql = search_user_query(q, limit).compile(
+            dialect=engine.dialect, compile_kwargs={"literal_binds": True}
+        )
+        result = await db.execute(text(f"EXPLAIN (ANALYZE, BUFFERS) {sql}"))
+        for row in result.all():
+            print(row[0])
+
+
+async def run(iterations: int):
+    async with async_session() as db:
+        await search_user(db, QUERIES[0])  # warm up
+        for q in QUERIES:
+            timings = []
+            for _ in range(iterations):
+                started = time.perf_counter()
+                rows = await search_user(db, q, limit=20)
+                timings.append((time.perf_counter() - started) * 1000)
+            print(
+                f"{q!r:<18} rows={len(rows):<3} "
+                f"ms p50={statistics.median(timings):.2f} "
+                f"p95={sorted(timings)[int(len(timings) * 0.95) - 1]:.2f}"
+            )
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "run"
+    if command == "seed":
+        asyncio.run(seed(int(sys.argv[2]) if len(sys.argv) > 2 else 1000000))
+    elif command == "drop":
+        asyncio.run(drop())
+    elif command == "explain":
+        asyncio.run(explain(sys.argv[2]))
+    else:
+        asyncio.run(run(int(sys.argv[2]) if len(sys.argv) > 2 else 50))
@@ -0,0 +1,148 @@
+"""
+Compiled authorization model.
+
+Every active permission id is a bit position. Each role's active grants in
+role_permission are packed into one integer (role bitset), a user's
+effective permissions are the OR of their role bitsets, and a check is a
+dict lookup plus one AND. The model is built with one query per worker and
+rebuilt lazily after invalidate_authorization_model(). Grants changed on
+another worker only reach this one through the catalog listener, so while
+it is disconnected the model is reloaded every CATALOG_FALLBACK_TTL seconds.
+"""
+import time
+from typing import Dict, Iterable, Optional, Tuple
+from sqlalchemy import and_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from models.Module import Module
+from models.Permission import Permission
+from models.RolePermission import RolePermission
+from settings import CATALOG_FALLBACK_TTL
+
+PermissionKey = Tuple[Optional[str], str]
+
+
+class AuthorizationModel:
+    __slots__ = ("role_bits", "permission_masks", "module_masks")
+
+    def __init__(
+        self,
+        role_bits: Dict[int, int],
+        permission_masks: Dict[PermissionKey, int],
+        module_masks: Dict[Optional[str], int],
+    ) -> None:
+        self.role_bits = role_bits
+        self.permission_masks = permission_masks
+        self.module_masks = module_masks
+
+    def bits_for_roles(self, role_ids: Iterable[int]) -> int:
+        bits = 0
+        for role_id in role_ids:
+            bits |= self.role_bits.get(role_id, 0)
+        return bits
+
+    def mask_of(self, module_name: Optional[str], permission_name: str) -> int:
+        """
+        0 when the permission does not exist (or is not active)
+        """
+        return self.permission_masks.get((module_name, permission_name), 0)
+
+    def allows(self, bits: int, module_name: Optional[str], permission_name: str) -> bool:
+        return bits & self.mask_of(module_name, permission_name) != 0
+
+    def can_grant_role(self, bits: int, role_id: int) -> bool:
+        """
+        a role may only be handed out by someone who holds all of its permissions
+        """
+        return self.role_bits.get(role_id, 0) & ~bits == 0
+
+    def module_bits(self, bits: int, module_name: Optional[str]) -> int:
+        """
+        the part of `bits` that belongs to one module
+        """
+        return bits & self.module_masks.get(module_name, 0)
+
+
+def compile_authorization_model(rows: Iterable[tuple]) -> AuthorizationModel:
+    """
+    rows: (permission_id, permission_name, module_name, role_id or None)
+    """
+    role_bits: Dict[int, int] = {}
+    permission_masks: Dict[PermissionKey, int] = {}
+    module_masks: Dict[Optional[str], int] = {}
+    for permission_id, permission_name, module_name, role_id in rows:
+        mask = 1 << permission_id
+        permission_masks[(module_name, permission_name)] = (
+            permission_masks.get((module_name, permission_name), 0) | mask
+        )
+        module_masks[module_name] = module_masks.get(module_name, 0) | mask
+        if role_id is not None:
+            role_bits[role_id] = role_bits.get(role_id, 0) | mask
+    return AuthorizationModel(role_bits, permission_masks, module_masks)
+
+
+async def load_authorization_model(db: AsyncSession) -> AuthorizationModel:
+    query = (
+        select(Permission.id, Permission.name, Module.name, RolePermission.c.role_id)
+        .outerjoin(Module, Module.id == Permission.module_id)
+        .outerjoin(
+            RolePermission,
+            and_(
+                RolePermission.c.permission_id == Permission.id,
+                RolePermission.c.isact == True,
+            ),
+        )
+        .filter(Permission.isact == True)
+    )
+    result = await db.execute(query)
+    return compile_authorization_model(result.all())
+
+
+_authorization_model: Optional[AuthorizationModel] = None
+_loaded_at = 0.0
+_generation = 0
+_listening = False
+
+
+def _current_model() -> Optional[AuthorizationModel]:
+    if _authorization_model is None:
+        return None
+    if not _listening and time.monotonic() - _loaded_at >= CATALOG_FALLBACK_TTL:
+        return None
+    return _authorization_model
+
+
+async def get_authorization_model(db: AsyncSession) -> AuthorizationModel:
+    global _authorization_model, _loaded_at
+    model = _current_model()
+    if model is not None:
+        return model
+    generation = _generation
+    model = await load_authorization_model(db)
+    # an invalidation while loading means the rows may predate the change
+    if generation == _generation:
+        _authorization_model = model
+        _loaded_at = time.monotonic()
+    return model
+
+
+def get_loaded_authorization_model() -> Optional[AuthorizationModel]:
+    return _current_model()
+
+
+def invalidate_authorization_model() -> None:
+    """
+    call after role_permission / permission / module changes
+    """
+    global _authorization_model, _generation
+    _generation += 1
+    _authorization_model = None
+
+
+def set_authorization_listening(listening: bool) -> None:
+    """
+    called by the catalog listener, the model is only kept indefinitely
+    while change notifications can reach this worker
+    """
+    global _listening
+    _listening = listening
+    invalidate_authorization_model()
@@ -0,0 +1,125 @@
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class TTLCache:
+    """
+    Bounded in-process LRU cache with a per-entry time to live.
+
+    Entries can carry a tag (for example a user id) so every entry that
+    belongs to the tag can be dropped in one call. The cache also keeps
+    hit/miss counters and the total time spent loading on a miss, so the
+    saved round-trip time can be estimated as hits * avg_load_ms.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 1024,
+        ttl: float = 5.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._tags: Dict[Hashable, set] = {}
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.load_seconds = 0.0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at, tag = entry
+            if expires_at <= self._clock():
+                self._remove(key)
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(
+        self,
+        key: Hashable,
+        value: Any,
+        tag: Optional[Hashable] = None,
+        ttl: Optional[float] = None,
+    ) -> None:
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0 or self.maxsize <= 0:
+            return
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (value, self._clock() + ttl, tag)
+            if tag is not None:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._data) > self.maxsize:
+                oldest = next(iter(self._data))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def record_load(self, seconds: float) -> None:
+        """
+        record how long a miss took to load from the source of truth
+        """
+        with self._lock:
+            self.load_seconds += seconds
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+                self.invalidations += 1
+
+    def delete_tag(self, tag: Hashable) -> None:
+        with self._lock:
+            for key in list(self._tags.get(tag, ())):
+                self._remove(key)
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self.invalidations += len(self._data)
+            self._data.clear()
+            self._tags.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            avg_load_ms = (
+                self.load_seconds * 1000 / self.misses if self.misses else 0.0
+            )
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "avg_load_ms": avg_load_ms,
+                "saved_ms": self.hits * avg_load_ms,
+            }
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def _remove(self, key: Hashable) -> None:
+        _, _, tag = self._data.pop(key)
+        if tag is not None:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
@@ -0,0 +1,236 @@
+"""
+Read-mostly catalog cache for role, module, permission and menu.
+
+Every worker loads each catalog table once (one flat query) and keeps the
+rows in memory. A dedicated asyncpg connection LISTENs on CATALOG_CHANNEL;
+the triggers from migration m005 send the name of the changed table, and
+only that table (plus the caches derived from it) is dropped and reloaded
+on the next read. While the listener is disconnected nothing is cached, so
+a missed notification can never leave a worker with stale data.
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+import asyncpg
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import Select
+from core.authorization import invalidate_authorization_model, set_authorization_listening
+from core.logging_config import logger
+from core.menu_cache import invalidate_menu_cache, set_menu_listening
+from core.security import invalidate_principal_cache
+from models.Menu import Menu
+from models.Module import Module
+from models.Permission import Permission
+from models.Role import Role
+from settings import CATALOG_LISTEN_RECONNECT_SECONDS
+
+CATALOG_CHANNEL = "catalog_changed"
+
+
+def _role_query() -> Select:
+    return select(
+        Role.id,
+        Role.name,
+        Role.description,
+        Role.group,
+        Role.access_feature,
+        Role.created_at,
+        Role.updated_at,
+        Role.isact,
+    ).order_by(Role.id.asc())
+
+
+def _module_query() -> Select:
+    return select(Module.id, Module.name, Module.isact, Module.order_id).order_by(Module.id.asc())
+
+
+def _permission_query() -> Select:
+    return (
+        select(
+            Permission.id,
+            Permission.name,
+            Permission.module_id,
+            Module.name.label("module"),
+            Permission.isact,
+        )
+        .outerjoin(Module, Module.id == Permission.module_id)
+        .order_by(Permission.id.asc())
+    )
+
+
+def _menu_query() -> Select:
+    # only active menus, ordered the way build_menu_tree expects
+    return (
+        select(
+            Menu.id,
+            Menu.parent_id,
+            Menu.name,
+            Menu.icon,
+            Menu.url,
+            Menu.permission_id,
+            Menu.is_has_child,
+            Menu.is_show,
+            Menu.order_id,
+        )
+        .where(Menu.isact == True)
+        .order_by(func.coalesce(Menu.order_id, 0).asc(), Menu.id.asc())
+    )
+
+
+CATALOG_QUERIES: Dict[str, Callable[[], Select]] = {
+    "role": _role_query,
+    "module": _module_query,
+    "permission": _permission_query,
+    "menu": _menu_query,
+}
+
+# table named in a notification -> catalog entries that depend on it
+CATALOG_DEPENDENCIES: Dict[str, Tuple[str, ...]] = {
+    "role": ("role",),
+    "module": ("module", "permission"),
+    "permission": ("permission",),
+    "menu": ("menu",),
+    "role_permission": (),
+}
+
+
+class CatalogCache:
+    def __init__(self) -> None:
+        self._rows: Dict[str, Tuple[Any, ...]] = {}
+        self._versions: Dict[str, int] = {table: 0 for table in CATALOG_QUERIES}
+        # off until the listener is connected (see CatalogListener)
+        self.enabled = False
+        self.loads = 0
+        self.hits = 0
+        self.invalidations = 0
+
+    async def get(self, db: AsyncSession, table: str) -> Tuple[Any, ...]:
+        rows = self._rows.get(table)
+        if rows is not None:
+            self.hits += 1
+            return rows
+        version = self._versions[table]
+        result = await db.execute(CATALOG_QUERIES[table]())
+        rows = tuple(result.all())
+        self.loads += 1
+        # an invalidation arrived while loading, serve the rows but don't keep them
+        if self.enabled and self._versions[table] == version:
+            self._rows[table] = rows
+        return rows
+
+    def invalidate(self, table: Optional[str] = None) -> None:
+        tables = list(CATALOG_QUERIES) if table is None else [table]
+        for name in tables:
+            self._versions[name] += 1
+            self._rows.pop(name, None)
+        self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "tables": sorted(self._rows),
+            "loads": self.loads,
+            "hits": self.hits,
+            "invalidations": self.invalidations,
+        }
+
+
+catalog = CatalogCache()
+
+
+async def get_catalog_rows(db: AsyncSession, table: str) -> Tuple[Any, ...]:
+    return await catalog.get(db, table)
+
+
+def on_catalog_changed(table: str) -> None:
+    """
+    drop the catalog entries and derived caches that depend on `table`
+    """
+    if table not in CATALOG_DEPENDENCIES:
+        logger.warning(f"Catalog notification for unknown table {table}")
+        return
+    for name in CATALOG_DEPENDENCIES[table]:
+        catalog.invalidate(name)
+    if table in ("module", "permission", "role_permission"):
+        invalidate_authorization_model()
+        invalidate_principal_cache()
+    if table in ("module", "permission", "role_permission", "menu"):
+        invalidate_menu_cache()
+
+
+class CatalogListener:
+    """
+    one asyncpg connection per worker, LISTEN on CATALOG_CHANNEL and
+    reconnect forever; the catalog is only cached while connected.
+    on_connect runs after every (re)connect, once the caches are enabled,
+    ex: to warm the menu cache.
+    """
+
+    def __init__(
+        self,
+        dsn: str,
+        channel: str = CATALOG_CHANNEL,
+        reconnect_seconds: float = CATALOG_LISTEN_RECONNECT_SECONDS,
+        on_connect: Optional[Callable[[], Awaitable[Any]]] = None,
+    ) -> None:
+        self.dsn = dsn
+        self.channel = channel
+        self.reconnect_seconds = reconnect_seconds
+        self.on_connect = on_connect
+        self._connection: Optional[asyncpg.Connection] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def _notify(self, connection, pid, channel, payload) -> None:
+        on_catalog_changed(payload)
+
+    async def _listen_once(self) -> None:
+        lost = asyncio.Event()
+        self._connection = await asyncpg.connect(self.dsn)
+        try:
+            self._connection.add_termination_listener(lambda connection: lost.set())
+            await self._connection.add_listener(self.channel, self._notify)
+            # anything may have changed while we were not listening
+            catalog.invalidate()
+            catalog.enabled = True
+            set_authorization_listening(True)
+            set_menu_listening(True)
+            logger.info(f"Catalog listener connected on {self.channel}")
+            if self.on_connect is not None:
+                try:
+                    await self.on_connect()
+                except Exception as e:
+                    # the caches fill on demand, keep listening
+                    logger.warning(f"Catalog listener on_connect failed: {e}")
+            await lost.wait()
+        finally:
+            catalog.enabled = False
+            catalog.invalidate()
+            set_authorization_listening(False)
+            set_menu_listening(False)
+            if not self._connection.is_closed():
+                await self._connection.close()
+            self._connection = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self._listen_once()
+                logger.warning("Catalog listener connection lost")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Catalog listener failed: {e}")
+            await asyncio.sleep(self.reconnect_seconds)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -0,0 +1,97 @@
+"""
+Counting strategies for list metadata.
+
+- exact: count(*) of the filtered query
+- estimated: planner estimate, pg_class.reltuples of a relation that holds
+  exactly the listed rows (a table, or a partial index with the same
+  predicate) or the EXPLAIN row estimate of the query; only used without a user filter
+  (search terms make estimates meaningless), otherwise exact
+- cached: exact, kept per filter for LIST_COUNT_CACHE_TTL seconds
+
+count_rows returns the number and the strategy that actually produced it.
+"""
+import json
+import time
+from typing import Hashable, Optional, Tuple
+from sqlalchemy import func, select, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import Select
+from core.cache import TTLCache
+from settings import LIST_COUNT_STRATEGY, LIST_COUNT_CACHE_TTL
+
+EXACT = "exact"
+ESTIMATED = "estimated"
+CACHED = "cached"
+COUNT_STRATEGIES = [EXACT, ESTIMATED, CACHED]
+
+count_cache = TTLCache(maxsize=1024, ttl=LIST_COUNT_CACHE_TTL)
+
+
+async def exact_count(db: AsyncSession, query: Select) -> int:
+    result = await db.execute(select(func.count()).select_from(query.order_by(None).subquery()))
+    return result.scalar()
+
+
+async def table_estimate(db: AsyncSession, table: str) -> Optional[int]:
+    """
+    reltuples of a table or index, None when it was never analyzed
+    """
+    result = await db.execute(
+        text("SELECT reltuples FROM pg_class WHERE oid = CAST(:table AS regclass)"),
+        {"table": table},
+    )
+    reltuples = result.scalar()
+    if reltuples is None or reltuples < 0:
+        return None
+    return int(reltuples)
+
+
+async def explain_estimate(db: AsyncSession, query: Select) -> int:
+    sql = query.order_by(None).compile(
+        dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}
+    )
+    result = await db.execute(text(f"EXPLAIN (FORMAT JSON) {sql}"))
+    plan = result.scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+async def count_rows(
+    db: AsyncSession,
+    query: Select,
+    strategy: Optional[str] = None,
+    cache_key: Optional[Hashable] = None,
+    filtered: bool = False,
+    table: Optional[str] = None,
+) -> Tuple[int, str]:
+    """
+    query: the row query without limit/offset.
+    filtered: the query carries a user supplied filter (search), no estimate.
+    table: table or partial index whose rows are exactly the query's rows,
+    its reltuples is enough.
+    """
+    strategy = strategy or LIST_COUNT_STRATEGY
+    if strategy not in COUNT_STRATEGIES:
+        raise ValueError(f"count strategy should be one of {', '.join(COUNT_STRATEGIES)}")
+
+    if strategy == ESTIMATED and not filtered:
+        if table is not None:
+            estimate = await table_estimate(db, table)
+            if estimate is not None:
+                return estimate, ESTIMATED
+        return await explain_estimate(db, query), ESTIMATED
+
+    if strategy == CACHED and cache_key is not None:
+        num_data = count_cache.get(cache_key)
+        if num_data is not None:
+            return num_data, CACHED
+        started = time.perf_counter()
+        num_data = await exact_count(db, query)
+        count_cache.set(cache_key, num_data)
+        count_cache.record_load(time.perf_counter() - started)
+        return num_data, CACHED
+
+    return await exact_count(db, query), EXACT
+
@@ -0,0 +1,108 @@
+import asyncio
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from threading import Lock
+from typing import Any, Callable, Dict, Optional
+
+
+class ExecutorOverloaded(Exception):
+    """
+    raised when a BoundedExecutor already holds max_pending jobs
+    """
+
+
+class BoundedExecutor:
+    """
+    Size limited thread/process pool for blocking work called from async code.
+
+    At most `max_workers` jobs run at the same time and at most `max_pending`
+    jobs (running + queued) are accepted, anything above that is rejected
+    right away with ExecutorOverloaded instead of piling up behind the pool.
+    The pool is created lazily so importing this module never forks.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_workers: int,
+        max_pending: int,
+        kind: str = "thread",
+    ) -> None:
+        if kind not in ["thread", "process"]:
+            raise ValueError("kind should thread or process")
+        self.name = name
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.kind = kind
+        self._executor: Optional[Executor] = None
+        self._lock = Lock()
+        self.pending = 0
+        self.max_pending_seen = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.busy_seconds = 0.0
+
+    @property
+    def executor(self) -> Executor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    if self.kind == "process":
+                        self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+                    else:
+                        self._executor = ThreadPoolExecutor(
+                            max_workers=self.max_workers, thread_name_prefix=self.name
+                        )
+        return self._executor
+
+    async def run(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                raise ExecutorOverloaded(
+                    f"{self.name} executor is busy ({self.pending} pending), try again later"
+                )
+            self.pending += 1
+            self.submitted += 1
+            self.max_pending_seen = max(self.max_pending_seen, self.pending)
+        started = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(self.executor, partial(fn, *args, **kwargs))
+            with self._lock:
+                self.completed += 1
+            return result
+        except Exception:
+            with self._lock:
+                self.failed += 1
+            raise
+        finally:
+            with self._lock:
+                self.pending -= 1
+                self.busy_seconds += time.perf_counter() - started
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            finished = self.completed + self.failed
+            return {
+                "name": self.name,
+                "kind": self.kind,
+                "max_workers": self.max_workers,
+                "max_pending": self.max_pending,
+                "pending": self.pending,
+                "max_pending_seen": self.max_pending_seen,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "avg_ms": self.busy_seconds * 1000 / finished if finished else 0.0,
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait)
+                self._executor = None
@@ -3,42 +3,33 @@ from io import BytesIO
 import os
 from re import search
 from shutil import move, copyfile
-from typing import Optional, Tuple, List
+from typing import Mapping, Optional, Tuple, List
 from datetime import datetime
+from email.utils import format_datetime
+from urllib.parse import quote
 from fastapi import BackgroundTasks, Response, UploadFile
 from fastapi.responses import FileResponse, StreamingResponse
-from minio.commonconfig import CopySource
-from minio import Minio, S3Error
-from minio.datatypes import Object
 # from core.img_converter import img_to_base64
 from settings import (
-    FILE_STORAGE_ADAPTER,
     LOCAL_PATH,
     MINIO_BUCKET,
-    MINIO_ENPOINT,
-    MINIO_ACCESS_KEY,
-    MINIO_SECRET_KEY,
-    MINIO_SECURE,
-    BACKEND_URL,
+    STORAGE_BATCH_CONCURRENCY,
     TZ,
 )
 from datetime import timedelta
-import io
 from zipfile import ZipFile
 import re
-from core.security import generate_hash_lisensi
+from core.security import generate_hash_lisensi_async
+from core.logging_config import logger
+from core.storage import BatchResult, StorageBackend, get_storage, minio_storage
 import asyncio
 
 # Download File Return Bytes Stream
 
-def download_file_to_bytes(
+async def download_file_to_bytes(
     path:str,
-):
-    response = minio_client.get_object(MINIO_BUCKET, path)
-    image_data = response.read()
-    response.close()
-    response.release_conn()
-    return image_data
+) -> Optional[bytes]:
+    return await get_storage().get_bytes(path)
     
 
 # Using Local file system
@@ -137,66 +128,34 @@ def local_to_local(source: str, destination: str, folder: str = ""):
     move(source, full_path)
 
 
-# Using Minio
-minio_client = Minio(
-    MINIO_ENPOINT,
-    access_key=MINIO_ACCESS_KEY,
-    secret_key=MINIO_SECRET_KEY,
-    secure=MINIO_SECURE,
-)
-
-
-def is_file_exists_in_minio(bucket: str, filepath: str) -> bool:
-    try:
-        minio_client.get_object(bucket_name=bucket, object_name=filepath)
-        return True
-    except S3Error as e:
-        return False
+# Using Minio (core.storage.MinioStorage, calls run off the event loop)
+async def is_file_exists_in_minio(bucket: str, filepath: str) -> bool:
+    return await minio_storage(bucket).exists(filepath)
 
 
-def upload_file_from_path_to_minio(
+async def upload_file_from_path_to_minio(
         local_path: str, 
         minio_path: str,
         bucket: Optional[str]=MINIO_BUCKET, 
         ):
-    found = minio_client.bucket_exists(bucket_name=bucket)
-    if not found:
-        minio_client.make_bucket(bucket_name=bucket)
-
-    minio_client.fput_object(
-        bucket_name=bucket, object_name=minio_path, file_path=local_path
-    )
+    await minio_storage(bucket).put_file(minio_path, local_path)
 
 
-def download_file_to_path_from_minio(
+async def download_file_to_path_from_minio(
     bucket: str, minio_path: str, local_path: str
-) -> Optional[Object]:
-    try:
-        x = minio_client.fget_object(
-            bucket_name=bucket, file_path=local_path, object_name=minio_path
-        )
-    except S3Error as e:
-        return None
-    return x
+) -> Optional[str]:
+    found = await minio_storage(bucket).get_file(minio_path, local_path)
+    return local_path if found else None
 
 
 async def upload_file_to_minio(upload_file: UploadFile, bucket: str, path: str) -> str:
     """
-    return minio_path
+    return minio_path, streamed in multipart parts (no copy in ./tmp)
     """
-    now = datetime.now().strftime("%Y-%m-%d %H-%M-%S")
-    relative_path, full_path = await upload_file_to_tmp(
-        upload_file=upload_file, filename=f"{now}.bak"
+    result = await minio_storage(bucket).put_stream(
+        path, upload_file, content_type=upload_file.content_type
     )
-    try:
-        upload_file_from_path_to_minio(
-            bucket=bucket, local_path=full_path, minio_path=path
-        )
-        delete_file_in_tmp(path=relative_path)
-    except Exception as e:
-        delete_file_in_tmp(path=relative_path)
-        raise Exception(e)
-    return path
+    return result.path
 
 # async def upload_zip(zip_file: UploadFile, username: str):
 #     try:
@@ -236,38 +195,64 @@ async def upload_file_to_minio(upload_file: UploadFile, bucket: str, path: str)
 
 
 
+class ZipMemberSource:
+    """
+    async read(size) over one member of an open ZipFile for put_stream,
+    reads run off the event loop. The member bytes are kept for the licence
+    hash, never the whole archive.
+    """
+
+    def __init__(self, archive: ZipFile, name: str) -> None:
+        self.archive = archive
+        self.name = name
+        self.member = None
+        self.chunks: List[bytes] = []
+
+    async def read(self, size: int = -1) -> bytes:
+        if self.member is None:
+            self.member = await asyncio.to_thread(self.archive.open, self.name)
+        data = await asyncio.to_thread(self.member.read, size)
+        self.chunks.append(data)
+        return data
+
+    def content(self) -> bytes:
+        return b"".join(self.chunks)
+
+    def close(self) -> None:
+        if self.member is not None:
+            self.member.close()
+
+
 async def upload_zip(zip_file: UploadFile, username: str):
     try:
-        data_return = []
-        zip_contents = await zip_file.read()
-    
-        with ZipFile(io.BytesIO(zip_contents)) as zip:
+        semaphore = asyncio.Semaphore(STORAGE_BATCH_CONCURRENCY)
+        await zip_file.seek(0)
+        # the zip is read by offset from the spooled upload, not loaded whole
+        archive = await asyncio.to_thread(ZipFile, zip_file.file)
+        with archive as zip:
             zip_file_names = zip.namelist()
-            
+
             async def process_file(name):
-                object_return = {}
-                with zip.open(name) as file:
-                    file_content = file.read()
+                async with semaphore:
+                    object_return = {}
                     now = datetime.now().strftime("%Y-%m-%d%H-%M-%S")
                     file_path = f'data/{username}{now}{name}'
-                    
-                    # Streaming langsung ke MinIO
-                    file_stream = BytesIO(file_content)
-                    file_size = len(file_content)
-                    
-                    minio_client.put_object(
-                        MINIO_BUCKET,
-                        file_path,
-                        file_stream,
-                        file_size
-                    )
-                    
+
+                    # Streaming langsung ke storage
+                    source = ZipMemberSource(zip, name)
+                    try:
+                        await get_storage().put_stream(file_path, source)
+                    finally:
+                        source.close()
+
                     match = re.search(r'\((\d+)\)\.lic', name)
                     object_return['file_name'] = name
-                    object_return['lisensi_hash'] = generate_hash_lisensi(str(file_content))
+                    object_return['lisensi_hash'] = await generate_hash_lisensi_async(
+                        str(source.content())
+                    )
                     object_return['file_path'] = file_path
                     object_return['file_maping'] = match.group(1) if match else None
-                return object_return
+                    return object_return
 
             # Proses file secara asinkron
             tasks = [asyncio.create_task(process_file(name)) for name in zip_file_names]
@@ -283,15 +268,10 @@ async def upload_file_to_minio_directly(upload_file: UploadFile, bucket: str, pa
     Upload directly to MinIO without saving to temporary storage.
     """
     try:
-        # Use the file directly for upload
-        file_content = await upload_file.read()
-        file_size = len(file_content)
-        file_obj = io.BytesIO(file_content)
-        minio_client.put_object(
-            bucket_name=bucket,
-            object_name=path,
-            data=file_obj,
-            length=file_size,  # Pass the size of the file
+        # Stream the file part by part, never the whole body in memory
+        await minio_storage(bucket).put_stream(
+            path,
+            upload_file,
             content_type=upload_file.content_type  # Optionally set the content type
         )
         
@@ -301,238 +281,296 @@ async def upload_file_to_minio_directly(upload_file: UploadFile, bucket: str, pa
     
     return path
 
-def download_file_from_minio(
+def parse_range(range_header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    (start, end) inclusive of a single `bytes=` range, None when the whole
+    file should be sent (no header, multiple ranges, other units).
+    ValueError when the range can not be satisfied.
+    """
+    if not range_header or not range_header.startswith("bytes=") or "," in range_header:
+        return None
+    start, _, end = range_header[len("bytes="):].strip().partition("-")
+    try:
+        if start == "":
+            # bytes=-500: the last 500 bytes
+            suffix = int(end)
+            if suffix <= 0 or size == 0:
+                raise ValueError("Range tidak valid")
+            return (max(size - suffix, 0), size - 1)
+        first = int(start)
+        last = int(end) if end != "" else size - 1
+    except ValueError:
+        raise ValueError("Range tidak valid")
+    if first >= size or last < first:
+        raise ValueError("Range tidak valid")
+    return (first, min(last, size - 1))
+
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    tags = [x.strip().removeprefix("W/").strip('"') for x in header.split(",")]
+    return etag in tags
+
+
+def content_disposition(filename: str, inline: bool = False) -> str:
+    kind = "inline" if inline else "attachment"
+    quoted = quote(filename)
+    if quoted != filename:
+        return f"{kind}; filename*=utf-8''{quoted}"
+    return f'{kind}; filename="{filename}"'
+
+
+async def stream_file_response(
+    path: str,
+    headers: Optional[Mapping[str, str]] = None,
+    filename: Optional[str] = None,
+    media_type: Optional[str] = None,
+    inline: bool = False,
+    storage: Optional[StorageBackend] = None,
+) -> Response:
+    """
+    proxy the object as a stream from the storage, honours Range / If-Range
+    (206) and If-None-Match (304). `headers` are the request headers.
+    """
+    storage = storage or get_storage()
+    headers = headers or {}
+    # never from the stat cache, size and etag go out as headers
+    info = await storage.stat(path, cached=False)
+    if info is None:
+        return Response(content="File not found", status_code=404)
+
+    etag = f'"{info.etag}"'
+    response_headers = {
+        "Accept-Ranges": "bytes",
+        "ETag": etag,
+        "Content-Disposition": content_disposition(filename or path.split("/")[-1], inline),
+    }
+    if info.last_modified is not None:
+        response_headers["Last-Modified"] = format_datetime(info.last_modified, usegmt=True)
+    if etag_matches(headers.get("if-none-match"), info.etag):
+        return Response(status_code=304, headers=response_headers)
+
+    byte_range = None
+    if_range = headers.get("if-range")
+    if if_range is None or etag_matches(if_range, info.etag):
+        try:
+            byte_range = parse_range(headers.get("range"), info.size)
+        except ValueError:
+            response_headers["Content-Range"] = f"bytes */{info.size}"
+            return Response(status_code=416, headers=response_headers)
+
+    status_code = 200
+    offset, length = 0, info.size
+    if byte_range is not None:
+        status_code = 206
+        offset, length = byte_range[0], byte_range[1] - byte_range[0] + 1
+        response_headers["Content-Range"] = f"bytes {byte_range[0]}-{byte_range[1]}/{info.size}"
+    response_headers["Content-Length"] = str(length)
+
+    try:
+        # pinned to the etag we answered with, a concurrent overwrite fails here
+        chunks = await storage.open_range(path, offset=offset, length=length, etag=info.etag)
+    except FileNotFoundError:
+        return Response(content="File not found", status_code=404)
+    except ValueError as e:
+        # overwritten between stat and open, the client simply retries
+        return Response(content=str(e), status_code=409)
+    return StreamingResponse(
+        chunks,
+        status_code=status_code,
+        headers=response_headers,
+        media_type=media_type or info.content_type,
+    )
+
+
+async def download_file_from_minio(
     bucket: str,
     minio_path: str,
     filename: Optional[str] = None,
     background_tasks: Optional[BackgroundTasks] = None,
-    media_type: str = "application/octet-stream",
-) -> Optional[FileResponse]:
+    media_type: Optional[str] = None,
+    headers: Optional[Mapping[str, str]] = None,
+) -> Optional[Response]:
     """
-    download file from minio then return fastapi.responses.FileResponse or None
+    stream the file from minio (Range aware) or None when it does not exist,
+    background_tasks is not needed anymore (no temp file), kept for callers
     """
-    if filename == None:
-        # get filename from minio_path if filename = None
-        if search(r"\/", minio_path) != None:
-            # there is / in minio_path
-            # example: folder/file.txt => file.txt
-            filename = minio_path.split("/")[-1]
-        else:
-            # there is no / in minio_path
-            filename = minio_path
-
-    # download to tmp folder
-    download_path = f"./tmp/{filename}"
-    file_object = download_file_to_path_from_minio(
-        bucket=bucket, local_path=download_path, minio_path=minio_path
+    response = await stream_file_response(
+        minio_path,
+        headers=headers,
+        filename=filename,
+        media_type=media_type,
+        storage=minio_storage(bucket),
     )
-    if file_object != None:
-        if background_tasks != None:
-            background_tasks.add_task(delete_file_in_tmp, filename)
-        return FileResponse(
-            path=download_path, media_type=media_type, filename=filename
-        )
-    else:
+    if response.status_code == 404:
         return None
+    return response
 
 
-def preview_file_from_minio(bucket: str,
+async def preview_file_from_minio(bucket: str,
                             filepath: str,
-                            media_type: str = "application/octet-stream"):
+                            media_type: Optional[str] = None,
+                            headers: Optional[Mapping[str, str]] = None):
     try:
-        file_stream = minio_client.get_object(bucket, filepath)
-        return StreamingResponse(BytesIO(file_stream.read()), media_type=media_type)
+        return await stream_file_response(
+            filepath,
+            headers=headers,
+            media_type=media_type,
+            inline=True,
+            storage=minio_storage(bucket),
+        )
     except Exception as e:
         return Response(content=str(e), status_code=500)
 
 
-def delete_file_from_minio(bucket: str, filename: str):
-    minio_client.remove_object(bucket_name=bucket, object_name=filename)
+async def delete_file_from_minio(bucket: str, filename: str):
+    await minio_storage(bucket).delete(filename)
 
 
-def move_file_minio(bucket: str, source: str, destination: str):
-    now = datetime.now().strftime("%Y%m%d%H%M%S%s")
-    download_file_to_path_from_minio(
-        bucket=bucket, minio_path=source, local_path=f"./tmp/{now}.bak"
-    )
-    upload_file_from_path_to_minio(
-        bucket=bucket, local_path=f"./tmp/{now}.bak", minio_path=destination
-    )
-    delete_file_from_minio(bucket=bucket, filename=source)
+async def move_file_minio(bucket: str, source: str, destination: str):
+    # copy_object + delete, nothing is downloaded
+    await minio_storage(bucket).move(source, destination)
 
 
-def remove_bucket_in_minio(bucket: str):
-    found = minio_client.bucket_exists(bucket_name=bucket)
-    if not found:
-        return
-    all_files_in_bucket = minio_client.list_objects(bucket_name=bucket, recursive=True)
-    all_objects_name_in_bucket = [x.object_name for x in all_files_in_bucket]
-    for item in all_objects_name_in_bucket:
-        minio_client.remove_object(bucket_name=bucket, object_name=item)
-    minio_client.remove_bucket(bucket_name=bucket)
+async def remove_bucket_in_minio(bucket: str):
+    await minio_storage(bucket).remove_bucket()
 
 
-def minio_url_from_path(filepath: str):
+async def minio_url_from_path(filepath: str):
     try:
-        file = minio_client.get_presigned_url(
-            method="GET",
-            bucket_name=MINIO_BUCKET,
-            object_name=f"data/{filepath}",
-            expires=timedelta(hours=1)
-        )
-        return file
+        return await minio_storage().url(f"data/{filepath}", expires=timedelta(hours=1))
     except Exception as e:
         return None
 
 
-# Abstraction for upload and download file
+# Abstraction for upload and download file (backend: core.storage.get_storage)
 async def upload_file(upload_file: UploadFile, path: str) -> str:
-    print('Start upload file in backgorund')
-    print(FILE_STORAGE_ADAPTER)
-    if FILE_STORAGE_ADAPTER == "local":
-        path = await upload_file_to_local(
-            upload_file=upload_file, folder=LOCAL_PATH, path=f"{path}"
-        )
-    elif FILE_STORAGE_ADAPTER == "minio":
-        path = await upload_file_to_minio(
-            upload_file=upload_file, bucket=MINIO_BUCKET, path=path
-        )
-    print(f'Success with {path}')
-    return path
+    storage = get_storage()
+    logger.info(f"Start upload file with {storage.name}")
+    result = await storage.put_stream(path, upload_file, content_type=upload_file.content_type)
+    logger.info(f"Success with {result.path} ({result.size} bytes, sha256 {result.sha256})")
+    return result.path
 
 
-def download_file(
+async def download_file(
     path: str,
     filename: Optional[str] = None,
     background_tasks: Optional[BackgroundTasks] = None,
-    media_type: str = "application/octet-stream",
-) -> Optional[FileResponse]:
-    if FILE_STORAGE_ADAPTER == "local":
-        file_response = download_file_from_local(
-            folder=LOCAL_PATH, path=path, filename=filename, media_type=media_type
-        )
-    elif FILE_STORAGE_ADAPTER == "minio":
-        file_response = download_file_from_minio(
-            bucket=MINIO_BUCKET,
-            minio_path=path,
-            filename=filename,
-            media_type=media_type,
-            background_tasks=background_tasks,
-        )
-    return file_response
+    media_type: Optional[str] = None,
+    headers: Optional[Mapping[str, str]] = None,
+) -> Optional[Response]:
+    response = await stream_file_response(
+        path, headers=headers, filename=filename, media_type=media_type
+    )
+    if response.status_code == 404:
+        return None
+    return response
 
 
-def is_file_exists(path: str) -> bool:
-    is_exists = False
-    if FILE_STORAGE_ADAPTER == "local":
-        is_exists = is_file_exists_in_local(folder=LOCAL_PATH, path=path)
-    elif FILE_STORAGE_ADAPTER == "minio":
-        is_exists = is_file_exists_in_minio(bucket=MINIO_BUCKET, filepath=path)
-    return is_exists
+async def is_file_exists(path: str) -> bool:
+    return await get_storage().exists(path)
 
 
-def move_file(source: str, destination: str):
-    if FILE_STORAGE_ADAPTER == "local":
-        move_file_in_local(folder=LOCAL_PATH, source=source, destination=destination)
-    elif FILE_STORAGE_ADAPTER == "minio":
-        move_file_minio(bucket=MINIO_BUCKET, source=source, destination=destination)
+async def stat_files(list_path: List[str]) -> dict:
+    """
+    path -> {"size", "etag", "content_type"} or None when the file does not
+    exist, one HEAD per path (all at once), nothing is downloaded
+    """
+    infos = await get_storage().stat_many(list_path)
+    return {
+        path: None if info is None else {
+            "size": info.size,
+            "etag": info.etag,
+            "content_type": info.content_type,
+        }
+        for path, info in infos.items()
+    }
+
 
+async def move_file(source: str, destination: str):
+    await get_storage().move(source, destination)
 
-def delete_file(path: str):
-    if FILE_STORAGE_ADAPTER == "local":
-        delete_file_in_local(folder=LOCAL_PATH, path=path)
-    elif FILE_STORAGE_ADAPTER == "minio":
-        delete_file_from_minio(bucket=MINIO_BUCKET, filename=path)
 
+async def delete_file(path: str):
+    await get_storage().delete(path)
 
-def local_to_adapter(local_source: str, destination: str):
-    if FILE_STORAGE_ADAPTER == "local":
+
+async def copy_file(source: str, destination: str):
+    await get_storage().copy(source, destination)
+
+
+async def move_files(pairs: List[Tuple[str, str]]) -> BatchResult:
+    """
+    pairs: (source, destination)
+    """
+    return await get_storage().move_many(pairs)
+
+
+async def delete_files(list_path: List[str]) -> BatchResult:
+    return await get_storage().delete_many(list_path)
+
+
+async def move_folder(source: str, destination: str) -> BatchResult:
+    """
+    move every file below folder `source` to folder `destination`
+    """
+    return await get_storage().move_prefix(
+        source.rstrip("/") + "/", destination.rstrip("/") + "/"
+    )
+
+
+async def local_to_adapter(local_source: str, destination: str):
+    storage = get_storage()
+    if storage.local_file(destination) is not None:
         local_to_local(source=local_source, destination=destination, folder=LOCAL_PATH)
-    elif FILE_STORAGE_ADAPTER == "minio":
-        upload_file_from_path_to_minio(
-            bucket=MINIO_BUCKET, local_path=local_source, minio_path=destination
-        )
+    else:
+        await storage.put_file(destination, local_source)
 
 
-def adapter_to_local(adapter_path: str, local_path: str):
-    if FILE_STORAGE_ADAPTER == "local":
-        copy_file_to_local(
-            source=f"{LOCAL_PATH}/{adapter_path}", destination=local_path
-        )
-    elif FILE_STORAGE_ADAPTER == "minio":
-        download_file_to_path_from_minio(
-            bucket=MINIO_BUCKET, minio_path=adapter_path, local_path=local_path
-        )
+async def adapter_to_local(adapter_path: str, local_path: str):
+    await get_storage().get_file(adapter_path, local_path)
 
 
-def adapter_img_to_base_64(
+async def adapter_img_to_base_64(
     adapter_path: str,
     background_tasks: Optional[BackgroundTasks] = None
 ) -> str:
-    tmp_filename = adapter_path.split("/")[-1]
-    if FILE_STORAGE_ADAPTER == "local":
-        copy_file_to_local(
-            source=f"{LOCAL_PATH}/{adapter_path}", destination=f"./tmp/{tmp_filename}"
-        )
-    elif FILE_STORAGE_ADAPTER == "minio":
-        download_file_to_path_from_minio(
-            bucket=MINIO_BUCKET,
-            minio_path=adapter_path,
-            local_path=f"./tmp/{tmp_filename}",
-        )
-
     # This commented code below is not working
     # i think the function `img_to_base64` is problematic
     # it also causes a glitch to the transparency of a .png file
     # base64 = img_to_base64(local_path=f"./tmp/{tmp_filename}")
 
     # I don't want to touch the function, therefore i implemented a new way
-    with open(f"./tmp/{tmp_filename}", "rb") as image_file:
-        image_data = image_file.read()
-        base64 = b64.b64encode(image_data).decode("utf-8")
-
-    if background_tasks is not None:
-        background_tasks.add_task(delete_file_in_tmp, tmp_filename)
+    # (read straight from the storage, no copy in ./tmp anymore)
+    image_data = await get_storage().get_bytes(adapter_path)
+    if image_data is None:
+        raise FileNotFoundError(adapter_path)
+    return b64.b64encode(image_data).decode("utf-8")
 
-    return base64
-
-def generate_link_download(file_name:str):
+async def generate_link_download(file_name:str):
     try:
-        if FILE_STORAGE_ADAPTER == "local":
-            # url = 'http://127.0.0.1:8000/minio/download/?minio_path='
-            url = f'{BACKEND_URL}/minio/download/?minio_path='
-            return url + file_name
-        elif FILE_STORAGE_ADAPTER == "minio":
-            presigned_url = minio_client.presigned_get_object(
-                MINIO_BUCKET, file_name, expires=timedelta(hours=48)
-            )
-            return presigned_url
+        return await get_storage().url(file_name, expires=timedelta(hours=48))
     except Exception as e:
         return None
     
-def download_list_file(
+async def download_list_file(
     list_path: List[str],
 ) -> Optional[List[str]]:
+    storage = get_storage()
     list_download_path = []
-    if FILE_STORAGE_ADAPTER == "local":
-        for path in list_path:
-            filepath = f"{LOCAL_PATH}/{path}"
-            if os.path.exists(path=filepath):
-                list_download_path.append(filepath)
-
-    elif FILE_STORAGE_ADAPTER == "minio":
-        for path in list_path:
-            if search(r"\/", path) != None:
-                filename = path.split("/")[-1]
-            else:
-                filename = path
-
-            download_path = f"./tmp/{filename}"
-            file_object = download_file_to_path_from_minio(
-                bucket=MINIO_BUCKET, local_path=download_path, minio_path=path
-            )
-            if file_object != None:
-                list_download_path.append(download_path)
+    for path in list_path:
+        local_file = storage.local_file(path)
+        if local_file is not None:
+            if os.path.exists(path=local_file):
+                list_download_path.append(local_file)
+            continue
+
+        download_path = f"./tmp/{path.split('/')[-1]}"
+        if await storage.get_file(path, download_path):
+            list_download_path.append(download_path)
 
     return list_download_path
 
@@ -552,7 +590,7 @@ async def create_zip_from_list_file(
     
 async def upload_file_local_to_minio(local_path: str, minio_path: str) -> Optional[str]:
     try:
-        upload_file_from_path_to_minio(
+        await upload_file_from_path_to_minio(
             bucket=MINIO_BUCKET, local_path=local_path, minio_path=minio_path
         )
         return "success"
@@ -609,24 +647,13 @@ class ZipExtFileUploadFile(UploadFile):
     def content_type(self):
         return self._content_type
 
-def move_file_in_minio_rafi(
+async def move_file_in_minio_rafi(
     source_path: str = "tmp",
     destination_path: str = "profile",
 ):
     try:
-        # Download the file into memory
-        response = minio_client.get_object(MINIO_BUCKET, source_path)
-        file_data = response.read()
-        response.close()
-        response.release_conn()
-
-        # Upload the file to the destination path
-        minio_client.put_object(
-            bucket_name=MINIO_BUCKET,
-            object_name=destination_path,
-            data=io.BytesIO(file_data),
-            length=len(file_data),
-        )
+        # Server side copy, the bytes never leave MinIO
+        await minio_storage().copy(source_path, destination_path)
 
         # Delete the source file
         # delete_file_from_minio(bucket=MINIO_BUCKET, filename=source_path)
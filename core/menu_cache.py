@@ -0,0 +1,74 @@
+"""
+Rendered /auth/menu responses keyed by the role-set fingerprint.
+
+Users with the same roles get the same menu, so the tree is built and
+serialized once per role combination and served as ready JSON bytes.
+A generation counter keeps a build that raced with an invalidation from
+putting a stale tree back into the cache. Changes made on other workers
+only arrive through the catalog listener, so while it is disconnected
+entries live CATALOG_FALLBACK_TTL seconds instead of MENU_CACHE_TTL.
+"""
+from threading import Lock
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from core.cache import TTLCache
+from core.responses import Ok
+from settings import CATALOG_FALLBACK_TTL, MENU_CACHE_TTL, MENU_CACHE_MAXSIZE
+
+menu_cache = TTLCache(maxsize=MENU_CACHE_MAXSIZE, ttl=MENU_CACHE_TTL)
+_generation = 0
+_generation_lock = Lock()
+_listening = False
+
+
+def menu_fingerprint(role_ids: Iterable[int]) -> Tuple[int, ...]:
+    return tuple(sorted(set(role_ids)))
+
+
+def get_menu_generation() -> int:
+    return _generation
+
+
+def render_menu_body(menu_tree: List[dict]) -> bytes:
+    """
+    same bytes common_response(Ok(data={"results": menu_tree})) sends
+    """
+    return Ok(data={"results": menu_tree}).json().body
+
+
+def get_cached_menu(role_ids: Iterable[int]) -> Optional[bytes]:
+    return menu_cache.get(menu_fingerprint(role_ids))
+
+
+def set_cached_menu(role_ids: Iterable[int], body: bytes, generation: int) -> None:
+    """
+    generation: get_menu_generation() read before the menu was loaded
+    """
+    with _generation_lock:
+        if generation != _generation:
+            return
+        ttl = None if _listening else CATALOG_FALLBACK_TTL
+        menu_cache.set(menu_fingerprint(role_ids), body, ttl=ttl)
+
+
+def invalidate_menu_cache() -> None:
+    """
+    call after menu / role_permission / permission changes
+    """
+    global _generation
+    with _generation_lock:
+        _generation += 1
+        menu_cache.clear()
+
+
+def set_menu_listening(listening: bool) -> None:
+    """
+    called by the catalog listener, entries only get the full MENU_CACHE_TTL
+    while change notifications can reach this worker
+    """
+    global _listening
+    _listening = listening
+    invalidate_menu_cache()
+
+
+def get_menu_cache_stats() -> Dict[str, Any]:
+    return {**menu_cache.stats(), "generation": _generation}
@@ -0,0 +1,51 @@
+"""
+Periodic log line with the per-worker cache and pool counters, so hit
+ratios and the time the caches save show up in the application log.
+"""
+import asyncio
+from typing import Any, Dict
+from core.catalog import catalog
+from core.logging_config import logger
+from core.menu_cache import get_menu_cache_stats
+from core.security import get_password_hasher_stats, get_principal_cache_stats
+from core.storage import get_stat_cache_stats
+
+LOGGED_KEYS = [
+    "size", "hits", "misses", "hit_ratio", "saved_ms",
+    "pending", "max_pending_seen", "completed", "rejected", "avg_ms",
+    "loads", "invalidations", "generation", "enabled",
+]
+
+
+def get_runtime_stats() -> Dict[str, Dict[str, Any]]:
+    return {
+        "principal_cache": get_principal_cache_stats(),
+        "password_hasher": get_password_hasher_stats(),
+        "menu_cache": get_menu_cache_stats(),
+        "stat_cache": get_stat_cache_stats(),
+        "catalog": catalog.stats(),
+    }
+
+
+def format_stats(name: str, stats: Dict[str, Any]) -> str:
+    values = []
+    for key in LOGGED_KEYS:
+        if key not in stats:
+            continue
+        value = stats[key]
+        values.append(f"{key}={value:.2f}" if isinstance(value, float) else f"{key}={value}")
+    return f"{name} " + " ".join(values)
+
+
+def log_runtime_stats() -> None:
+    for name, stats in get_runtime_stats().items():
+        logger.info(f"Stats {format_stats(name, stats)}")
+
+
+async def log_runtime_stats_forever(interval: float) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            log_runtime_stats()
+        except Exception as e:
+            logger.warning(f"Stats logging failed: {e}")
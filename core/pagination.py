@@ -0,0 +1,37 @@
+"""
+Opaque keyset cursors.
+
+A cursor is the sort key of the row at the edge of a page plus the
+direction to read from it, packed as urlsafe base64 json. Clients only
+pass it back, so the key layout can change without breaking them.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Any, Tuple
+
+NEXT = "n"
+PREV = "p"
+
+
+def encode_cursor(created_at: datetime, row_id: Any, direction: str) -> str:
+    payload = json.dumps(
+        {"c": created_at.isoformat(), "i": str(row_id), "d": direction},
+        separators=(",", ":"),
+    )
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str, str]:
+    """
+    return (created_at, id, direction), ValueError when the cursor is not ours
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        direction = payload["d"]
+        if direction not in [NEXT, PREV]:
+            raise ValueError(direction)
+        return datetime.fromisoformat(payload["c"]), str(payload["i"]), direction
+    except Exception:
+        raise ValueError("Cursor tidak valid")
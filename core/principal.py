@@ -0,0 +1,97 @@
+"""
+Auth graph loader on SQLAlchemy Core.
+
+One statement joins user_token -> user -> user_effective_permission (the
+read model kept up to date by repository.effective_permission), so
+resolving "who is this and what can they do" is a single round-trip of
+primary key lookups without hydrating User/Role/Permission/Module ORM objects. The row becomes
+a Principal, a small immutable object that is safe to share between
+requests through the principal cache.
+"""
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, Optional, Tuple
+from sqlalchemy import Integer, cast, func, literal_column, select
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import ColumnElement, Select
+from core.authorization import AuthorizationModel
+from models.User import User
+from models.UserEffectivePermission import UserEffectivePermission
+from models.UserToken import UserToken
+
+user_table = User.__table__
+effective_table = UserEffectivePermission.__table__
+user_token_table = UserToken.__table__
+
+
+@dataclass(frozen=True, slots=True)
+class Principal:
+    """
+    who is calling and what they can do, everything an authenticated route
+    needs without the User/Role/Permission ORM graph
+    """
+    id: str
+    email: str
+    name: str
+    role_ids: Tuple[int, ...]
+    permission_ids: FrozenSet[int]
+    # OR of the role bitsets of core.authorization.AuthorizationModel
+    permission_bits: int = 0
+
+    @classmethod
+    def from_row(
+        cls, row: Dict[str, Any], model: Optional[AuthorizationModel] = None
+    ) -> "Principal":
+        role_ids = tuple(sorted(row["role_ids"] or ()))
+        return cls(
+            id=str(row["id"]),
+            email=row["email"],
+            name=row["name"],
+            role_ids=role_ids,
+            permission_ids=frozenset(row["permission_ids"] or ()),
+            permission_bits=model.bits_for_roles(role_ids) if model is not None else 0,
+        )
+
+    def has_permission_id(self, permission_id: int) -> bool:
+        return permission_id in self.permission_ids
+
+
+def auth_principal_query(token_clause: ColumnElement, user_id: str) -> Select:
+    """
+    token_clause: where clause for the session row, see core.security.session_token_clause
+    """
+    empty_ids = cast(literal_column("'{}'"), ARRAY(Integer))
+    return (
+        select(
+            user_table.c.id,
+            user_table.c.email,
+            user_table.c.name,
+            func.coalesce(effective_table.c.role_ids, empty_ids).label("role_ids"),
+            func.coalesce(effective_table.c.permission_ids, empty_ids).label("permission_ids"),
+        )
+        .select_from(user_token_table)
+        .join(user_table, user_table.c.id == user_token_table.c.emp_id)
+        .outerjoin(effective_table, effective_table.c.user_id == user_table.c.id)
+        .where(
+            token_clause,
+            user_token_table.c.emp_id == user_id,
+            user_token_table.c.isact == True,
+        )
+    )
+
+
+async def load_auth_principal(
+    db: AsyncSession,
+    token_clause: ColumnElement,
+    user_id: str,
+    model: Optional[AuthorizationModel] = None,
+) -> Optional[Principal]:
+    """
+    return the Principal of the session or None when the session does not
+    exist / is revoked
+    """
+    result = await db.execute(auth_principal_query(token_clause, user_id))
+    row = result.mappings().first()
+    if row is None:
+        return None
+    return Principal.from_row(row, model=model)
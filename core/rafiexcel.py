@@ -131,7 +131,7 @@ class RafiExcel:
         # Add image
         ws.add_image(img_resized, column)
         return ws
-    def insert_gambar_custom(
+    async def insert_gambar_custom(
             self, 
             ws:any, 
             column:str, 
@@ -139,9 +139,8 @@ class RafiExcel:
             row:int, 
             path_file:str
             ):
-        image_data = download_file_to_bytes(path=path_file)
-        # img = PILImage.open(io.BytesIO(image_data))
-        img = PILImage.open(image_data)
+        image_data = await download_file_to_bytes(path=path_file)
+        img = PILImage.open(io.BytesIO(image_data))
         ws.column_dimensions[column_id].width = 30
         ws.row_dimensions[row].height = 160
         newsize = (210, 210)
@@ -270,9 +269,9 @@ class RafiExcel:
             #TODO: change to query 
             ls_execl_field=['no', 'id', 'nama', 'alamat', 'expire']
             with BytesIO(file_content.read()) as bytes_io:
-                workbook = load_workbook(bytes_io)
+                workbook = load_workbook(bytes_io, read_only=True, data_only=True)
                 sheet = workbook.active
-                headers = [cell.value for cell in sheet[1]]
+                headers = list(next(sheet.iter_rows(max_row=1, values_only=True), ()))
                 print('headers',headers)
                 if len(ls_execl_field) == len(headers):
                     validation_field = all(field in ls_execl_field for field in headers)
@@ -282,7 +281,8 @@ class RafiExcel:
                     raise ValueError(f"Error: Missing or incorrect columns. Please check and re-upload your file.")
                 data_list = []
                 for row in sheet.iter_rows(min_row=2, values_only=True):
-                    row_data = {headers[i]: row[i] for i in range(len(headers))}
+                    # read_only mode drops trailing empty cells
+                    row_data = {headers[i]: row[i] if i < len(row) else None for i in range(len(headers))}
                     data_list.append(row_data)
 
                 return data_list
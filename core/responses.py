@@ -123,6 +123,34 @@ class BadRequest:
         """
         return JSONResponse(content=self.response_shape, status_code=400)
 
+class ServiceUnavailable:
+    def __init__(
+        self,
+        message: Optional[Any] = None,
+        retry_after: int = 1,
+    ) -> None:
+        """
+        retry_after: seconds sent in the Retry-After header so clients back off
+        """
+        self.response_shape = {
+            "meta": "",
+            "data": "",
+            "status": "failed",
+            "code": 503,
+            "message": message if message is not None else "Service Unavailable"
+        }
+        self.retry_after = retry_after
+
+    def json(self) -> JSONResponse:
+        """
+        parse class to JSONReponse
+        """
+        return JSONResponse(
+            content=self.response_shape,
+            status_code=503,
+            headers={"Retry-After": str(self.retry_after)},
+        )
+
 class Forbidden:
     def __init__(self, custom_response: Optional[Any] = None) -> None:
         """
@@ -259,6 +287,7 @@ def common_response(
         Unauthorized,
         Forbidden,
         NotFound,
+        ServiceUnavailable,
         InternalServerError,
         CudResponse,
     ]
@@ -274,6 +303,7 @@ def common_response(
         BadRequest,
         Forbidden,
         NotFound,
+        ServiceUnavailable,
         CudResponse,
     ]:
         return res.json()
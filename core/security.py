@@ -1,24 +1,53 @@
+import hashlib
+import time
 import traceback
-from typing import List, Optional
+from typing import List, Optional, Union
 from datetime import datetime, timedelta
+from fastapi import Depends, Request
 from fastapi.security import OAuth2PasswordBearer
 import bcrypt
 from pytz import timezone
-from sqlalchemy import select
+from sqlalchemy import select, and_
 from sqlalchemy.orm import Session
 from sqlalchemy.ext.asyncio import AsyncSession
 from jose import JWTError, jwt
+from models.Module import Module
 from models.Permission import Permission
 from models.Role import Role
 from models.User import User
 # from models.Permission import Permission
 from models.UserToken import UserToken
-from settings import ACCESS_TOKEN_EXPIRE_MINUTES, SECRET_KEY, ALGORITHM, TZ
+from models import get_db
+from settings import (
+    ACCESS_TOKEN_EXPIRE_MINUTES,
+    SECRET_KEY,
+    ALGORITHM,
+    TZ,
+    PRINCIPAL_CACHE_TTL,
+    PRINCIPAL_CACHE_MAXSIZE,
+    PASSWORD_HASH_WORKERS,
+    PASSWORD_HASH_MAX_PENDING,
+    MOBILE_TOKEN_EXPIRE_MINUTES,
+)
 from sqlalchemy.future import select
 from sqlalchemy.orm import selectinload
+from core.cache import TTLCache
+from core.executor import BoundedExecutor
+from core.principal import Principal, load_auth_principal
+from core.authorization import get_authorization_model
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/token")
 
+# ("principal", verified token digest) -> immutable Principal, never ORM objects
+principal_cache = TTLCache(maxsize=PRINCIPAL_CACHE_MAXSIZE, ttl=PRINCIPAL_CACHE_TTL)
+
+# bcrypt runs here so a login burst never blocks the event loop
+password_hasher = BoundedExecutor(
+    name="bcrypt",
+    max_workers=PASSWORD_HASH_WORKERS,
+    max_pending=PASSWORD_HASH_MAX_PENDING,
+)
+
 
 def generate_hash_password(password: str) -> str:
     hash = bcrypt.hashpw(str.encode(password), bcrypt.gensalt())
@@ -36,8 +65,33 @@ def validated_user_password(hash: str, password: str) -> bool:
         return False
 
 
+async def generate_hash_password_async(password: str) -> str:
+    """
+    generate_hash_password on the bcrypt pool, raise ExecutorOverloaded when the pool is full
+    """
+    return await password_hasher.run(generate_hash_password, password)
+
+
+async def generate_hash_lisensi_async(lisensi: str) -> str:
+    """
+    generate_hash_lisensi on the bcrypt pool, raise ExecutorOverloaded when the pool is full
+    """
+    return await password_hasher.run(generate_hash_lisensi, lisensi)
+
+
+async def validated_user_password_async(hash: str, password: str) -> bool:
+    """
+    validated_user_password on the bcrypt pool, raise ExecutorOverloaded when the pool is full
+    """
+    return await password_hasher.run(validated_user_password, hash, password)
+
+
+def get_password_hasher_stats() -> dict:
+    return password_hasher.stats()
+
+
 async def generate_jwt_token_from_user(
-    user: User, ignore_timezone: bool = False
+    user: Union[User, Principal], ignore_timezone: bool = False
 ) -> str:
     try:
         # expire = datetime.now() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -57,6 +111,7 @@ async def generate_jwt_token_from_user(
             "id": str(user.id),
             "username": user.email,
             "email": user.email,
+            "iat": datetime.now(timezone("UTC")),
             "exp": expire,
         }
         jwt_token = jwt.encode(payload, SECRET_KEY, algorithm=ALGORITHM)
@@ -69,7 +124,7 @@ async def generate_jwt_token_from_user_mobile(
     user: User, ignore_timezone: bool = False
 ) -> str:
     # expire = datetime.now() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    expire = datetime.now() + timedelta(minutes=60*24*30)
+    expire = datetime.now() + timedelta(minutes=MOBILE_TOKEN_EXPIRE_MINUTES)
     # expire = datetime.now() + timedelta(minutes=1)
     if ignore_timezone == False:  # For testing
         expire = expire.astimezone(timezone(TZ))
@@ -85,6 +140,7 @@ async def generate_jwt_token_from_user_mobile(
         "id": str(user.id),
         "username": user.email,
         "email": user.email,
+        "iat": datetime.now(timezone("UTC")),
         "exp": expire,
     }
     jwt_token = jwt.encode(payload, SECRET_KEY, algorithm=ALGORITHM)
@@ -110,12 +166,53 @@ async def generate_refresh_jwt_token_from_user(
         "id": str(user.id),
         "username": user.email,
         "email": user.email,
+        "iat": datetime.now(timezone("UTC")),
         "exp": expire,
     }
     jwt_token = jwt.encode(payload, SECRET_KEY, algorithm=ALGORITHM)
     return jwt_token
 
 
+def hash_session_token(jwt_token: str) -> str:
+    """
+    fixed width sha256 hex digest of a jwt, never keep the raw token around
+    """
+    return hashlib.sha256(jwt_token.encode()).hexdigest()
+
+
+def get_token_expires_at(jwt_token: str) -> datetime:
+    """
+    exp claim of a token issued by this service as aware datetime
+    """
+    claims = jwt.get_unverified_claims(jwt_token)
+    return datetime.fromtimestamp(claims["exp"], tz=timezone("UTC"))
+
+
+def get_token_issued_at(jwt_token: str) -> Optional[datetime]:
+    """
+    iat claim as aware datetime, None for tokens issued before iat was added
+    """
+    try:
+        claims = jwt.get_unverified_claims(jwt_token)
+    except JWTError:
+        return None
+    if claims.get("iat") is None:
+        return None
+    return datetime.fromtimestamp(claims["iat"], tz=timezone("UTC"))
+
+
+def session_token_clause(jwt_token: str):
+    """
+    where clause for the user_token row of a jwt: unique (token_hash, issued_at)
+    probe, pruned to the partition of the issue day when the token has iat
+    """
+    clause = UserToken.token_hash == hash_session_token(jwt_token)
+    issued_at = get_token_issued_at(jwt_token)
+    if issued_at is not None:
+        clause = and_(clause, UserToken.issued_at == issued_at)
+    return clause
+
+
 async def get_user_from_jwt_token(db: Session, jwt_token: str) -> Optional[User]:
     try:
         payload = jwt.decode(token=jwt_token, key=SECRET_KEY, algorithms=ALGORITHM)
@@ -123,7 +220,7 @@ async def get_user_from_jwt_token(db: Session, jwt_token: str) -> Optional[User]
             return None
         id = payload.get("id")
         result_user_token = await db.execute(
-            select(UserToken).where(UserToken.token == jwt_token, UserToken.emp_id == id)
+            select(UserToken).where(session_token_clause(jwt_token), UserToken.emp_id == id)
         )
         user_token = result_user_token.scalar()
         if user_token == None:
@@ -143,64 +240,159 @@ async def get_user_from_jwt_token(db: Session, jwt_token: str) -> Optional[User]
         return None
 
 
+async def get_principal_from_jwt_token(db: Session, jwt_token: str) -> Optional[Principal]:
+    """
+    same checks as get_user_from_jwt_token but resolved with the single
+    round-trip Core query (core.principal), no ORM objects are loaded
+    """
+    try:
+        payload = jwt.decode(token=jwt_token, key=SECRET_KEY, algorithms=ALGORITHM)
+        now = datetime.now().timestamp()
+        if payload["exp"] < now:
+            return None
+        cache_key = ("principal", hash_session_token(jwt_token))
+        principal = principal_cache.get(cache_key)
+        if principal is not None:
+            return principal
+
+        started = time.perf_counter()
+        model = await get_authorization_model(db)
+        principal = await load_auth_principal(
+            db,
+            token_clause=session_token_clause(jwt_token),
+            user_id=payload.get("id"),
+            model=model,
+        )
+        if principal is not None:
+            principal_cache.set(cache_key, principal, tag=principal.id, ttl=payload["exp"] - now)
+            principal_cache.record_load(time.perf_counter() - started)
+        return principal
+    except JWTError:
+        return None
+    except Exception as e:
+        return None
+
+
+class AuthenticationFailed(Exception):
+    """
+    raised by current_principal, rendered as common_response(Unauthorized()) by main.py
+    """
+
+
+class PermissionDenied(Exception):
+    """
+    raised by require_permission, rendered as common_response(Forbidden()) by main.py
+    """
+
+
+async def current_principal(
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    token: str = Depends(oauth2_scheme),
+) -> Principal:
+    """
+    FastAPI dependency, resolve the caller once per request and keep it on
+    request.state.principal so nested dependencies reuse it
+    """
+    principal = getattr(request.state, "principal", None)
+    if principal is not None:
+        return principal
+    principal = await get_principal_from_jwt_token(db, token)
+    if principal is None:
+        raise AuthenticationFailed()
+    request.state.principal = principal
+    return principal
+
+
+def require_permission(module_name: Optional[str], permission_name: str):
+    """
+    dependency factory, ex: Depends(require_permission("user", "edit"))
+    resolves like current_principal then 403 when the permission is missing,
+    the check is one AND against the compiled authorization model
+    """
+    async def dependency(
+        db: AsyncSession = Depends(get_db),
+        principal: Principal = Depends(current_principal),
+    ) -> Principal:
+        model = await get_authorization_model(db)
+        if not model.allows(principal.permission_bits, module_name, permission_name):
+            raise PermissionDenied()
+        return principal
+
+    return dependency
+
+
+def invalidate_cached_token(jwt_token: str) -> None:
+    """
+    drop one session from the principal cache, call after logout
+    """
+    token_hash = hash_session_token(jwt_token)
+    principal_cache.delete(("principal", token_hash))
+
+
+def invalidate_cached_user(user_id: str) -> None:
+    """
+    drop every cached session of a user, call after the user or their roles change
+    """
+    principal_cache.delete_tag(str(user_id))
+
+
+def invalidate_principal_cache() -> None:
+    """
+    drop every cached session, call after role/permission changes
+    """
+    principal_cache.clear()
+
+
+def get_principal_cache_stats() -> dict:
+    """
+    hits, misses, avg_load_ms and saved_ms (hits * avg_load_ms) for this worker
+    """
+    return principal_cache.stats()
+
+
 def get_user_permissions(db: Session, user: User) -> List[Permission]:
-    permissions = []
+    permissions = {}
 
     # add permission from role
     for role in user.roles:
         for permission in role.permissions:
-            exists = [x for x in permissions if x == permission]
-            if len(exists) == 0:
-                permissions.append(permission)
-    return sorted(permissions, key=lambda d: d.id)
+            permissions.setdefault(permission.id, permission)
+    return [permissions[x] for x in sorted(permissions)]
 
 def get_user_permissions_name(db: Session, user: User, module_id) -> List[Permission]:
-    permissions = []
+    permissions = {}
 
     # add permission from role
     for role in user.roles:
         for permission in role.permissions:
-            exists = [x for x in permissions if x == permission]
-            if len(exists) == 0:
-                if permission.module_id == module_id:
-                    permissions.append(permission.name)
-    return permissions
+            if permission.module_id == module_id:
+                permissions.setdefault(permission.id, permission.name)
+    return list(permissions.values())
 
 
-def is_user_has_permission(
-    db: Session, user: User, permission_name: str, module_name: Optional[str] = None
+async def is_user_has_permission(
+    db: AsyncSession,
+    user: Union[User, Principal],
+    permission_name: str,
+    module_name: Optional[str] = None,
 ) -> bool:
-    # stmt = (
-    #     select(Permission)
-    #     .join(Module, Permission.module)
-    #     .where(Permission.permission == permission_name)
-    #     .where(Module.nama == module_name)
-    # )
-    # permission: Optional[Permission] = db.execute(stmt).scalar()
-    # if permission == None: # NOQA
-    #     return False
-
-    # stmt = select(UserPermission).where(
-    #     UserPermission.user_id == user.id, UserPermission.permission_id == permission.id
-    # )
-    # user_permission: Optional[UserPermission] = db.execute(stmt).scalar()
-    # if user_permission != None: # NOQA
-    #     return user_permission.grant
-
-    # is_permission_exists = False
-    # stmt = select(Module).where(Module.nama == module_name)
-    # module = db.execute(stmt).scalar()
-    # for role in user.roles:
-    #     permissions: List[Permission] = role.permissions
-    #     for permission in permissions:
-    #         if permission.permission == permission_name:
-    #             if module != None: # NOQA
-    #                 if permission.module_id == module.id:
-    #                     is_permission_exists = True
-    #             else:
-    #                 if permission.module_id == None: # NOQA
-    #                     is_permission_exists = True
+    """
+    Principal: constant time check against the compiled authorization model
+    (loaded or reloaded through db when needed).
+    User: walk the loaded roles -> permissions -> module graph.
+    """
+    if isinstance(user, Principal):
+        model = await get_authorization_model(db)
+        return model.allows(user.permission_bits, module_name, permission_name)
 
+    for role in user.roles:
+        for permission in role.permissions:
+            if permission.name != permission_name or permission.isact == False:
+                continue
+            permission_module = permission.module.name if permission.module != None else None
+            if permission_module == module_name:
+                return True
     return False
 
 
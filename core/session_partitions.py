@@ -0,0 +1,133 @@
+"""
+Daily range partitions for user_token (partition key: issued_at, UTC days).
+
+Every partition holds the sessions issued on one day, so once the longest
+token lifetime has passed the whole partition is expired and can be dropped
+with a single DROP TABLE instead of DELETE + vacuum. A DEFAULT partition
+catches rows when maintenance did not run in time.
+"""
+import re
+from datetime import date, datetime, timedelta
+from typing import List, Optional
+from pytz import timezone
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+from settings import SESSION_RETENTION_DAYS, SESSION_PARTITION_PREMAKE_DAYS
+
+SESSION_TABLE = "user_token"
+DEFAULT_PARTITION = f"{SESSION_TABLE}_default"
+PARTITION_PATTERN = re.compile(rf"^{SESSION_TABLE}_p(\d{{8}})$")
+
+
+def session_partition_name(day: date) -> str:
+    return f"{SESSION_TABLE}_p{day.strftime('%Y%m%d')}"
+
+
+def utc_today() -> date:
+    return datetime.now(timezone("UTC")).date()
+
+
+async def list_session_partitions(conn: AsyncConnection) -> List[str]:
+    result = await conn.execute(
+        text(
+            """
+            SELECT c.relname
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = CAST(:table AS regclass)
+            """
+        ),
+        {"table": SESSION_TABLE},
+    )
+    return [row[0] for row in result.all()]
+
+
+async def ensure_default_partition(conn: AsyncConnection):
+    await conn.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF {SESSION_TABLE} DEFAULT"
+    ))
+
+
+async def create_session_partition(conn: AsyncConnection, day: date):
+    """
+    create the partition of one day, rows of that day that already landed in
+    the default partition are moved into it before it is attached
+    """
+    name = session_partition_name(day)
+    start = day.isoformat()
+    end = (day + timedelta(days=1)).isoformat()
+    bounds = {"start": start, "end": end}
+    await conn.execute(text(
+        f"CREATE TABLE {name} (LIKE {SESSION_TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+    ))
+    await conn.execute(
+        text(
+            f"""
+            WITH moved AS (
+                DELETE FROM {DEFAULT_PARTITION}
+                WHERE issued_at >= CAST(:start AS timestamptz) AND issued_at < CAST(:end AS timestamptz)
+                RETURNING *
+            )
+            INSERT INTO {name} SELECT * FROM moved
+            """
+        ),
+        bounds,
+    )
+    await conn.execute(text(
+        f"ALTER TABLE {SESSION_TABLE} ATTACH PARTITION {name} "
+        f"FOR VALUES FROM ('{start} 00:00:00+00') TO ('{end} 00:00:00+00')"
+    ))
+
+
+async def ensure_session_partitions(
+    conn: AsyncConnection,
+    days_ahead: int = SESSION_PARTITION_PREMAKE_DAYS,
+    start: Optional[date] = None,
+) -> List[str]:
+    """
+    make sure there is a partition for every day from `start` (default today)
+    up to today + days_ahead, return the names that were created
+    """
+    await ensure_default_partition(conn)
+    today = utc_today()
+    start = start or today
+    existing = set(await list_session_partitions(conn))
+    created = []
+    day = start
+    while day <= today + timedelta(days=days_ahead):
+        name = session_partition_name(day)
+        if name not in existing:
+            await create_session_partition(conn, day)
+            created.append(name)
+        day += timedelta(days=1)
+    return created
+
+
+async def drop_expired_session_partitions(
+    conn: AsyncConnection,
+    retention_days: int = SESSION_RETENTION_DAYS,
+) -> List[str]:
+    """
+    drop every daily partition that ended more than retention_days ago,
+    retention_days must cover the longest token lifetime (mobile token)
+    """
+    cutoff = utc_today() - timedelta(days=retention_days)
+    dropped = []
+    for name in await list_session_partitions(conn):
+        match = PARTITION_PATTERN.match(name)
+        if match is None:
+            continue
+        day = datetime.strptime(match.group(1), "%Y%m%d").date()
+        if day + timedelta(days=1) <= cutoff:
+            await conn.execute(text(f"ALTER TABLE {SESSION_TABLE} DETACH PARTITION {name}"))
+            await conn.execute(text(f"DROP TABLE {name}"))
+            dropped.append(name)
+    # the default partition is only a safety net, trim it row by row
+    await conn.execute(text(f"DELETE FROM {DEFAULT_PARTITION} WHERE expires_at < now()"))
+    return sorted(dropped)
+
+
+async def maintain_session_partitions(conn: AsyncConnection) -> dict:
+    created = await ensure_session_partitions(conn)
+    dropped = await drop_expired_session_partitions(conn)
+    return {"created": created, "dropped": dropped}
@@ -0,0 +1,1054 @@
+"""
+Async storage backends.
+
+core.file used to call the synchronous minio client straight from async
+routes, so every object store round-trip blocked the event loop of the
+worker. Every backend here is awaitable instead:
+
+- MinioStorage runs the minio client on a BoundedExecutor thread pool with
+  a tuned urllib3 pool (STORAGE_POOL_MAXSIZE connections, connect/read
+  timeouts, retries), at most STORAGE_MAX_CONCURRENCY calls in flight and a
+  per call deadline (STORAGE_TIMEOUT / STORAGE_TRANSFER_TIMEOUT).
+- LocalStorage keeps files under LOCAL_PATH, disk I/O runs on the same pool.
+- MemoryStorage keeps objects in a dict, for tests and benchmarks.
+
+put_stream() uploads from an async source (UploadFile) without holding the
+whole body: MinioStorage sends S3 multipart parts of STORAGE_UPLOAD_PART_SIZE
+(STORAGE_UPLOAD_PARALLEL at a time) and every backend computes the sha256 of
+the bytes on the way through.
+
+copy() is server side on minio (copy_object, compose for objects above
+5 GiB), move() is copy + delete. copy_many / move_many / delete_many /
+move_prefix run many paths at once, STORAGE_BATCH_CONCURRENCY at a time, and
+minio deletes go out as multi-object deletes (remove_objects, 1000 keys per
+request).
+
+stat() / exists() are metadata only (HEAD on minio) and stat_many() checks
+many paths at once. Results can be kept for a few seconds in stat_cache
+(STORAGE_STAT_CACHE_TTL / STORAGE_STAT_CACHE_NEGATIVE_TTL, off by default),
+writes through the backend drop the entries they touch.
+
+stat() + open_range() let callers stream a byte range of an object straight
+to the client (core.file.stream_file_response), no temp file, no full read.
+
+The backend is picked once from FILE_STORAGE_ADAPTER by get_storage().
+"""
+import asyncio
+import hashlib
+import hmac
+import mimetypes
+import os
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from io import BytesIO
+from shutil import copyfile, move
+from threading import Lock
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    BinaryIO,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+)
+from urllib.parse import quote
+import urllib3
+from minio import Minio, S3Error
+from minio.commonconfig import CopySource
+from minio.deleteobjects import DeleteObject
+from core.cache import TTLCache
+from core.executor import BoundedExecutor
+from settings import (
+    FILE_STORAGE_ADAPTER,
+    LOCAL_PATH,
+    MINIO_ACCESS_KEY,
+    MINIO_BUCKET,
+    MINIO_ENPOINT,
+    MINIO_REGION,
+    MINIO_SECRET_KEY,
+    MINIO_SECURE,
+    BACKEND_URL,
+    SECRET_KEY,
+    STORAGE_BATCH_CONCURRENCY,
+    STORAGE_CONNECT_TIMEOUT,
+    STORAGE_MAX_CONCURRENCY,
+    STORAGE_MAX_PENDING,
+    STORAGE_MAX_RETRIES,
+    STORAGE_POOL_MAXSIZE,
+    STORAGE_READ_TIMEOUT,
+    STORAGE_STAT_CACHE_MAXSIZE,
+    STORAGE_STAT_CACHE_NEGATIVE_TTL,
+    STORAGE_STAT_CACHE_TTL,
+    STORAGE_TIMEOUT,
+    STORAGE_TRANSFER_TIMEOUT,
+    STORAGE_UPLOAD_PARALLEL,
+    STORAGE_UPLOAD_PART_SIZE,
+)
+
+DEFAULT_CONTENT_TYPE = "application/octet-stream"
+NOT_FOUND_CODES = ("NoSuchKey", "NoSuchObject", "NoSuchBucket", "ResourceNotFound")
+# read size of backends that write chunk by chunk (local disk, memory)
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+# missing objects are cached as this marker (TTLCache.get returns None on a miss)
+MISSING = "missing"
+
+# (backend namespace, path) -> ObjectInfo | MISSING, tagged with the namespace
+stat_cache = TTLCache(
+    maxsize=STORAGE_STAT_CACHE_MAXSIZE,
+    ttl=max(STORAGE_STAT_CACHE_TTL, STORAGE_STAT_CACHE_NEGATIVE_TTL),
+)
+
+# blocking storage calls (minio http, local disk) run here, never on the loop
+storage_executor = BoundedExecutor(
+    name="storage",
+    max_workers=STORAGE_MAX_CONCURRENCY,
+    max_pending=STORAGE_MAX_PENDING,
+)
+
+
+class StorageTimeout(Exception):
+    """
+    raised when a storage call does not finish within its deadline
+    """
+
+
+@dataclass(frozen=True)
+class UploadResult:
+    path: str
+    size: int
+    sha256: str
+    etag: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class ObjectInfo:
+    path: str
+    size: int
+    etag: str
+    content_type: str
+    last_modified: Optional[datetime] = None
+
+
+@dataclass
+class BatchResult:
+    """
+    done: paths (source paths for copy/move) that succeeded,
+    failed: path -> error message
+    """
+    done: List[str] = field(default_factory=list)
+    failed: Dict[str, str] = field(default_factory=dict)
+
+
+class StreamReader:
+    """
+    blocking file-like view of an async source (UploadFile) for code running
+    on a storage thread, every read() is awaited on the event loop. Bytes are
+    counted and hashed as they pass, nothing is kept.
+    """
+
+    def __init__(self, source: Any, loop: asyncio.AbstractEventLoop, timeout: float) -> None:
+        self.source = source
+        self.loop = loop
+        self.timeout = timeout
+        self.size = 0
+        self.hash = hashlib.sha256()
+        self.cancelled = False
+
+    def read(self, size: int = -1) -> bytes:
+        if self.cancelled:
+            # the caller gave up (timeout / client gone), make the upload fail
+            raise IOError("upload cancelled")
+        data = asyncio.run_coroutine_threadsafe(
+            self.source.read(size), self.loop
+        ).result(self.timeout)
+        self.size += len(data)
+        self.hash.update(data)
+        return data
+
+    def result(self, path: str, etag: Optional[str] = None) -> UploadResult:
+        return UploadResult(path=path, size=self.size, sha256=self.hash.hexdigest(), etag=etag)
+
+
+class StorageBackend(ABC):
+    name = "base"
+
+    @abstractmethod
+    async def put_bytes(
+        self, path: str, data: bytes, content_type: Optional[str] = None
+    ) -> str:
+        """
+        store `data` under `path`, return path
+        """
+
+    @abstractmethod
+    async def put_file(
+        self, path: str, local_path: str, content_type: Optional[str] = None
+    ) -> str:
+        """
+        store the local file `local_path` under `path`, return path
+        """
+
+    async def put_stream(
+        self, path: str, source: Any, content_type: Optional[str] = None
+    ) -> UploadResult:
+        """
+        store everything `source` (anything with `async read(size)`) yields
+        under `path`, chunk by chunk
+        """
+        chunks = []
+        size = 0
+        digest = hashlib.sha256()
+        while True:
+            chunk = await source.read(STREAM_CHUNK_SIZE)
+            if not chunk:
+                break
+            chunks.append(chunk)
+            size += len(chunk)
+            digest.update(chunk)
+        await self.put_bytes(path, b"".join(chunks), content_type)
+        return UploadResult(path=path, size=size, sha256=digest.hexdigest())
+
+    @abstractmethod
+    async def get_bytes(self, path: str) -> Optional[bytes]:
+        """
+        None when the object does not exist
+        """
+
+    @abstractmethod
+    async def get_file(self, path: str, local_path: str) -> bool:
+        """
+        copy the object to `local_path`, False when it does not exist
+        """
+
+    @abstractmethod
+    async def load_stat(self, path: str) -> Optional[ObjectInfo]:
+        """
+        metadata only from the storage itself, None when the object does not exist
+        """
+
+    @property
+    def namespace(self) -> str:
+        """
+        stat_cache key prefix, unique per bucket / folder
+        """
+        return f"{self.name}:{id(self)}"
+
+    async def stat(self, path: str, cached: bool = True) -> Optional[ObjectInfo]:
+        """
+        None when the object does not exist. cached=False always asks the
+        storage (the answer still refreshes the cache).
+        """
+        key = (self.namespace, path)
+        if cached:
+            hit = stat_cache.get(key)
+            if hit is not None:
+                return None if hit == MISSING else hit
+        started = time.perf_counter()
+        info = await self.load_stat(path)
+        stat_cache.record_load(time.perf_counter() - started)
+        if info is None:
+            stat_cache.set(key, MISSING, tag=self.namespace, ttl=STORAGE_STAT_CACHE_NEGATIVE_TTL)
+        else:
+            stat_cache.set(key, info, tag=self.namespace, ttl=STORAGE_STAT_CACHE_TTL)
+        return info
+
+    async def exists(self, path: str, cached: bool = True) -> bool:
+        return await self.stat(path, cached=cached) is not None
+
+    async def stat_many(
+        self,
+        paths: Iterable[str],
+        cached: bool = True,
+        concurrency: int = STORAGE_BATCH_CONCURRENCY,
+    ) -> Dict[str, Optional[ObjectInfo]]:
+        """
+        path -> ObjectInfo (None when missing) for every path, checked at the
+        same time (at most `concurrency` in flight). Storage errors are raised,
+        "unknown" is not the same as "missing".
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+        unique = list(dict.fromkeys(paths))
+
+        async def one(path: str) -> Optional[ObjectInfo]:
+            async with semaphore:
+                return await self.stat(path, cached=cached)
+
+        infos = await asyncio.gather(*(one(path) for path in unique))
+        return dict(zip(unique, infos))
+
+    def forget(self, *paths: str) -> None:
+        """
+        drop cached stat results after a write
+        """
+        for path in paths:
+            stat_cache.delete((self.namespace, path))
+
+    @abstractmethod
+    async def open_range(
+        self,
+        path: str,
+        offset: int = 0,
+        length: Optional[int] = None,
+        etag: Optional[str] = None,
+    ) -> AsyncIterator[bytes]:
+        """
+        start reading `length` bytes (None: until the end) from `offset` and
+        return an iterator of chunks. The object is opened before this returns
+        so a missing / changed (etag given) object raises here, not halfway
+        through a response.
+        """
+
+    @abstractmethod
+    async def delete(self, path: str) -> None:
+        pass
+
+    @abstractmethod
+    async def list(self, prefix: str = "") -> List[str]:
+        """
+        every object path below prefix (recursive)
+        """
+
+    @abstractmethod
+    async def url(self, path: str, expires: timedelta = timedelta(hours=48)) -> Optional[str]:
+        """
+        link the client can download the object from
+        """
+
+    async def copy(self, source: str, destination: str) -> None:
+        data = await self.get_bytes(source)
+        if data is None:
+            raise FileNotFoundError(source)
+        await self.put_bytes(destination, data)
+
+    async def move(self, source: str, destination: str) -> None:
+        await self.copy(source, destination)
+        await self.delete(source)
+
+    async def copy_many(self, pairs: Iterable[Tuple[str, str]]) -> BatchResult:
+        return await run_batch(
+            (source, lambda source=source, destination=destination: self.copy(source, destination))
+            for source, destination in pairs
+        )
+
+    async def move_many(self, pairs: Iterable[Tuple[str, str]]) -> BatchResult:
+        """
+        copy everything first, then delete the sources that were copied in one
+        batch, a failed copy never loses its source
+        """
+        copied = await self.copy_many(pairs)
+        deleted = await self.delete_many(copied.done)
+        return BatchResult(done=deleted.done, failed={**copied.failed, **deleted.failed})
+
+    async def delete_many(self, paths: Iterable[str]) -> BatchResult:
+        return await run_batch((path, lambda path=path: self.delete(path)) for path in paths)
+
+    async def move_prefix(self, source_prefix: str, destination_prefix: str) -> BatchResult:
+        """
+        move a whole "folder", keeps the path below the prefix
+        """
+        paths = await self.list(source_prefix)
+        return await self.move_many(
+            (path, destination_prefix + path[len(source_prefix):]) for path in paths
+        )
+
+    def local_file(self, path: str) -> Optional[str]:
+        """
+        path on this machine's disk when the backend is a filesystem, lets
+        callers serve the file directly
+        """
+        return None
+
+
+async def run_blocking(
+    timeout: float, fn: Callable[..., Any], *args: Any, **kwargs: Any
+) -> Any:
+    """
+    run fn on storage_executor, raise StorageTimeout after `timeout` seconds
+    (the thread itself is bounded by the http read timeout)
+    """
+    try:
+        return await asyncio.wait_for(storage_executor.run(fn, *args, **kwargs), timeout)
+    except asyncio.TimeoutError:
+        raise StorageTimeout(
+            f"storage call {getattr(fn, '__name__', fn)} took longer than {timeout}s"
+        )
+
+
+async def run_batch(
+    calls: Iterable[Tuple[str, Callable[[], Awaitable[Any]]]],
+    concurrency: int = STORAGE_BATCH_CONCURRENCY,
+) -> BatchResult:
+    """
+    await every (key, call) with at most `concurrency` in flight, one failure
+    does not stop the others
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    result = BatchResult()
+
+    async def one(key: str, call: Callable[[], Awaitable[Any]]) -> None:
+        async with semaphore:
+            try:
+                await call()
+            except Exception as e:
+                result.failed[key] = str(e) or e.__class__.__name__
+            else:
+                result.done.append(key)
+
+    await asyncio.gather(*(one(key, call) for key, call in calls))
+    return result
+
+
+async def run_stream_upload(
+    timeout: float, fn: Callable[..., Any], path: str, source: Any, *args: Any
+) -> UploadResult:
+    """
+    run fn(path, reader, *args) on storage_executor, reader is a StreamReader
+    over source. fn returns the etag (or None).
+    """
+    reader = StreamReader(source, asyncio.get_running_loop(), timeout)
+    try:
+        etag = await run_blocking(timeout, fn, path, reader, *args)
+    except BaseException:
+        reader.cancelled = True
+        raise
+    return reader.result(path, etag=etag)
+
+
+def is_not_found(error: S3Error) -> bool:
+    return error.code in NOT_FOUND_CODES
+
+
+def make_minio_http_client() -> urllib3.PoolManager:
+    return urllib3.PoolManager(
+        maxsize=STORAGE_POOL_MAXSIZE,
+        block=True,
+        timeout=urllib3.Timeout(connect=STORAGE_CONNECT_TIMEOUT, read=STORAGE_READ_TIMEOUT),
+        retries=urllib3.Retry(
+            total=STORAGE_MAX_RETRIES,
+            backoff_factor=0.2,
+            status_forcelist=[500, 502, 503, 504],
+        ),
+    )
+
+
+_minio_client: Optional[Minio] = None
+_minio_http: Optional[urllib3.PoolManager] = None
+_minio_lock = Lock()
+
+
+def get_minio_client() -> Minio:
+    """
+    one client (and connection pool) per worker, created on first use
+    """
+    global _minio_client, _minio_http
+    if _minio_client is None:
+        with _minio_lock:
+            if _minio_client is None:
+                _minio_http = make_minio_http_client()
+                _minio_client = Minio(
+                    MINIO_ENPOINT,
+                    access_key=MINIO_ACCESS_KEY,
+                    secret_key=MINIO_SECRET_KEY,
+                    secure=MINIO_SECURE,
+                    region=MINIO_REGION,
+                    http_client=_minio_http,
+                )
+    return _minio_client
+
+
+class MinioStorage(StorageBackend):
+    name = "minio"
+
+    def __init__(
+        self,
+        bucket: str = MINIO_BUCKET,
+        client: Optional[Minio] = None,
+        timeout: float = STORAGE_TIMEOUT,
+        transfer_timeout: float = STORAGE_TRANSFER_TIMEOUT,
+        part_size: int = STORAGE_UPLOAD_PART_SIZE,
+        parallel_uploads: int = STORAGE_UPLOAD_PARALLEL,
+    ) -> None:
+        self.bucket = bucket
+        self._client = client
+        self.timeout = timeout
+        self.transfer_timeout = transfer_timeout
+        self.part_size = part_size
+        self.parallel_uploads = parallel_uploads
+        self._bucket_ready = False
+
+    @property
+    def client(self) -> Minio:
+        if self._client is None:
+            self._client = get_minio_client()
+        return self._client
+
+    def _ensure_bucket(self) -> None:
+        # checked once per backend instead of before every upload
+        if self._bucket_ready:
+            return
+        if not self.client.bucket_exists(bucket_name=self.bucket):
+            self.client.make_bucket(bucket_name=self.bucket)
+        self._bucket_ready = True
+
+    def _put_bytes(self, path: str, data: bytes, content_type: str) -> None:
+        self._ensure_bucket()
+        self.client.put_object(
+            bucket_name=self.bucket,
+            object_name=path,
+            data=BytesIO(data),
+            length=len(data),
+            content_type=content_type,
+        )
+
+    def _put_stream(self, path: str, reader: StreamReader, content_type: str) -> str:
+        self._ensure_bucket()
+        # length -1: multipart upload, one part in memory per parallel slot
+        result = self.client.put_object(
+            bucket_name=self.bucket,
+            object_name=path,
+            data=reader,
+            length=-1,
+            content_type=content_type,
+            part_size=self.part_size,
+            num_parallel_uploads=self.parallel_uploads,
+        )
+        return result.etag
+
+    def _put_file(self, path: str, local_path: str, content_type: str) -> None:
+        self._ensure_bucket()
+        self.client.fput_object(
+            bucket_name=self.bucket,
+            object_name=path,
+            file_path=local_path,
+            content_type=content_type,
+        )
+
+    def _get_bytes(self, path: str) -> Optional[bytes]:
+        try:
+            response = self.client.get_object(bucket_name=self.bucket, object_name=path)
+        except S3Error as e:
+            if is_not_found(e):
+                return None
+            raise
+        try:
+            return response.read()
+        finally:
+            response.close()
+            response.release_conn()
+
+    def _get_file(self, path: str, local_path: str) -> bool:
+        try:
+            self.client.fget_object(
+                bucket_name=self.bucket, object_name=path, file_path=local_path
+            )
+        except S3Error as e:
+            if is_not_found(e):
+                return False
+            raise
+        return True
+
+    def _stat(self, path: str) -> Optional[ObjectInfo]:
+        try:
+            obj = self.client.stat_object(bucket_name=self.bucket, object_name=path)
+        except S3Error as e:
+            if is_not_found(e):
+                return None
+            raise
+        return ObjectInfo(
+            path=path,
+            size=obj.size,
+            etag=obj.etag,
+            content_type=obj.content_type or DEFAULT_CONTENT_TYPE,
+            last_modified=obj.last_modified,
+        )
+
+    def _open_range(
+        self, path: str, offset: int, length: Optional[int], etag: Optional[str]
+    ) -> Any:
+        try:
+            return self.client.get_object(
+                bucket_name=self.bucket,
+                object_name=path,
+                offset=offset,
+                length=length or 0,
+                request_headers={"If-Match": f'"{etag}"'} if etag else None,
+            )
+        except S3Error as e:
+            if is_not_found(e):
+                raise FileNotFoundError(path)
+            if e.code == "PreconditionFailed":
+                raise ValueError("File berubah, etag tidak cocok")
+            raise
+
+    async def _iter_response(self, response: Any) -> AsyncIterator[bytes]:
+        try:
+            while True:
+                chunk = await run_blocking(self.transfer_timeout, response.read, STREAM_CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            response.close()
+            response.release_conn()
+
+    def _list(self, prefix: str) -> List[str]:
+        return [
+            x.object_name
+            for x in self.client.list_objects(
+                bucket_name=self.bucket, prefix=prefix or None, recursive=True
+            )
+        ]
+
+    def _copy(self, source: str, destination: str) -> None:
+        # server side, no byte goes through this worker (compose above 5 GiB)
+        try:
+            self.client.copy_object(
+                bucket_name=self.bucket,
+                object_name=destination,
+                source=CopySource(self.bucket, source),
+            )
+        except S3Error as e:
+            if is_not_found(e):
+                raise FileNotFoundError(source)
+            raise
+
+    def _delete_many(self, paths: List[str]) -> Dict[str, str]:
+        # the iterator is lazy: nothing is deleted before it is consumed
+        errors = self.client.remove_objects(
+            bucket_name=self.bucket,
+            delete_object_list=(DeleteObject(path) for path in paths),
+        )
+        return {error.name: error.message or error.code for error in errors}
+
+    def _remove_bucket(self) -> None:
+        if not self.client.bucket_exists(bucket_name=self.bucket):
+            return
+        failed = self._delete_many(self._list(""))
+        if failed:
+            raise IOError(f"{len(failed)} objects could not be deleted from {self.bucket}")
+        self.client.remove_bucket(bucket_name=self.bucket)
+        self._bucket_ready = False
+
+    @property
+    def namespace(self):
+        return f"minio:{self.bucket}"
+
+    async def put_bytes(self, path, data, content_type=None):
+        self.forget(path)
+        await run_blocking(
+            self.transfer_timeout, self._put_bytes, path, data,
+            content_type or DEFAULT_CONTENT_TYPE,
+        )
+        return path
+
+    async def put_stream(self, path, source, content_type=None):
+        self.forget(path)
+        return await run_stream_upload(
+            self.transfer_timeout, self._put_stream, path, source,
+            content_type or DEFAULT_CONTENT_TYPE,
+        )
+
+    async def put_file(self, path, local_path, content_type=None):
+        self.forget(path)
+        await run_blocking(
+            self.transfer_timeout, self._put_file, path, local_path,
+            content_type or DEFAULT_CONTENT_TYPE,
+        )
+        return path
+
+    async def get_bytes(self, path):
+        return await run_blocking(self.transfer_timeout, self._get_bytes, path)
+
+    async def get_file(self, path, local_path):
+        return await run_blocking(self.transfer_timeout, self._get_file, path, local_path)
+
+    async def load_stat(self, path):
+        # HEAD only, no body transfer
+        return await run_blocking(self.timeout, self._stat, path)
+
+    async def open_range(self, path, offset=0, length=None, etag=None):
+        response = await run_blocking(
+            self.timeout, self._open_range, path, offset, length, etag
+        )
+        return self._iter_response(response)
+
+    async def delete(self, path):
+        self.forget(path)
+        await run_blocking(
+            self.timeout, self.client.remove_object,
+            bucket_name=self.bucket, object_name=path,
+        )
+
+    async def list(self, prefix=""):
+        return await run_blocking(self.transfer_timeout, self._list, prefix)
+
+    async def copy(self, source, destination):
+        self.forget(destination)
+        await run_blocking(self.transfer_timeout, self._copy, source, destination)
+
+    async def delete_many(self, paths):
+        paths = list(paths)
+        self.forget(*paths)
+        failed = await run_blocking(self.transfer_timeout, self._delete_many, paths)
+        return BatchResult(done=[x for x in paths if x not in failed], failed=failed)
+
+    async def url(self, path, expires=timedelta(hours=48)):
+        return await run_blocking(
+            self.timeout, self.client.presigned_get_object,
+            self.bucket, path, expires=expires,
+        )
+
+    async def remove_bucket(self) -> None:
+        stat_cache.delete_tag(self.namespace)
+        await run_blocking(self.transfer_timeout, self._remove_bucket)
+
+
+class LocalStorage(StorageBackend):
+    name = "local"
+
+    def __init__(
+        self,
+        folder: str = LOCAL_PATH,
+        base_url: str = BACKEND_URL,
+        timeout: float = STORAGE_TRANSFER_TIMEOUT,
+    ) -> None:
+        self.folder = folder
+        self.base_url = base_url
+        self.timeout = timeout
+
+    def full_path(self, path: str) -> str:
+        # paths come from clients (download links), never leave the folder
+        if os.path.isabs(path) or ".." in path.replace("\\", "/").split("/"):
+            raise ValueError("Path file tidak valid")
+        return f"{self.folder}/{path}"
+
+    def local_file(self, path):
+        return self.full_path(path)
+
+    def _write(self, path: str, data: bytes) -> None:
+        full_path = self.full_path(path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with open(full_path, "wb") as f:
+            f.write(data)
+
+    def _write_stream(self, path: str, reader: StreamReader) -> None:
+        # written next to the target and renamed, readers never see half a file
+        full_path = self.full_path(path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        part_path = f"{full_path}.part"
+        try:
+            with open(part_path, "wb") as f:
+                while True:
+                    chunk = reader.read(STREAM_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    f.write(chunk)
+            os.replace(part_path, full_path)
+        finally:
+            if os.path.exists(part_path):
+                os.remove(part_path)
+
+    def _existing(self, path: str) -> str:
+        full_path = self.full_path(path)
+        if not os.path.isfile(full_path):
+            raise FileNotFoundError(path)
+        return full_path
+
+    def _copy(self, source: str, destination: str) -> None:
+        self._copy_in(destination, self._existing(source))
+
+    def _copy_in(self, path: str, local_path: str) -> None:
+        full_path = self.full_path(path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        copyfile(local_path, full_path)
+
+    def _read(self, path: str) -> Optional[bytes]:
+        full_path = self.full_path(path)
+        if not os.path.exists(full_path):
+            return None
+        with open(full_path, "rb") as f:
+            return f.read()
+
+    def _copy_out(self, path: str, local_path: str) -> bool:
+        full_path = self.full_path(path)
+        if not os.path.exists(full_path):
+            return False
+        copyfile(full_path, local_path)
+        return True
+
+    def _stat(self, path: str) -> Optional[ObjectInfo]:
+        full_path = self.full_path(path)
+        if not os.path.isfile(full_path):
+            return None
+        st = os.stat(full_path)
+        return ObjectInfo(
+            path=path,
+            size=st.st_size,
+            etag=f"{st.st_mtime_ns:x}-{st.st_size:x}",
+            content_type=mimetypes.guess_type(path)[0] or DEFAULT_CONTENT_TYPE,
+            last_modified=datetime.fromtimestamp(st.st_mtime, tz=timezone.utc),
+        )
+
+    def _open(self, path: str, offset: int) -> BinaryIO:
+        full_path = self.full_path(path)
+        if not os.path.isfile(full_path):
+            raise FileNotFoundError(path)
+        f = open(full_path, "rb")
+        f.seek(offset)
+        return f
+
+    async def _iter_file(self, f: BinaryIO, length: Optional[int]) -> AsyncIterator[bytes]:
+        try:
+            remaining = length
+            while remaining is None or remaining > 0:
+                size = STREAM_CHUNK_SIZE if remaining is None else min(STREAM_CHUNK_SIZE, remaining)
+                chunk = await run_blocking(self.timeout, f.read, size)
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+        finally:
+            f.close()
+
+    def _delete(self, path: str) -> None:
+        full_path = self.full_path(path)
+        if os.path.exists(full_path):
+            os.remove(full_path)
+
+    def _move(self, source: str, destination: str) -> None:
+        full_path = self.full_path(destination)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        move(self.full_path(source), full_path)
+
+    def _list(self, prefix: str) -> List[str]:
+        paths = []
+        for root, _, files in os.walk(self.folder):
+            for name in files:
+                path = os.path.relpath(os.path.join(root, name), self.folder)
+                path = path.replace(os.sep, "/")
+                if path.startswith(prefix):
+                    paths.append(path)
+        return sorted(paths)
+
+    @property
+    def namespace(self):
+        return f"local:{self.folder}"
+
+    async def put_bytes(self, path, data, content_type=None):
+        self.forget(path)
+        await run_blocking(self.timeout, self._write, path, data)
+        return path
+
+    async def put_stream(self, path, source, content_type=None):
+        self.forget(path)
+        return await run_stream_upload(self.timeout, self._write_stream, path, source)
+
+    async def put_file(self, path, local_path, content_type=None):
+        self.forget(path)
+        await run_blocking(self.timeout, self._copy_in, path, local_path)
+        return path
+
+    async def get_bytes(self, path):
+        return await run_blocking(self.timeout, self._read, path)
+
+    async def get_file(self, path, local_path):
+        return await run_blocking(self.timeout, self._copy_out, path, local_path)
+
+    async def load_stat(self, path):
+        return await run_blocking(self.timeout, self._stat, path)
+
+    async def open_range(self, path, offset=0, length=None, etag=None):
+        if etag is not None:
+            info = await self.load_stat(path)
+            if info is None:
+                raise FileNotFoundError(path)
+            if info.etag != etag:
+                raise ValueError("File berubah, etag tidak cocok")
+        f = await run_blocking(self.timeout, self._open, path, offset)
+        return self._iter_file(f, length)
+
+    async def delete(self, path):
+        self.forget(path)
+        await run_blocking(self.timeout, self._delete, path)
+
+    async def copy(self, source, destination):
+        self.forget(destination)
+        await run_blocking(self.timeout, self._copy, source, destination)
+
+    async def move(self, source, destination):
+        self.forget(source, destination)
+        await run_blocking(self.timeout, self._move, source, destination)
+
+    async def move_many(self, pairs):
+        # a rename is already atomic, no copy + delete needed
+        return await run_batch(
+            (source, lambda source=source, destination=destination: self.move(source, destination))
+            for source, destination in pairs
+        )
+
+    async def list(self, prefix=""):
+        return await run_blocking(self.timeout, self._list, prefix)
+
+    async def url(self, path, expires=timedelta(hours=48)):
+        # signed like a presigned url, checked by routes.file
+        expires_at = int(time.time() + expires.total_seconds())
+        return (
+            f"{self.base_url}/minio/download/?minio_path={quote(path)}"
+            f"&expires={expires_at}&signature={sign_download(path, expires_at)}"
+        )
+
+
+class MemoryStorage(StorageBackend):
+    """
+    objects live in a dict, nothing leaves the process (tests, benchmarks)
+    """
+    name = "memory"
+
+    def __init__(self) -> None:
+        self.objects: Dict[str, Tuple[bytes, str]] = {}
+
+    async def put_bytes(self, path, data, content_type=None):
+        self.forget(path)
+        self.objects[path] = (bytes(data), content_type or DEFAULT_CONTENT_TYPE)
+        return path
+
+    async def put_file(self, path, local_path, content_type=None):
+        with open(local_path, "rb") as f:
+            return await self.put_bytes(path, f.read(), content_type)
+
+    async def get_bytes(self, path):
+        item = self.objects.get(path)
+        return item[0] if item is not None else None
+
+    async def get_file(self, path, local_path):
+        data = await self.get_bytes(path)
+        if data is None:
+            return False
+        with open(local_path, "wb") as f:
+            f.write(data)
+        return True
+
+    async def load_stat(self, path):
+        item = self.objects.get(path)
+        if item is None:
+            return None
+        data, content_type = item
+        return ObjectInfo(
+            path=path,
+            size=len(data),
+            etag=hashlib.md5(data).hexdigest(),
+            content_type=content_type,
+        )
+
+    async def open_range(self, path, offset=0, length=None, etag=None):
+        info = await self.load_stat(path)
+        if info is None:
+            raise FileNotFoundError(path)
+        if etag is not None and info.etag != etag:
+            raise ValueError("File berubah, etag tidak cocok")
+        data = self.objects[path][0]
+        end = len(data) if length is None else offset + length
+
+        async def chunks():
+            for start in range(offset, end, STREAM_CHUNK_SIZE):
+                yield data[start:min(start + STREAM_CHUNK_SIZE, end)]
+
+        return chunks()
+
+    async def delete(self, path):
+        self.forget(path)
+        self.objects.pop(path, None)
+
+    async def copy(self, source, destination):
+        if source not in self.objects:
+            raise FileNotFoundError(source)
+        self.forget(destination)
+        self.objects[destination] = self.objects[source]
+
+    async def move(self, source, destination):
+        if source not in self.objects:
+            raise FileNotFoundError(source)
+        self.forget(source, destination)
+        self.objects[destination] = self.objects.pop(source)
+
+    async def list(self, prefix=""):
+        return sorted(x for x in self.objects if x.startswith(prefix))
+
+    async def url(self, path, expires=timedelta(hours=48)):
+        return f"memory://{path}" if path in self.objects else None
+
+
+def sign_download(path: str, expires_at: int) -> str:
+    message = f"{path}:{expires_at}".encode()
+    return hmac.new(SECRET_KEY.encode(), message, hashlib.sha256).hexdigest()
+
+
+def verify_download(path: str, expires_at: int, signature: str) -> bool:
+    if expires_at < time.time():
+        return False
+    return hmac.compare_digest(sign_download(path, expires_at), signature)
+
+
+def make_storage(adapter: str = FILE_STORAGE_ADAPTER) -> StorageBackend:
+    if adapter == "local":
+        return LocalStorage()
+    if adapter == "minio":
+        return MinioStorage()
+    if adapter == "memory":
+        return MemoryStorage()
+    raise ValueError("adapter should local, minio or memory")
+
+
+_storage: Optional[StorageBackend] = None
+
+
+def get_storage() -> StorageBackend:
+    """
+    the configured backend of this worker
+    """
+    global _storage
+    if _storage is None:
+        _storage = make_storage()
+    return _storage
+
+
+def set_storage(storage: Optional[StorageBackend]) -> None:
+    """
+    swap the backend (tests, benchmarks), None goes back to FILE_STORAGE_ADAPTER
+    """
+    global _storage
+    _storage = storage
+
+
+_bucket_storages: Dict[str, MinioStorage] = {}
+
+
+def minio_storage(bucket: Optional[str] = None) -> MinioStorage:
+    """
+    MinioStorage of one bucket, every bucket shares the client and its pool
+    """
+    bucket = bucket or MINIO_BUCKET
+    storage = get_storage()
+    if isinstance(storage, MinioStorage) and storage.bucket == bucket:
+        return storage
+    if bucket not in _bucket_storages:
+        _bucket_storages[bucket] = MinioStorage(bucket=bucket)
+    return _bucket_storages[bucket]
+
+
+def get_stat_cache_stats() -> Dict[str, Any]:
+    return stat_cache.stats()
+
+
+def shutdown_storage() -> None:
+    storage_executor.shutdown(wait=False)
+    if _minio_http is not None:
+        _minio_http.clear()
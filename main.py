@@ -1,4 +1,6 @@
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 import sentry_sdk
@@ -7,11 +9,21 @@ from settings import (
     SENTRY_DSN,
     SENTRY_TRACES_SAMPLE_RATES,
     FILE_STORAGE_ADAPTER,
-    ENVIRONTMENT
+    ENVIRONTMENT,
+    CATALOG_LISTEN,
+    STATS_LOG_INTERVAL,
 )
 from core.logging_config import logger
+from core.responses import common_response, Unauthorized, Forbidden
+from core.security import AuthenticationFailed, PermissionDenied
+from models import async_session, engine
+from core.catalog import CatalogListener
+from core.metrics import log_runtime_stats, log_runtime_stats_forever
+from core.storage import shutdown_storage
+from repository.auth import warm_menu_cache
 from routes.auth import router as auth_router
 from routes.rbac import router as rbac_router
+from routes.file import router as file_router
 from fastapi.responses import HTMLResponse
 import os
 
@@ -26,10 +38,40 @@ if SENTRY_DSN != None:  # NOQA
     )
 
 # END OF INISIALISASI CRONJOB
+async def warm_menu():
+    async with async_session() as db:
+        warmed = await warm_menu_cache(db)
+    logger.info(f"Menu cache warmed for {warmed} role combinations")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # --- startup ---
+    catalog_listener = None
+    if CATALOG_LISTEN:
+        # menu entries only get the full TTL once the listener is connected,
+        # so the menu is warmed after every (re)connect instead of at startup
+        catalog_listener = CatalogListener(
+            engine.url.set(drivername="postgresql").render_as_string(hide_password=False),
+            on_connect=warm_menu,
+        )
+        catalog_listener.start()
+    stats_task = None
+    if STATS_LOG_INTERVAL > 0:
+        stats_task = asyncio.create_task(log_runtime_stats_forever(STATS_LOG_INTERVAL))
+    yield
     # --- shutdown ---
+    if stats_task is not None:
+        stats_task.cancel()
+        log_runtime_stats()
+    if catalog_listener is not None:
+        await catalog_listener.stop()
+    shutdown_storage()
+
 # Inisialisasi FastAPI berdasarkan ENVIRONTMENT
 fastapi_kwargs = {
     "title": "Telkom AI",
+    "lifespan": lifespan,
     "swagger_ui_oauth2_redirect_url": "/docs/oauth2-redirect",
     "swagger_ui_init_oauth": {
         "clientId": "your-client-id",
@@ -64,8 +106,19 @@ if FILE_STORAGE_ADAPTER != 'minio':
 
 
 
+@app.exception_handler(AuthenticationFailed)
+async def authentication_failed_handler(request: Request, exc: AuthenticationFailed):
+    return common_response(Unauthorized())
+
+
+@app.exception_handler(PermissionDenied)
+async def permission_denied_handler(request: Request, exc: PermissionDenied):
+    return common_response(Forbidden())
+
+
 app.include_router(auth_router, prefix="/auth")
 app.include_router(rbac_router, prefix="/rbac")
+app.include_router(file_router, prefix="/minio")
 
 
 
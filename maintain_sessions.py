@@ -0,0 +1,14 @@
+# maintain_sessions.py
+# jalankan harian (cron): buat partisi user_token ke depan dan drop partisi yang sudah expired
+import asyncio
+from models import engine
+from core.session_partitions import maintain_session_partitions
+
+async def run():
+    async with engine.begin() as conn:
+        result = await maintain_session_partitions(conn)
+    print(f"Partitions created: {result['created']}")
+    print(f"Partitions dropped: {result['dropped']}")
+
+if __name__ == "__main__":
+    asyncio.run(run())
@@ -1,6 +1,7 @@
 # migrate.py
 import asyncio
 from models import Base, engine
+from migrations import MIGRATIONS
 
 async def run():
     # create_all harus dijalankan di context sync, gunakan run_sync
@@ -8,5 +9,10 @@ async def run():
         await conn.run_sync(Base.metadata.create_all)
     print("All tables created.")
 
+    for migration in MIGRATIONS:
+        async with engine.begin() as conn:
+            await migration.upgrade(conn)
+        print(f"Migration {migration.__name__} applied.")
+
 if __name__ == "__main__":
-    asyncio.run(run())
\ No newline at end of file
+    asyncio.run(run())
@@ -0,0 +1,25 @@
+# Ordered data/schema migrations run by migrate.py after Base.metadata.create_all.
+# Every migration must be idempotent: it runs on fresh and on existing databases.
+from migrations import (
+    m001_user_token_hash,
+    m002_user_token_partitioned,
+    m003_user_effective_permission,
+    m004_role_permission_unique,
+    m005_catalog_notify,
+    m006_user_keyset_index,
+    m007_user_search_trgm,
+    m008_effective_permission_catalog_refresh,
+    m009_user_search_gist,
+)
+
+MIGRATIONS = [
+    m001_user_token_hash,
+    m002_user_token_partitioned,
+    m003_user_effective_permission,
+    m004_role_permission_unique,
+    m005_catalog_notify,
+    m006_user_keyset_index,
+    m007_user_search_trgm,
+    m008_effective_permission_catalog_refresh,
+    m009_user_search_gist,
+]
@@ -0,0 +1,60 @@
+"""
+user_token: raw jwt column -> sha256 token_hash (unique index) + expires_at.
+
+Existing rows are backfilled set-based inside postgres, expires_at is read
+from the `exp` claim of the stored jwt payload (base64url json segment).
+"""
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+from migrations.utils import has_column
+
+
+async def upgrade(conn: AsyncConnection):
+    if not await has_column(conn, "user_token", "token"):
+        return
+
+    await conn.execute(text("ALTER TABLE user_token ADD COLUMN IF NOT EXISTS token_hash varchar(64)"))
+    await conn.execute(text("ALTER TABLE user_token ADD COLUMN IF NOT EXISTS expires_at timestamptz"))
+    await conn.execute(text(
+        """
+        UPDATE user_token
+        SET token_hash = encode(sha256(convert_to(token, 'UTF8')), 'hex')
+        WHERE token_hash IS NULL
+        """
+    ))
+    await conn.execute(text(
+        """
+        UPDATE user_token
+        SET expires_at = to_timestamp((
+            convert_from(
+                decode(
+                    rpad(
+                        translate(split_part(token, '.', 2), '-_', '+/'),
+                        ((length(split_part(token, '.', 2)) + 3) / 4) * 4,
+                        '='
+                    ),
+                    'base64'
+                ),
+                'UTF8'
+            )::json ->> 'exp'
+        )::bigint)
+        WHERE expires_at IS NULL
+        """
+    ))
+    # the same jwt could be stored twice, keep the newest row
+    await conn.execute(text(
+        """
+        DELETE FROM user_token a
+        USING user_token b
+        WHERE a.token_hash = b.token_hash AND a.id < b.id
+        """
+    ))
+    await conn.execute(text("UPDATE user_token SET isact = true WHERE isact IS NULL"))
+    await conn.execute(text("ALTER TABLE user_token ALTER COLUMN token_hash SET NOT NULL"))
+    await conn.execute(text("ALTER TABLE user_token ALTER COLUMN expires_at SET NOT NULL"))
+    await conn.execute(text("ALTER TABLE user_token ALTER COLUMN isact SET DEFAULT true"))
+    await conn.execute(text("ALTER TABLE user_token ALTER COLUMN isact SET NOT NULL"))
+    await conn.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_user_token_token_hash ON user_token (token_hash)"
+    ))
+    await conn.execute(text("ALTER TABLE user_token DROP COLUMN token"))
@@ -0,0 +1,51 @@
+"""
+user_token -> daily range partitions on issued_at (see core.session_partitions).
+
+A plain table can not be turned into a partitioned one in place, so the old
+table is renamed, the partitioned table is created from the model and only
+sessions that are still active and not expired are copied over. Those rows
+have no issued_at, they are put in today's partition which is kept longer
+than any token lifetime; their lookups fall back to the token_hash probe.
+"""
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+from core.session_partitions import ensure_session_partitions
+from models import Base
+from models.UserToken import UserToken
+
+
+async def is_partitioned(conn: AsyncConnection, table: str) -> bool:
+    result = await conn.execute(
+        text(
+            """
+            SELECT 1 FROM pg_partitioned_table p
+            JOIN pg_class c ON c.oid = p.partrelid
+            WHERE c.oid = CAST(:table AS regclass)
+            """
+        ),
+        {"table": table},
+    )
+    return result.scalar() is not None
+
+
+async def upgrade(conn: AsyncConnection):
+    if await is_partitioned(conn, "user_token"):
+        await ensure_session_partitions(conn)
+        return
+
+    await conn.execute(text("ALTER TABLE user_token RENAME TO user_token_old"))
+    await conn.execute(text("ALTER SEQUENCE IF EXISTS user_token_id_seq RENAME TO user_token_old_id_seq"))
+    await conn.execute(text("DROP INDEX IF EXISTS ix_user_token_token_hash"))
+    await conn.execute(text("DROP INDEX IF EXISTS ix_user_token_emp_id"))
+    await conn.execute(text("DROP INDEX IF EXISTS ix_user_token_id"))
+    await conn.run_sync(Base.metadata.create_all, tables=[UserToken.__table__])
+    await ensure_session_partitions(conn)
+    await conn.execute(text(
+        """
+        INSERT INTO user_token (emp_id, token_hash, issued_at, expires_at, isact)
+        SELECT emp_id, token_hash, now(), expires_at, isact
+        FROM user_token_old
+        WHERE isact = true AND expires_at > now()
+        """
+    ))
+    await conn.execute(text("DROP TABLE user_token_old"))
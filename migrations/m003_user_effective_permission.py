@@ -0,0 +1,16 @@
+"""
+user_effective_permission read model: create the table and fill it for
+every existing user. Re-running refreshes all rows.
+"""
+from sqlalchemy.ext.asyncio import AsyncConnection
+from models import Base
+from models.User import User
+from models.UserEffectivePermission import UserEffectivePermission
+from repository.effective_permission import effective_permission_upsert
+
+
+async def upgrade(conn: AsyncConnection):
+    await conn.run_sync(
+        Base.metadata.create_all, tables=[UserEffectivePermission.__table__]
+    )
+    await conn.execute(effective_permission_upsert())
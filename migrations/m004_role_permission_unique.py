@@ -0,0 +1,28 @@
+"""
+role_permission: one row per (role_id, permission_id), needed by the bulk
+upsert (INSERT ... ON CONFLICT (role_id, permission_id)). Duplicates keep
+the newest row.
+"""
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+from migrations.utils import has_constraint
+
+CONSTRAINT = "uq_role_permission_role_id_permission_id"
+
+
+async def upgrade(conn: AsyncConnection):
+    if await has_constraint(conn, "role_permission", CONSTRAINT):
+        return
+
+    await conn.execute(text(
+        """
+        DELETE FROM role_permission a
+        USING role_permission b
+        WHERE a.role_id = b.role_id
+          AND a.permission_id = b.permission_id
+          AND a.id < b.id
+        """
+    ))
+    await conn.execute(text(
+        f"ALTER TABLE role_permission ADD CONSTRAINT {CONSTRAINT} UNIQUE (role_id, permission_id)"
+    ))
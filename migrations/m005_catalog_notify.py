@@ -0,0 +1,32 @@
+"""
+NOTIFY catalog_changed with the table name after any write to the catalog
+tables, consumed by core.catalog.CatalogListener. Statement level triggers:
+a bulk update sends one notification, and postgres folds duplicates sent in
+the same transaction.
+"""
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+from core.catalog import CATALOG_CHANNEL, CATALOG_DEPENDENCIES
+
+
+async def upgrade(conn: AsyncConnection):
+    await conn.execute(text(
+        f"""
+        CREATE OR REPLACE FUNCTION notify_catalog_changed() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify('{CATALOG_CHANNEL}', TG_TABLE_NAME);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    ))
+    for table in CATALOG_DEPENDENCIES:
+        trigger = f"{table}_catalog_changed"
+        await conn.execute(text(f"DROP TRIGGER IF EXISTS {trigger} ON {table}"))
+        await conn.execute(text(
+            f"""
+            CREATE TRIGGER {trigger}
+            AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {table}
+            FOR EACH STATEMENT EXECUTE FUNCTION notify_catalog_changed()
+            """
+        ))
@@ -0,0 +1,17 @@
+"""
+user: partial index on (created_at, id) WHERE isact for keyset paging.
+Rows without created_at would fall out of the keyset order, they get
+updated_at (or the migration time) first.
+"""
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+
+async def upgrade(conn: AsyncConnection):
+    await conn.execute(text(
+        'UPDATE "user" SET created_at = coalesce(updated_at, now()) WHERE created_at IS NULL'
+    ))
+    await conn.execute(text(
+        'CREATE INDEX IF NOT EXISTS ix_user_active_created_at_id '
+        'ON "user" (created_at, id) WHERE isact = true'
+    ))
@@ -0,0 +1,18 @@
+"""
+user search: pg_trgm GIN indexes on name, email and phone of active users,
+used by repository.auth.search_user (ILIKE '%q%' and word similarity).
+Kept out of the model because create_all runs before the extension exists.
+"""
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+SEARCH_COLUMNS = ["name", "email", "phone"]
+
+
+async def upgrade(conn: AsyncConnection):
+    await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    for column in SEARCH_COLUMNS:
+        await conn.execute(text(
+            f'CREATE INDEX IF NOT EXISTS ix_user_{column}_trgm '
+            f'ON "user" USING gin ({column} gin_trgm_ops) WHERE isact = true'
+        ))
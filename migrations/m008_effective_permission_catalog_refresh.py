@@ -0,0 +1,120 @@
+"""
+Keep user_effective_permission in step with the permission and module
+tables. Grants (role_permission, user_role) are refreshed by the repository
+write paths; deactivating, renaming, moving or deleting a permission or
+renaming a module changes the stored permission ids and detail of the users
+holding it. Statement triggers read the transition tables, collect the
+changed permission ids and refresh only the users that reach them through
+role_permission -> user_role or still have them in the read model. Deleting
+a module cascades to its permissions and is handled by their trigger.
+"""
+from sqlalchemy import func, literal_column, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import AsyncConnection
+from models.User import User
+from repository.effective_permission import effective_permission_upsert
+
+# trigger name -> (table, event, referencing, changed permission ids)
+TRIGGERS = {
+    "permission_effective_permission_update": (
+        "permission",
+        "UPDATE",
+        "OLD TABLE AS old_rows NEW TABLE AS new_rows",
+        """
+        SELECT new_rows.id FROM new_rows
+        JOIN old_rows ON old_rows.id = new_rows.id
+        WHERE (old_rows.isact, old_rows.name, old_rows.module_id)
+              IS DISTINCT FROM (new_rows.isact, new_rows.name, new_rows.module_id)
+        """,
+    ),
+    "permission_effective_permission_delete": (
+        "permission",
+        "DELETE",
+        "OLD TABLE AS old_rows",
+        "SELECT old_rows.id FROM old_rows",
+    ),
+    "module_effective_permission_update": (
+        "module",
+        "UPDATE",
+        "OLD TABLE AS old_rows NEW TABLE AS new_rows",
+        """
+        SELECT permission.id FROM permission
+        JOIN new_rows ON new_rows.id = permission.module_id
+        JOIN old_rows ON old_rows.id = new_rows.id
+        WHERE old_rows.name IS DISTINCT FROM new_rows.name
+        """,
+    ),
+}
+
+# statement-wide triggers of the first version of this migration
+REPLACED_TRIGGERS = {
+    "permission_effective_permission_refresh": "permission",
+    "module_effective_permission_refresh": "module",
+}
+
+
+async def upgrade(conn: AsyncConnection):
+    for trigger, table in REPLACED_TRIGGERS.items():
+        await conn.execute(text(f"DROP TRIGGER IF EXISTS {trigger} ON {table}"))
+    await conn.execute(text("DROP FUNCTION IF EXISTS refresh_user_effective_permission()"))
+
+    await conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_user_effective_permission_permission_ids "
+        "ON user_effective_permission USING gin (permission_ids)"
+    ))
+    await conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_user_role_role_id ON user_role (role_id)"
+    ))
+
+    upsert = effective_permission_upsert(
+        User.id == func.any(literal_column("affected"))
+    ).compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True})
+    await conn.execute(text(
+        f"""
+        CREATE OR REPLACE FUNCTION refresh_user_effective_permission_of(changed integer[])
+        RETURNS void AS $$
+        DECLARE
+            affected varchar[];
+        BEGIN
+            IF changed IS NULL OR cardinality(changed) = 0 THEN
+                RETURN;
+            END IF;
+            SELECT array_agg(DISTINCT users.user_id) INTO affected FROM (
+                SELECT user_role.emp_id AS user_id
+                FROM role_permission
+                JOIN user_role ON user_role.role_id = role_permission.role_id
+                WHERE role_permission.isact = true
+                  AND role_permission.permission_id = ANY(changed)
+                UNION
+                SELECT user_effective_permission.user_id
+                FROM user_effective_permission
+                WHERE user_effective_permission.permission_ids && changed
+            ) users;
+            IF affected IS NULL THEN
+                RETURN;
+            END IF;
+            {upsert};
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    ))
+    for trigger, (table, event, referencing, changed) in TRIGGERS.items():
+        await conn.execute(text(
+            f"""
+            CREATE OR REPLACE FUNCTION {trigger}() RETURNS trigger AS $$
+            BEGIN
+                PERFORM refresh_user_effective_permission_of(ARRAY({changed}));
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql
+            """
+        ))
+        await conn.execute(text(f"DROP TRIGGER IF EXISTS {trigger} ON {table}"))
+        await conn.execute(text(
+            f"""
+            CREATE TRIGGER {trigger}
+            AFTER {event} ON {table}
+            REFERENCING {referencing}
+            FOR EACH STATEMENT EXECUTE FUNCTION {trigger}()
+            """
+        ))
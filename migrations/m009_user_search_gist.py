@@ -0,0 +1,18 @@
+"""
+user search: partial trigram GiST indexes on name, email and phone of
+active users. search_user bounds its candidates with a KNN scan
+(ORDER BY column <->> q LIMIT n), which GIN can not serve; the GIN indexes
+of m007 stay for the ILIKE filter of list_user.
+"""
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+from migrations.m007_user_search_trgm import SEARCH_COLUMNS
+
+
+async def upgrade(conn: AsyncConnection):
+    await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    for column in SEARCH_COLUMNS:
+        await conn.execute(text(
+            f'CREATE INDEX IF NOT EXISTS ix_user_{column}_trgm_gist '
+            f'ON "user" USING gist ({column} gist_trgm_ops) WHERE isact = true'
+        ))
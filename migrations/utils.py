@@ -0,0 +1,24 @@
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+
+async def has_column(conn: AsyncConnection, table: str, column: str) -> bool:
+    result = await conn.execute(
+        text(
+            "SELECT 1 FROM information_schema.columns "
+            "WHERE table_schema = current_schema() AND table_name = :table AND column_name = :column"
+        ),
+        {"table": table, "column": column},
+    )
+    return result.scalar() is not None
+
+
+async def has_constraint(conn: AsyncConnection, table: str, constraint: str) -> bool:
+    result = await conn.execute(
+        text(
+            "SELECT 1 FROM pg_constraint "
+            "WHERE conrelid = CAST(:table AS regclass) AND conname = :constraint"
+        ),
+        {"table": table, "constraint": constraint},
+    )
+    return result.scalar() is not None
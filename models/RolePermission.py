@@ -1,4 +1,4 @@
-from sqlalchemy import Column, ForeignKey, Integer, Table, Boolean
+from sqlalchemy import Column, ForeignKey, Integer, Table, Boolean, UniqueConstraint
 from sqlalchemy.orm import relationship
 from models import Base
 
@@ -37,5 +37,10 @@ RolePermission = Table(
         Boolean,
         nullable=False,
         server_default="false"
-    )
+    ),
+    UniqueConstraint(
+        "role_id",
+        "permission_id",
+        name="uq_role_permission_role_id_permission_id",
+    ),
 )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, ForeignKey, Integer, UUID, TIMESTAMP, func, Boolean, DateTime
+from sqlalchemy import Column, String, ForeignKey, Integer, UUID, TIMESTAMP, func, Boolean, DateTime, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declarative_base
 import uuid
@@ -10,6 +10,15 @@ from sqlalchemy.sql import func
 
 class User(Base):
     __tablename__ = "user"
+    __table_args__ = (
+        # keyset paging of active users, see repository.auth.list_user_keyset
+        Index(
+            "ix_user_active_created_at_id",
+            "created_at",
+            "id",
+            postgresql_where="isact = true",
+        ),
+    )
 
     id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()), index=True)
     created_by = Column(String(36), nullable=False)
@@ -0,0 +1,23 @@
+from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, func
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB
+from models import Base
+
+
+class UserEffectivePermission(Base):
+    """
+    read model: effective roles/permissions per user, maintained by
+    repository.effective_permission.refresh_effective_permissions
+    """
+    __tablename__ = "user_effective_permission"
+
+    user_id = Column(
+        String(36),
+        ForeignKey("user.id", onupdate="CASCADE", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    role_ids = Column(ARRAY(Integer), nullable=False, server_default="{}")
+    permission_ids = Column(ARRAY(Integer), nullable=False, server_default="{}")
+    module_names = Column(ARRAY(String), nullable=False, server_default="{}")
+    # [{"id", "name", "module_id", "module"}] sorted by id, for /auth/permissions
+    permissions = Column(JSONB, nullable=False, server_default="[]")
+    refreshed_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -1,13 +1,21 @@
 import uuid
-from sqlalchemy import Boolean, Column, String, Integer
+from sqlalchemy import Boolean, Column, String, Integer, DateTime, Index
 from sqlalchemy.dialects.postgresql import UUID
 from typing import List
 from models import Base
 
 class UserToken(Base):
     __tablename__ = "user_token"
+    # range partitioned per issue day (core.session_partitions), expired days are dropped whole
+    __table_args__ = (
+        Index("ix_user_token_token_hash", "token_hash", "issued_at", unique=True),
+        {"postgresql_partition_by": "RANGE (issued_at)"},
+    )
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    issued_at = Column(DateTime(timezone=True), primary_key=True, nullable=False)
     emp_id = Column(String(36), nullable=False, index=True)
-    token = Column(String, nullable=False)
-    isact = Column(Boolean, default=True)
+    # sha256 hex of the jwt (core.security.hash_session_token), the raw token is never stored
+    token_hash = Column(String(64), nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+    isact = Column(Boolean, nullable=False, default=True, server_default="true")
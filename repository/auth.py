@@ -1,6 +1,6 @@
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, FrozenSet, Iterable, Tuple
 from pytz import timezone
-from sqlalchemy import or_, select, func, update, delete
+from sqlalchemy import and_, or_, select, func, update, delete, tuple_, literal, union
 from core.utils import generate_token, generate_token_custom
 from models.ForgotPassword import ForgotPassword
 from models.Menu import Menu
@@ -9,10 +9,10 @@ from models.Role import Role
 from models.UserRole import UserRole
 from models.User import User
 from models.UserToken import UserToken
+from models.UserEffectivePermission import UserEffectivePermission
 from schemas.auth import (
     LoginSuccessResponse,
     LoginRequest,
-    MenuDict,
     SignUpRequest,
     SignupRequest,
     EditPassRequest,
@@ -22,10 +22,22 @@ from schemas.auth import (
 from sqlalchemy.future import select
 from sqlalchemy.orm import selectinload
 from core.security import (
-    generate_hash_password,
-    get_user_permissions,
-    validated_user_password
+    generate_hash_password_async,
+    get_token_expires_at,
+    get_token_issued_at,
+    hash_session_token,
+    session_token_clause,
+    invalidate_cached_token,
+    invalidate_cached_user,
+    validated_user_password_async
 )
+from core.executor import ExecutorOverloaded
+from core.principal import Principal
+from core.catalog import get_catalog_rows
+from core.counting import count_rows
+from core.pagination import NEXT, PREV, decode_cursor, encode_cursor
+from core.menu_cache import get_menu_generation, render_menu_body, set_cached_menu
+from repository.effective_permission import refresh_effective_permissions
 from sqlalchemy.orm import Session
 from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, timedelta
@@ -38,7 +50,7 @@ import secrets
 import string
 import traceback
 
-from settings import TZ
+from settings import TZ, USER_SEARCH_MIN_LENGTH, USER_SEARCH_MAX_LIMIT
 
 
 async def change_user_password_by_token(
@@ -56,7 +68,7 @@ async def change_user_password_by_token(
     user_id = forgot_password.user_id
     user = await db.execute(select(User).filter(User.id == user_id))
     user = user.scalar()
-    user.password = generate_hash_password(password=new_password)
+    user.password = await generate_hash_password_async(password=new_password)
     db.add(user)
     await db.execute(delete(ForgotPassword).where(ForgotPassword.user_id == user.id))
     await db.commit()
@@ -77,21 +89,22 @@ async def generate_token_forgot_password(db: AsyncSession, user: User) -> str:
         traceback.print_exc()
         raise ValueError("Failed to generate token forgot password")
 
-async def logout_user(db:AsyncSession, user:User, token:str):
+async def logout_user(db:AsyncSession, user:Principal, token:str):
     try:
         result = await db.execute(
             select(UserToken).filter(
+                session_token_clause(token),
                 UserToken.emp_id == user.id,
-                UserToken.token == token,
                 UserToken.isact == True
             )
         )
-        exist_data = await result.scalar()
+        exist_data = result.scalar()
         # print("exist data", exist_data)
         if exist_data is not None:
             exist_data.isact = False
             db.add(exist_data)
             await db.commit()
+            invalidate_cached_token(token)
         else:
             raise ValueError("User session not found")
         print("DISINI CO")
@@ -103,92 +116,101 @@ async def logout_user(db:AsyncSession, user:User, token:str):
     
 
 #function to resend otp for forget  passworw
-def expand_menu_tree_with_permissions(
-    db: Session, root_menu: List[Menu], permissions: List[Permission]
-) -> List[MenuDict]:
-    if len(root_menu) == 0:
-        return []
-    else:
-        return [
-            {
-                "id": y.id,
-                "url": y.url,
-                "name": y.name,
-                "icon": y.icon,
-                "is_has_child": y.is_has_child,
-                "isact": y.isact,
-                "is_show": y.is_show,
-                "order": y.order_id if y.order_id != None else 0,
-                "sub_menu": expand_menu_tree_with_permissions(
-                    db=db, root_menu=y.child, permissions=permissions
-                ),
-            }
-            for y in sorted(root_menu, key=lambda d: d.id)
-            if y.isact == True
-            and (
-                y.permission_id in [x.id for x in permissions]
-                # or y.permission_id == None
-            )
-        ]
-def prune_menu_tree(trees: List[MenuDict]) -> List[MenuDict]:
-    pruned_tree = []
-    for tree in trees:
-        if tree["is_has_child"] and len(tree["sub_menu"]) == 0:
+def build_menu_tree(rows: Iterable[Any], permission_ids: FrozenSet[int]) -> List[dict]:
+    """
+    rows: active menus (id, parent_id, name, icon, url, permission_id,
+    is_has_child, is_show, order_id) ordered by (order, id).
+    One pass links visible menus to their parent, a post-order walk prunes
+    menus that should have a child but have none left. O(n).
+    """
+    nodes: Dict[int, dict] = {}
+    children: Dict[Optional[int], List[int]] = {}
+    for row in rows:
+        if row.permission_id not in permission_ids:
             continue
-        elif tree["is_has_child"] and len(tree["sub_menu"]) > 0:
-            tree["sub_menu"] = prune_menu_tree(tree["sub_menu"])
-        pruned_tree.append(tree)
-    return pruned_tree
-def sort_menu_tree_by_order(trees: List[MenuDict]) -> List[MenuDict]:
-    return [
-        {
-            "id": y["id"],
-            "title": y["name"],
-            "path": y["url"],
-            "icon": y["icon"],
-            "is_show": y["is_show"],
-            # "is_has_child": y["is_has_child"],
-            # "is_active": y["is_active"],
-            # "order": y["order"],
-            "sub": sort_menu_tree_by_order(y["sub_menu"]) if len(y["sub_menu"]) > 0 else False,
+        nodes[row.id] = {
+            "id": row.id,
+            "title": row.name,
+            "path": row.url,
+            "icon": row.icon,
+            "is_show": row.is_show,
+            "sub": False,
+            "_has_child": row.is_has_child,
         }
-        for y in sorted(trees, key=lambda d: d["order"])
-    ]
-async def generate_menu_tree_for_user(db: Session, user: User) -> List[MenuDict]:
+        children.setdefault(row.parent_id, []).append(row.id)
+
+    def walk(menu_ids: List[int]) -> List[dict]:
+        tree = []
+        for menu_id in menu_ids:
+            node = nodes[menu_id]
+            sub = walk(children.get(menu_id, []))
+            has_child = node.pop("_has_child")
+            if has_child and not sub:
+                continue
+            node["sub"] = sub or False
+            tree.append(node)
+        return tree
+
+    return walk(children.get(None, []))
+
+
+async def load_menu_rows(db: Session) -> List[Any]:
+    """
+    every active menu, flat, ordered by (order, id), see build_menu_tree
+    """
+    return await get_catalog_rows(db, "menu")
+
+
+async def generate_menu_tree_for_user(db: Session, principal: Principal) -> List[dict]:
     try:
-        permissions = get_user_permissions(db=db, user=user)
-        query = select(Menu).options(
-                selectinload(Menu.child)
-            ).where(Menu.parent_id == None).order_by(Menu.id.asc())
-        result = await db.execute(query)
-        root_menu: List[Menu] = result.scalars().all()
-        menu_tree = expand_menu_tree_with_permissions(
-            db=db, root_menu=root_menu, permissions=permissions
-        )
-        menu_tree = prune_menu_tree(menu_tree)
-        menu_tree = sort_menu_tree_by_order(menu_tree)
-        print("menu tree", menu_tree)
-        return menu_tree
+        if not principal.permission_ids:
+            return []
+        return build_menu_tree(await load_menu_rows(db), principal.permission_ids)
     except Exception as e:
         traceback.print_exc()
         print("Error generate menu tree for user", e)
         raise ValueError("Failed to generate menu tree for user")
 
+
+async def warm_menu_cache(db: Session) -> int:
+    """
+    render the menu of every role combination that exists in
+    user_effective_permission, two queries in total. Returns the number of
+    combinations cached.
+    """
+    generation = get_menu_generation()
+    rows = await load_menu_rows(db)
+    result = await db.execute(
+        select(UserEffectivePermission.role_ids, UserEffectivePermission.permission_ids).distinct()
+    )
+    warmed = 0
+    for role_ids, permission_ids in result.all():
+        menu_tree = build_menu_tree(rows, frozenset(permission_ids))
+        set_cached_menu(role_ids, render_menu_body(menu_tree), generation)
+        warmed += 1
+    return warmed
+
 async def create_user_session(db: Session, user_id: str, token:str) -> str:
     try:
         exist_data = await db.execute(
             select(UserToken).filter(
-                UserToken.emp_id == user_id,
-                UserToken.token == token
+                session_token_clause(token),
+                UserToken.emp_id == user_id
             )
         )
         exist_data = exist_data.scalar()
         if exist_data is not None:
-            exist_data.is_active = True
+            exist_data.isact = True
             db.add(exist_data)
             await db.commit()
         else:
-            user_token = UserToken(emp_id=user_id, token=token)
+            user_token = UserToken(
+                emp_id=user_id,
+                token_hash=hash_session_token(token),
+                issued_at=get_token_issued_at(token) or datetime.now(timezone("UTC")),
+                expires_at=get_token_expires_at(token),
+                isact=True,
+            )
             db.add(user_token)
             await db.commit()
         return 'succes'
@@ -298,7 +320,7 @@ async def change_password(db, token, password):
             raise ValueError("Token has expired.")
 
         # 3. Hash the new password
-        hashed_password = generate_hash_password(password)
+        hashed_password = await generate_hash_password_async(password)
 
         # 4. Update the password in the user_tenant table
         update_response = (
@@ -344,7 +366,7 @@ async def login(
         user_data = response.data[0]
         
         # Debug logs for hash comparison
-        generated_hash = validated_user_password(
+        generated_hash = await validated_user_password_async(
             user_data["password"],
             request.password
         )
@@ -518,9 +540,11 @@ async def check_user_password(db: AsyncSession, email: str, password: str) -> Op
         if user is None:
             return None
         else:
-            if validated_user_password(user.password, password):
+            if await validated_user_password_async(user.password, password):
                 return user
         return None
+    except ExecutorOverloaded:
+        raise
     except Exception as e:
         print("Error in check_user_password:", e)
         traceback.print_exc()
@@ -531,7 +555,7 @@ async def edit_password(
     db:any,
     request: EditPassRequest,
 ):
-    request.password = generate_hash_password(request.password)
+    request.password = await generate_hash_password_async(request.password)
     try:
         response = (
             db.table("users")
@@ -545,35 +569,194 @@ async def edit_password(
     except Exception  as e:
         raise ValueError(str(e))
     
+# partial index WHERE isact = true from migration m006
+ACTIVE_USER_INDEX = "ix_user_active_created_at_id"
+
+
+def list_user_filter(query, src: Optional[str] = None):
+    query = query.filter(User.isact == True)
+    if src:
+        query = query.filter(User.name.ilike(f"%{src}%"))
+    return query
+
+
+async def count_user(
+    db: AsyncSession,
+    src: Optional[str] = None,
+    count_strategy: Optional[str] = None,
+) -> Tuple[int, str]:
+    """
+    (count, strategy used), see core.counting. Without a search term the
+    estimate is reltuples of the partial index over active users (m006),
+    which counts exactly the rows the list shows.
+    """
+    return await count_rows(
+        db,
+        list_user_filter(select(User.id), src),
+        strategy=count_strategy,
+        cache_key=("user", src or ""),
+        filtered=bool(src),
+        table=None if src else ACTIVE_USER_INDEX,
+    )
+
+
 async def list_user(
     db: AsyncSession,
     page: int = 1,
     page_size: int = 10,
     src: Optional[str] = None,
+    with_count: bool = True,
+    count_strategy: Optional[str] = None,
 ):
+    """
+    offset paging, kept for existing clients; see list_user_keyset for deep pages.
+    returns (data, num_data, num_page, count_strategy), the last three are
+    None when with_count is False
+    """
     try:
         limit = page_size
         offset = (page - 1) * limit
 
-        query = select(User.id, User.name).filter(User.isact == True)
-        query_count = select(func.count(User.id)).filter(User.isact == True)
+        query = list_user_filter(select(User.id, User.name), src)
+        query = query.order_by(User.created_at.desc(), User.id.desc()).limit(limit).offset(offset)
 
-        if src:
-            query = query.filter(User.name.ilike(f"%{src}%"))
-            query_count = query_count.filter(User.name.ilike(f"%{src}%"))
+        result = await db.execute(query)
+        rows = result.all()
 
-        query = query.order_by(User.created_at.desc()).limit(limit).offset(offset)
+        data = [{"id": row.id, "name": row.name} for row in rows]
 
-        result = await db.execute(query)
-        rows = await result.all() 
+        num_data = num_page = strategy = None
+        if with_count:
+            num_data, strategy = await count_user(db, src, count_strategy)
+            num_page = (num_data + limit - 1) // limit
+
+        return (data, num_data, num_page, strategy)
+
+    except Exception as e:
+        raise ValueError(e)
+
+
+async def list_user_keyset(
+    db: AsyncSession,
+    page_size: int = 10,
+    src: Optional[str] = None,
+    cursor: Optional[str] = None,
+    with_count: bool = False,
+    count_strategy: Optional[str] = None,
+):
+    """
+    keyset paging on (created_at, id) desc, served by ix_user_active_created_at_id,
+    every page costs the same.
+    Returns (data, next_cursor, prev_cursor, num_data, count_strategy)
+    """
+    direction = NEXT
+    key = None
+    if cursor:
+        created_at, user_id, direction = decode_cursor(cursor)
+        key = tuple_(literal(created_at, User.created_at.type), literal(user_id, User.id.type))
+
+    try:
+        query = list_user_filter(select(User.id, User.name, User.created_at), src)
+        if direction == NEXT:
+            if key is not None:
+                query = query.filter(tuple_(User.created_at, User.id) < key)
+            query = query.order_by(User.created_at.desc(), User.id.desc())
+        else:
+            query = query.filter(tuple_(User.created_at, User.id) > key)
+            query = query.order_by(User.created_at.asc(), User.id.asc())
+        # one extra row tells whether there is another page in that direction
+        result = await db.execute(query.limit(page_size + 1))
+        rows = result.all()
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if direction == PREV:
+            rows = rows[::-1]
+
+        next_cursor = prev_cursor = None
+        if rows:
+            first, last = rows[0], rows[-1]
+            if direction == NEXT:
+                has_next, has_prev = has_more, key is not None
+            else:
+                has_next, has_prev = True, has_more
+            if has_next:
+                next_cursor = encode_cursor(last.created_at, last.id, NEXT)
+            if has_prev:
+                prev_cursor = encode_cursor(first.created_at, first.id, PREV)
 
         data = [{"id": row.id, "name": row.name} for row in rows]
+        num_data = strategy = None
+        if with_count:
+            num_data, strategy = await count_user(db, src, count_strategy)
+        return (data, next_cursor, prev_cursor, num_data, strategy)
 
-        count_result = await db.execute(query_count)
-        num_data = await count_result.scalar() 
-        num_page = (num_data + limit - 1) // limit
+    except Exception as e:
+        raise ValueError(e)
 
-        return (data, num_data, num_page)
+def escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def search_user_query(q: str, limit: int):
+    """
+    active users matching q by substring on name, email or phone or by word
+    similarity on the name, ranked by the best word similarity of the three
+    columns. Each column contributes its `limit` nearest matches through a
+    KNN scan (column <->> q, 1 - word_similarity) on the trigram GiST index
+    of migration m009, so only those few candidates are ranked, never every
+    ILIKE match. Any row of the overall top `limit` is in the top `limit` of
+    its best column.
+    """
+    pattern = f"%{escape_like(q)}%"
+    term = literal(q)
+    columns = [User.name, User.email, User.phone]
+    match = and_(
+        User.isact == True,
+        or_(
+            User.name.ilike(pattern),
+            User.email.ilike(pattern),
+            User.phone.ilike(pattern),
+            term.op("<%")(User.name),
+        ),
+    )
+    candidates = union(*[
+        select(User.id).filter(match).order_by(column.op("<->>")(term)).limit(limit)
+        for column in columns
+    ]).subquery()
+    score = func.greatest(*[func.word_similarity(term, column) for column in columns]).label("score")
+    return (
+        select(User.id, User.name, User.email, User.phone, score)
+        .filter(User.id.in_(select(candidates.c.id)))
+        .order_by(score.desc(), User.name.asc())
+        .limit(limit)
+    )
+
+
+async def search_user(
+    db: AsyncSession,
+    q: str,
+    limit: int = 10,
+) -> List[Dict[str, Any]]:
+    """
+    search active users by name, email or phone, see search_user_query. No count.
+    """
+    q = (q or "").strip()
+    if len(q) < USER_SEARCH_MIN_LENGTH:
+        return []
+    limit = max(1, min(limit, USER_SEARCH_MAX_LIMIT))
+
+    try:
+        result = await db.execute(search_user_query(q, limit))
+        return [
+            {
+                "id": row.id,
+                "name": row.name,
+                "email": row.email,
+                "phone": row.phone,
+                "score": round(float(row.score), 4),
+            }
+            for row in result.all()
+        ]
 
     except Exception as e:
         raise ValueError(e)
@@ -591,7 +774,7 @@ async def get_user_by_id(
         )
         
         result = await db.execute(query)
-        user = await result.scalar_one_or_none()
+        user = result.scalar_one_or_none()
         
         return user
 
@@ -622,15 +805,19 @@ async def edit_user(
             
             role_query = select(Role).filter(Role.id == request.role_id, Role.isact == True)
             role_result = await db.execute(role_query)
-            new_role = await role_result.scalar_one_or_none()
+            new_role = role_result.scalar_one_or_none()
             
             if new_role:
                 user.roles.append(new_role)
 
         db.add(user)
+        if request.role_id is not None:
+            await db.flush()
+            await refresh_effective_permissions(db, user_ids=[user.id])
         await db.commit()
         await db.refresh(user)
-        
+        invalidate_cached_user(user.id)
+
         return user
 
     except Exception as e:
@@ -641,12 +828,10 @@ async def get_role_options(
     db: AsyncSession,
 ) -> List[Dict[str, Any]]:
     try:
-        query = select(Role).filter(
-            Role.isact == True
-        ).order_by(Role.id.asc())
-
-        result = await db.execute(query)
-        roles = await result.scalars()
+        roles = [
+            role for role in await get_catalog_rows(db, "role")
+            if role.isact == True
+        ]
 
         role_options = [
             {
@@ -668,19 +853,22 @@ async def sign_up (
     request: SignUpRequest,
 ):
     try:
-        result = await db.execute(
-            select(Role)
-            .filter(Role.id == 1, Role.isact == True)
+        role = next(
+            (x for x in await get_catalog_rows(db, "role") if x.id == 1 and x.isact == True),
+            None,
         )
-        role = result.scalar()
+        if role is None:
+            raise ValueError("Role default tidak ditemukan")
         data =  User(
             email=request.email,
-            password=generate_hash_password(request.password),
+            password=await generate_hash_password_async(request.password),
             name=request.name,
             phone=request.phone,
         )
-        data.roles.append(role)
         db.add(data)
+        await db.flush()
+        await db.execute(UserRole.insert().values(emp_id=data.id, role_id=role.id))
+        await refresh_effective_permissions(db, user_ids=[data.id])
         await db.commit()
         return True
     except Exception as e:
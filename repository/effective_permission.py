@@ -0,0 +1,145 @@
+from typing import Any, Dict, Iterable, List, Optional
+from sqlalchemy import Integer, String, and_, or_, cast, distinct, func, literal_column, select
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import ColumnElement, Select
+from models.Module import Module
+from models.Permission import Permission
+from models.RolePermission import RolePermission
+from models.User import User
+from models.UserEffectivePermission import UserEffectivePermission
+from models.UserRole import UserRole
+
+
+def effective_permission_query(user_filter: Optional[ColumnElement] = None) -> Select:
+    """
+    one row per user: role ids, active permission ids, module names and
+    permission detail, aggregated over user_role -> role_permission -> permission -> module
+    """
+    permission_detail = func.jsonb_build_object(
+        literal_column("'id'"), Permission.id,
+        literal_column("'name'"), Permission.name,
+        literal_column("'module_id'"), Module.id,
+        literal_column("'module'"), Module.name,
+    )
+    query = (
+        select(
+            User.id.label("user_id"),
+            func.coalesce(
+                func.array_agg(distinct(UserRole.c.role_id)).filter(UserRole.c.role_id.isnot(None)),
+                cast(literal_column("'{}'"), ARRAY(Integer)),
+            ).label("role_ids"),
+            func.coalesce(
+                func.array_agg(distinct(Permission.id)).filter(Permission.id.isnot(None)),
+                cast(literal_column("'{}'"), ARRAY(Integer)),
+            ).label("permission_ids"),
+            func.coalesce(
+                func.array_agg(distinct(Module.name)).filter(Module.name.isnot(None)),
+                cast(literal_column("'{}'"), ARRAY(String)),
+            ).label("module_names"),
+            func.coalesce(
+                func.jsonb_agg(distinct(permission_detail)).filter(Permission.id.isnot(None)),
+                cast(literal_column("'[]'"), JSONB),
+            ).label("permissions"),
+            func.now().label("refreshed_at"),
+        )
+        .select_from(User)
+        .outerjoin(UserRole, UserRole.c.emp_id == User.id)
+        .outerjoin(
+            RolePermission,
+            and_(
+                RolePermission.c.role_id == UserRole.c.role_id,
+                RolePermission.c.isact == True,
+            ),
+        )
+        .outerjoin(
+            Permission,
+            and_(
+                Permission.id == RolePermission.c.permission_id,
+                Permission.isact == True,
+            ),
+        )
+        .outerjoin(Module, Module.id == Permission.module_id)
+        .group_by(User.id)
+    )
+    if user_filter is not None:
+        query = query.where(user_filter)
+    return query
+
+
+def effective_permission_upsert(user_filter: Optional[ColumnElement] = None):
+    """
+    INSERT ... SELECT ... ON CONFLICT (user_id) DO UPDATE, set-based in postgres
+    """
+    stmt = insert(UserEffectivePermission).from_select(
+        ["user_id", "role_ids", "permission_ids", "module_names", "permissions", "refreshed_at"],
+        effective_permission_query(user_filter),
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[UserEffectivePermission.user_id],
+        set_={
+            "role_ids": stmt.excluded.role_ids,
+            "permission_ids": stmt.excluded.permission_ids,
+            "module_names": stmt.excluded.module_names,
+            "permissions": stmt.excluded.permissions,
+            "refreshed_at": stmt.excluded.refreshed_at,
+        },
+    )
+    return stmt
+
+
+async def refresh_effective_permissions(
+    db: AsyncSession,
+    user_ids: Optional[Iterable[str]] = None,
+    role_ids: Optional[Iterable[int]] = None,
+    all_users: bool = False,
+):
+    """
+    upsert user_effective_permission for the given users, the members of the
+    given roles, or everyone (all_users=True). Runs in the caller's transaction,
+    the caller commits.
+    """
+    filters = []
+    if user_ids is not None:
+        filters.append(User.id.in_(list(user_ids)))
+    if role_ids is not None:
+        filters.append(
+            User.id.in_(
+                select(UserRole.c.emp_id).where(UserRole.c.role_id.in_(list(role_ids)))
+            )
+        )
+    if not filters and not all_users:
+        return
+    user_filter = None
+    if filters:
+        user_filter = or_(*filters)
+
+    await db.execute(effective_permission_upsert(user_filter))
+
+
+async def get_user_effective_permissions(
+    db: AsyncSession,
+    user_id: str,
+) -> List[Dict[str, Any]]:
+    """
+    permission detail of a user for /auth/permissions, one primary key lookup
+    """
+    result = await db.execute(
+        select(UserEffectivePermission.permissions).where(
+            UserEffectivePermission.user_id == user_id
+        )
+    )
+    permissions = result.scalar() or []
+    return [
+        {
+            "id": x["id"],
+            "permission": x["name"],
+            "module": {
+                "id": x["module_id"],
+                "nama": x["module"],
+            }
+            if x["module_id"] != None
+            else None,
+        }
+        for x in sorted(permissions, key=lambda d: d["id"])
+    ]
@@ -1,73 +1,148 @@
 from typing import Optional, List
-from sqlalchemy import select, and_, or_, update
+from sqlalchemy import Integer, select, and_, or_, update, func, cast, literal_column
+from sqlalchemy.dialects.postgresql import ARRAY, aggregate_order_by, insert as pg_insert
 from models.Role import Role
 from models.Permission import Permission
 from models.RolePermission import RolePermission
 from models.Module import Module
 from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime
+from core.security import invalidate_principal_cache
+from core.authorization import invalidate_authorization_model
+from core.menu_cache import invalidate_menu_cache
+from core.catalog import get_catalog_rows
+from repository.effective_permission import refresh_effective_permissions
 
 async def get_role_management(
     db: AsyncSession,
     isact: Optional[bool] = True
 ) -> List[dict]:
+    """
+    two fixed queries whatever the number of roles: roles, then every active
+    grant of those roles
+    """
     try:
         query = (
             select(Role)
             .filter(Role.isact == isact)
+            .order_by(Role.id.asc())
         )
         
         result = await db.execute(query)
         roles = result.scalars().all()
-        
-        role_list = []
-        for role in roles:
-            perm_query = (
-                select(Permission, Module)
-                .join(RolePermission, and_(
-                    RolePermission.c.permission_id == Permission.id,
-                    RolePermission.c.role_id == role.id,
-                    RolePermission.c.isact == True
-                ))
-                .outerjoin(Module, Permission.module_id == Module.id)
-                .filter(Permission.isact == True)
+        if not roles:
+            return []
+
+        perm_query = (
+            select(RolePermission.c.role_id, Permission.id, Module.name)
+            .join(Permission, and_(
+                RolePermission.c.permission_id == Permission.id,
+                Permission.isact == True
+            ))
+            .outerjoin(Module, Permission.module_id == Module.id)
+            .filter(
+                RolePermission.c.isact == True,
+                RolePermission.c.role_id.in_([role.id for role in roles]),
             )
-            perm_result = await db.execute(perm_query)
-            permissions_with_modules = perm_result.all()
-            
-            permissions_data = []
-            for perm, module in permissions_with_modules:
-                module_data = None
-                if module:
-                    module_data = module.name
-                
-                permissions_data.append({
-                    "permission_id": perm.id,
-                    "module": module_data,
-                    "access": True
-                })
-            
-            role_data = {
+            .order_by(RolePermission.c.role_id.asc(), Permission.id.asc())
+        )
+        perm_result = await db.execute(perm_query)
+
+        permissions_by_role = {}
+        for role_id, permission_id, module_name in perm_result.all():
+            permissions_by_role.setdefault(role_id, []).append({
+                "permission_id": permission_id,
+                "module": module_name,
+                "access": True
+            })
+
+        return [
+            {
                 "role_id": role.id,
                 "name": role.name,
                 "description": role.description,
                 "role": role.group,
                 "access_feature": role.access_feature,
-                "permissions": permissions_data,
+                "permissions": permissions_by_role.get(role.id, []),
                 "created_at": role.created_at,
                 "updated_at": role.updated_at,
                 "isact": role.isact
             }
-            role_list.append(role_data)
-            
-        return role_list
+            for role in roles
+        ]
         
     except Exception as e:
         import traceback
         error_details = traceback.format_exc()
         raise ValueError(f"Error in get_role_management: {str(e)}\n{error_details}")
+
+
+async def get_role_management_matrix(
+    db: AsyncSession,
+    isact: Optional[bool] = True
+) -> dict:
+    """
+    compact format: the permission catalogue once, then per role only the ids
+    of the granted permissions
+    """
+    try:
+        permissions = [
+            {"id": row.id, "name": row.name, "module": row.module}
+            for row in await get_catalog_rows(db, "permission")
+            if row.isact == True
+        ]
+
+        role_query = (
+            select(
+                Role.id,
+                Role.name,
+                Role.description,
+                Role.group,
+                Role.access_feature,
+                Role.created_at,
+                Role.updated_at,
+                Role.isact,
+                func.coalesce(
+                    func.array_agg(aggregate_order_by(Permission.id, Permission.id.asc()))
+                    .filter(Permission.id.isnot(None)),
+                    cast(literal_column("'{}'"), ARRAY(Integer)),
+                ).label("permission_ids"),
+            )
+            .outerjoin(RolePermission, and_(
+                RolePermission.c.role_id == Role.id,
+                RolePermission.c.isact == True
+            ))
+            .outerjoin(Permission, and_(
+                RolePermission.c.permission_id == Permission.id,
+                Permission.isact == True
+            ))
+            .filter(Role.isact == isact)
+            .group_by(Role.id)
+            .order_by(Role.id.asc())
+        )
+        role_result = await db.execute(role_query)
+        roles = [
+            {
+                "role_id": row.id,
+                "name": row.name,
+                "description": row.description,
+                "role": row.group,
+                "access_feature": row.access_feature,
+                "permission_ids": list(row.permission_ids),
+                "created_at": row.created_at,
+                "updated_at": row.updated_at,
+                "isact": row.isact
+            }
+            for row in role_result.all()
+        ]
+        return {"permissions": permissions, "roles": roles}
+
+    except Exception as e:
+        import traceback
+        error_details = traceback.format_exc()
+        raise ValueError(f"Error in get_role_management_matrix: {str(e)}\n{error_details}")
     
-    
+
 async def update_permission(
     db: AsyncSession,
     role_id: int,
@@ -119,7 +194,11 @@ async def update_permission(
             )
             await db.execute(stmt)
 
+        await refresh_effective_permissions(db, role_ids=[role_id])
         await db.commit()
+        invalidate_authorization_model()
+        invalidate_principal_cache()
+        invalidate_menu_cache()
 
         return {
             "role_id": role_id,
@@ -131,3 +210,77 @@ async def update_permission(
         await db.rollback()
         raise ValueError(f"Error in update_permission: {str(e)}")
     
+
+
+async def bulk_update_permissions(
+    db: AsyncSession,
+    permissions: List[dict],
+) -> List[dict]:
+    """
+    permissions: [{"role_id", "permission_id", "isact"}], the last item wins
+    when the same pair is sent twice. All or nothing: ids are validated with
+    one query per table, every change is written by one
+    INSERT ... ON CONFLICT (role_id, permission_id) DO UPDATE and committed once.
+    """
+    changes = {}
+    for item in permissions:
+        changes[(item["role_id"], item["permission_id"])] = item["isact"]
+    if not changes:
+        return []
+
+    try:
+        role_ids = sorted({role_id for role_id, _ in changes})
+        permission_ids = sorted({permission_id for _, permission_id in changes})
+
+        role_result = await db.execute(select(Role.id).filter(Role.id.in_(role_ids)))
+        missing_roles = set(role_ids) - set(role_result.scalars().all())
+        if missing_roles:
+            raise ValueError(
+                f"Role dengan ID {', '.join(str(x) for x in sorted(missing_roles))} tidak ditemukan"
+            )
+
+        permission_result = await db.execute(
+            select(Permission.id).filter(Permission.id.in_(permission_ids))
+        )
+        missing_permissions = set(permission_ids) - set(permission_result.scalars().all())
+        if missing_permissions:
+            raise ValueError(
+                f"Permission dengan ID {', '.join(str(x) for x in sorted(missing_permissions))} tidak ditemukan"
+            )
+
+        stmt = pg_insert(RolePermission).values([
+            {"role_id": role_id, "permission_id": permission_id, "isact": isact}
+            for (role_id, permission_id), isact in changes.items()
+        ])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[RolePermission.c.role_id, RolePermission.c.permission_id],
+            set_={"isact": stmt.excluded.isact},
+        ).returning(
+            RolePermission.c.role_id,
+            RolePermission.c.permission_id,
+            RolePermission.c.isact,
+        )
+        result = await db.execute(stmt)
+        rows = result.all()
+
+        await refresh_effective_permissions(db, role_ids=role_ids)
+        await db.commit()
+        invalidate_authorization_model()
+        invalidate_principal_cache()
+        invalidate_menu_cache()
+
+        return [
+            {
+                "role_id": row.role_id,
+                "permission_id": row.permission_id,
+                "isact": row.isact,
+            }
+            for row in sorted(rows, key=lambda x: (x.role_id, x.permission_id))
+        ]
+
+    except ValueError:
+        await db.rollback()
+        raise
+    except Exception as e:
+        await db.rollback()
+        raise ValueError(f"Error in bulk_update_permissions: {str(e)}")
@@ -0,0 +1,125 @@
+"""
+Bulk user administration: activate/deactivate, role assignment and field
+updates over a list of user ids or a filter. Every operation is one
+UPDATE ... RETURNING id on user, at most one user_role DELETE + INSERT, one
+UPDATE on user_token to revoke sessions, and a single commit.
+"""
+from typing import Any, Dict, List, Optional
+from pytz import timezone
+from datetime import datetime
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from core.catalog import get_catalog_rows
+from core.security import invalidate_cached_user
+from models.User import User
+from models.UserRole import UserRole
+from models.UserToken import UserToken
+from repository.effective_permission import refresh_effective_permissions
+from schemas.auth import BulkUserTarget
+from settings import TZ
+
+BULK_UPDATE_FIELDS = ["phone", "address", "status"]
+
+
+def target_clauses(target: BulkUserTarget) -> list:
+    """
+    where clauses of the target, refuse an empty target so a missing body can
+    never touch every user
+    """
+    clauses = []
+    if target.user_ids is not None:
+        clauses.append(User.id.in_(target.user_ids))
+    if target.src:
+        clauses.append(User.name.ilike(f"%{target.src}%"))
+    if target.role_id is not None:
+        clauses.append(
+            User.id.in_(select(UserRole.c.emp_id).where(UserRole.c.role_id == target.role_id))
+        )
+    if not clauses:
+        raise ValueError("Pilih user_ids atau filter (src / role_id)")
+    return clauses
+
+
+async def revoke_sessions(db: AsyncSession, user_ids: List[str]) -> int:
+    result = await db.execute(
+        update(UserToken)
+        .where(UserToken.emp_id.in_(user_ids), UserToken.isact == True)
+        .values(isact=False)
+    )
+    return result.rowcount
+
+
+async def bulk_edit_users(
+    db: AsyncSession,
+    target: BulkUserTarget,
+    updated_by: str,
+    values: Optional[Dict[str, Any]] = None,
+    role_id: Optional[int] = None,
+    revoke: bool = False,
+) -> Dict[str, Any]:
+    """
+    values: user columns to set (isact and BULK_UPDATE_FIELDS).
+    role_id: replace the roles of every matched user with this one.
+    revoke: deactivate the sessions of the matched users.
+    """
+    values = dict(values or {})
+    if role_id is not None:
+        roles = await get_catalog_rows(db, "role")
+        if not any(x.id == role_id and x.isact == True for x in roles):
+            raise ValueError(f"Role dengan ID {role_id} tidak ditemukan")
+
+    try:
+        result = await db.execute(
+            update(User)
+            .where(*target_clauses(target))
+            .values(
+                **values,
+                updated_by=updated_by,
+                updated_at=datetime.now(timezone(TZ)).replace(tzinfo=None),
+            )
+            .returning(User.id)
+            .execution_options(synchronize_session=False)
+        )
+        user_ids = list(result.scalars().all())
+        revoked = 0
+        if user_ids:
+            if role_id is not None:
+                await db.execute(delete(UserRole).where(UserRole.c.emp_id.in_(user_ids)))
+                await db.execute(
+                    UserRole.insert(),
+                    [{"emp_id": user_id, "role_id": role_id} for user_id in user_ids],
+                )
+                await refresh_effective_permissions(db, user_ids=user_ids)
+            if revoke:
+                revoked = await revoke_sessions(db, user_ids)
+        await db.commit()
+    except Exception as e:
+        await db.rollback()
+        raise ValueError(f"Error in bulk_edit_users: {str(e)}")
+
+    for user_id in user_ids:
+        invalidate_cached_user(user_id)
+    return {"updated": len(user_ids), "revoked_sessions": revoked}
+
+
+async def bulk_set_active(
+    db: AsyncSession, target: BulkUserTarget, isact: bool, updated_by: str
+) -> Dict[str, Any]:
+    return await bulk_edit_users(
+        db, target, updated_by, values={"isact": isact}, revoke=not isact
+    )
+
+
+async def bulk_assign_role(
+    db: AsyncSession, target: BulkUserTarget, role_id: int, updated_by: str
+) -> Dict[str, Any]:
+    return await bulk_edit_users(db, target, updated_by, role_id=role_id, revoke=True)
+
+
+async def bulk_update_fields(
+    db: AsyncSession, target: BulkUserTarget, fields: Dict[str, Any], updated_by: str
+) -> Dict[str, Any]:
+    values = {k: v for k, v in fields.items() if k in BULK_UPDATE_FIELDS and v is not None}
+    if not values:
+        raise ValueError(f"Tidak ada field yang diubah ({', '.join(BULK_UPDATE_FIELDS)})")
+    return await bulk_edit_users(db, target, updated_by, values=values)
@@ -0,0 +1,278 @@
+"""
+Bulk user import from xlsx.
+
+The workbook is streamed with openpyxl read_only mode in chunks of
+BULK_IMPORT_CHUNK_SIZE rows. Every chunk is validated (format, duplicates
+in the file, emails that already exist, role ids), the initial passwords are
+hashed on a process pool over all cores, and users + user_role rows are
+written with COPY in one transaction per chunk. A chunk that fails to hash
+or to write marks its rows as failed and the import goes on with the next
+one. Concurrent imports queue for the hasher instead of being rejected.
+"""
+import asyncio
+import re
+import secrets
+import uuid
+from itertools import islice
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple
+import bcrypt
+from openpyxl import load_workbook
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from core.authorization import get_authorization_model
+from core.catalog import get_catalog_rows
+from core.executor import BoundedExecutor
+from core.principal import Principal
+from models.User import User
+from repository.effective_permission import refresh_effective_permissions
+from settings import (
+    BULK_IMPORT_CHUNK_SIZE,
+    BULK_IMPORT_HASH_WORKERS,
+    BULK_IMPORT_BCRYPT_ROUNDS,
+    BULK_IMPORT_MAX_ERRORS,
+)
+
+REQUIRED_COLUMNS = ["email", "name"]
+OPTIONAL_COLUMNS = ["phone", "address", "password", "role_id"]
+DEFAULT_ROLE_ID = 1
+EMAIL_PATTERN = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+
+USER_COPY_COLUMNS = [
+    "id", "email", "name", "phone", "address", "password", "npwp", "face_id",
+    "first_login", "birth_date", "created_by", "updated_by", "isact", "status",
+]
+
+# own pool: an import must not starve the login hasher in core.security
+bulk_password_hasher = BoundedExecutor(
+    name="bcrypt-bulk",
+    max_workers=BULK_IMPORT_HASH_WORKERS,
+    max_pending=BULK_IMPORT_HASH_WORKERS * 2,
+    kind="process",
+)
+# one chunk submits up to max_workers jobs, so this many chunks fit in max_pending
+bulk_hash_slots = asyncio.Semaphore(2)
+
+
+def hash_passwords(passwords: List[str], rounds: int = BULK_IMPORT_BCRYPT_ROUNDS) -> List[str]:
+    """
+    runs in a worker process
+    """
+    return [
+        bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds=rounds)).decode()
+        for password in passwords
+    ]
+
+
+async def hash_passwords_parallel(passwords: List[str]) -> List[str]:
+    """
+    split over every worker of bulk_password_hasher, order is kept. Waits
+    for a free slot (bulk_hash_slots) so concurrent imports never overload
+    the executor.
+    """
+    if not passwords:
+        return []
+    workers = bulk_password_hasher.max_workers
+    size = (len(passwords) + workers - 1) // workers
+    parts = [passwords[i:i + size] for i in range(0, len(passwords), size)]
+    async with bulk_hash_slots:
+        hashed = await asyncio.gather(
+            *[bulk_password_hasher.run(hash_passwords, part) for part in parts]
+        )
+    return [x for part in hashed for x in part]
+
+
+def iter_xlsx_rows(file: BinaryIO) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """
+    (excel row number, {column: value}) of the active sheet, streamed
+    """
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None) or ()
+        columns = [str(x).strip().lower() if x is not None else "" for x in header]
+        missing = [x for x in REQUIRED_COLUMNS if x not in columns]
+        if missing:
+            raise ValueError(f"Kolom wajib tidak ada: {', '.join(missing)}")
+        for row_number, row in enumerate(rows, start=2):
+            if row is None or all(x is None or str(x).strip() == "" for x in row):
+                continue
+            yield row_number, {
+                column: row[i] if i < len(row) else None
+                for i, column in enumerate(columns)
+                if column in REQUIRED_COLUMNS or column in OPTIONAL_COLUMNS
+            }
+    finally:
+        workbook.close()
+
+
+def clean_text(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+class ImportReport:
+    def __init__(self, max_errors: int = BULK_IMPORT_MAX_ERRORS) -> None:
+        self.total = 0
+        self.created = 0
+        self.failed = 0
+        self.errors: List[Dict[str, Any]] = []
+        self.max_errors = max_errors
+
+    def error(self, row: int, email: Optional[str], message: str) -> None:
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({"row": row, "email": email, "message": message})
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "total": self.total,
+            "created": self.created,
+            "failed": self.failed,
+            "errors": self.errors,
+            "errors_truncated": self.failed > len(self.errors),
+        }
+
+
+async def validate_chunk(
+    db: AsyncSession,
+    chunk: List[Tuple[int, Dict[str, Any]]],
+    seen_emails: set,
+    role_ids: set,
+    report: ImportReport,
+    grantable_role_ids: Optional[set] = None,
+) -> List[Dict[str, Any]]:
+    """
+    rows that can be inserted, failures go to the report. One query per chunk
+    for the emails that already exist. grantable_role_ids: roles the importer
+    may hand out, None for no restriction.
+    """
+    candidates = []
+    for row_number, row in chunk:
+        email = clean_text(row.get("email")).lower()
+        name = clean_text(row.get("name"))
+        if not EMAIL_PATTERN.match(email):
+            report.error(row_number, email or None, "Email tidak valid")
+            continue
+        if not name:
+            report.error(row_number, email, "Nama wajib diisi")
+            continue
+        if email in seen_emails:
+            report.error(row_number, email, "Email duplikat di file")
+            continue
+        role_id = clean_text(row.get("role_id")) or str(DEFAULT_ROLE_ID)
+        if not role_id.isdigit() or int(role_id) not in role_ids:
+            report.error(row_number, email, f"Role {role_id} tidak ditemukan")
+            continue
+        if grantable_role_ids is not None and int(role_id) not in grantable_role_ids:
+            report.error(row_number, email, f"Role {role_id} tidak boleh diberikan")
+            continue
+        seen_emails.add(email)
+        candidates.append({
+            "row": row_number,
+            "email": email,
+            "name": name,
+            "phone": clean_text(row.get("phone")),
+            "address": clean_text(row.get("address")),
+            "password": clean_text(row.get("password")) or secrets.token_urlsafe(12),
+            "role_id": int(role_id),
+        })
+
+    if not candidates:
+        return []
+    result = await db.execute(
+        select(User.email).filter(User.email.in_([x["email"] for x in candidates]))
+    )
+    existing = set(result.scalars().all())
+    valid = []
+    for candidate in candidates:
+        if candidate["email"] in existing:
+            report.error(candidate["row"], candidate["email"], "Email sudah terdaftar")
+        else:
+            valid.append(candidate)
+    return valid
+
+
+async def copy_users(db: AsyncSession, rows: List[Dict[str, Any]], created_by: str):
+    """
+    COPY users and their user_role rows on the session's own connection
+    (same transaction)
+    """
+    connection = await db.connection()
+    raw = await connection.get_raw_connection()
+    driver = raw.driver_connection
+    await driver.copy_records_to_table(
+        User.__tablename__,
+        columns=USER_COPY_COLUMNS,
+        records=[
+            (
+                x["id"], x["email"], x["name"], x["phone"], x["address"], x["password"],
+                "", "", "true", "", created_by, created_by, True, True,
+            )
+            for x in rows
+        ],
+    )
+    await driver.copy_records_to_table(
+        "user_role",
+        columns=["emp_id", "role_id"],
+        records=[(x["id"], x["role_id"]) for x in rows],
+    )
+
+
+async def import_users_from_xlsx(
+    db: AsyncSession,
+    file: BinaryIO,
+    created_by: str,
+    chunk_size: int = BULK_IMPORT_CHUNK_SIZE,
+    granter: Optional[Principal] = None,
+) -> Dict[str, Any]:
+    """
+    granter: the importing principal, rows may only get roles whose
+    permissions the granter holds all of
+    """
+    report = ImportReport()
+    role_ids = {x.id for x in await get_catalog_rows(db, "role") if x.isact == True}
+    grantable_role_ids = None
+    if granter is not None:
+        model = await get_authorization_model(db)
+        grantable_role_ids = {
+            x for x in role_ids if model.can_grant_role(granter.permission_bits, x)
+        }
+    seen_emails: set = set()
+
+    rows = iter_xlsx_rows(file)
+    while True:
+        # parsing is blocking, read the next chunk off the event loop
+        chunk = await asyncio.to_thread(lambda: list(islice(rows, chunk_size)))
+        if not chunk:
+            break
+        report.total += len(chunk)
+
+        valid = await validate_chunk(
+            db, chunk, seen_emails, role_ids, report, grantable_role_ids
+        )
+        if not valid:
+            continue
+        try:
+            hashed = await hash_passwords_parallel([x["password"] for x in valid])
+        except Exception as e:
+            for row in valid:
+                report.error(row["row"], row["email"], f"Gagal memproses password: {e}")
+            continue
+        for row, password in zip(valid, hashed):
+            row["id"] = str(uuid.uuid4())
+            row["password"] = password
+
+        try:
+            await copy_users(db, valid, created_by)
+            await refresh_effective_permissions(db, user_ids=[x["id"] for x in valid])
+            await db.commit()
+            report.created += len(valid)
+        except Exception as e:
+            await db.rollback()
+            for row in valid:
+                report.error(row["row"], row["email"], f"Gagal menyimpan: {e}")
+
+    return report.as_dict()
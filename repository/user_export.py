@@ -0,0 +1,89 @@
+"""
+Streaming user export (csv / xlsx).
+
+Rows are read with AsyncSession.stream() on a server-side cursor,
+EXPORT_BATCH_SIZE rows per round-trip, and written batch by batch: csv
+chunks go straight to the client, xlsx rows go through an openpyxl
+write_only workbook backed by a temporary file that is streamed once it is
+saved. Memory does not grow with the number of users.
+
+The generators open their own session: the request scoped one from get_db
+is closed before a StreamingResponse body is sent.
+"""
+import asyncio
+import csv
+import io
+import os
+import tempfile
+from typing import Any, AsyncIterator, List, Optional, Sequence
+from openpyxl import Workbook
+from sqlalchemy import select
+from models import async_session
+from models.User import User
+from settings import EXPORT_BATCH_SIZE
+
+EXPORT_COLUMNS = ["id", "email", "name", "phone", "address", "created_at"]
+FILE_CHUNK_SIZE = 64 * 1024
+
+
+def export_query(src: Optional[str] = None):
+    query = select(
+        User.id, User.email, User.name, User.phone, User.address, User.created_at
+    ).filter(User.isact == True)
+    if src:
+        query = query.filter(User.name.ilike(f"%{src}%"))
+    return query.order_by(User.created_at.asc(), User.id.asc())
+
+
+async def stream_user_rows(
+    src: Optional[str] = None,
+    batch_size: int = EXPORT_BATCH_SIZE,
+) -> AsyncIterator[Sequence[Any]]:
+    """
+    yield lists of at most batch_size rows
+    """
+    async with async_session() as db:
+        result = await db.stream(export_query(src).execution_options(yield_per=batch_size))
+        async for partition in result.partitions(batch_size):
+            yield partition
+
+
+async def iter_users_csv(src: Optional[str] = None) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # BOM so Excel opens the file as utf-8
+    buffer.write("\ufeff")
+    writer.writerow(EXPORT_COLUMNS)
+    async for rows in stream_user_rows(src):
+        writer.writerows(rows)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def append_rows(sheet, rows: List[Sequence[Any]]) -> None:
+    for row in rows:
+        sheet.append(list(row))
+
+
+async def iter_users_xlsx(src: Optional[str] = None) -> AsyncIterator[bytes]:
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("users")
+    sheet.append(EXPORT_COLUMNS)
+    fd, path = tempfile.mkstemp(suffix=".xlsx")
+    os.close(fd)
+    try:
+        async for rows in stream_user_rows(src):
+            # openpyxl is blocking, keep the event loop free
+            await asyncio.to_thread(append_rows, sheet, rows)
+        await asyncio.to_thread(workbook.save, path)
+        with open(path, "rb") as file:
+            while True:
+                chunk = await asyncio.to_thread(file.read, FILE_CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+    finally:
+        os.remove(path)
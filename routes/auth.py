@@ -1,9 +1,12 @@
 
 import traceback
+from datetime import datetime
+from typing import Literal, Optional
 from core.file import generate_link_download
 from core.mail import send_reset_password_email
 from fastapi import APIRouter, Depends, Request, BackgroundTasks, UploadFile, File, Form, Request
 from fastapi.security import OAuth2PasswordRequestForm
+from fastapi.responses import Response, StreamingResponse
 from sqlalchemy.orm import Session
 from sqlalchemy.ext.asyncio import AsyncSession
 from core.responses import (
@@ -13,18 +16,31 @@ from core.responses import (
     BadRequest,
     Unauthorized,
     NotFound,
+    ServiceUnavailable,
     InternalServerError,
 )
 from models import get_db
-from core.security import get_user_from_jwt_token, generate_jwt_token_from_user, get_user_permissions
+from core.security import generate_jwt_token_from_user
 from core.security import (
-    get_user_from_jwt_token,
+    current_principal,
     oauth2_scheme,
+    require_permission,
+)
+from core.principal import Principal
+from core.executor import ExecutorOverloaded
+from settings import PASSWORD_HASH_RETRY_AFTER
+from core.menu_cache import (
+    get_cached_menu,
+    get_menu_generation,
+    render_menu_body,
+    set_cached_menu,
 )
 from schemas.common import (
     BadRequestResponse,
     UnauthorizedResponse,
+    ForbiddenResponse,
     NotFoundResponse,
+    ServiceUnavailableResponse,
     InternalServerErrorResponse,
     CudResponseSchema,
 )
@@ -42,16 +58,28 @@ from schemas.auth import (
     SignUpRequest,
     ForgotPasswordSendEmailResponse,
     RoleOptionsResponse,
+    BulkUserRequest,
+    BulkAssignRoleRequest,
+    BulkUpdateUserRequest,
 )
 import repository.auth  as authRepo
+import repository.effective_permission as effectivePermissionRepo
+import repository.user_bulk as userBulkRepo
+import repository.user_export as userExportRepo
+import repository.user_admin as userAdminRepo
 from urllib.parse import urlparse
 
 router = APIRouter(tags=["Auth"])
 
+LOGIN_BUSY_MESSAGE = "Server sedang sibuk, silakan coba lagi"
+
 
 @router.post(
     "/login",
     response_model=LoginSuccessResponse,
+    responses={
+        "503": {"model": ServiceUnavailableResponse},
+    },
 )
 async def login_route(
     request: LoginRequest, 
@@ -76,12 +104,21 @@ async def login_route(
                 message="Success login",
             )
         )
+    except ExecutorOverloaded:
+        return common_response(
+            ServiceUnavailable(message=LOGIN_BUSY_MESSAGE, retry_after=PASSWORD_HASH_RETRY_AFTER)
+        )
     except Exception as e:
         traceback.print_exc()
         return common_response(BadRequest(message=str(e)))
     
 
-@router.post("/token")
+@router.post(
+    "/token",
+    responses={
+        "503": {"model": ServiceUnavailableResponse},
+    },
+)
 async def generate_token(
     db: AsyncSession = Depends(get_db),
     form_data: OAuth2PasswordRequestForm = Depends()
@@ -96,6 +133,10 @@ async def generate_token(
         token = await generate_jwt_token_from_user(user=user)
         await authRepo.create_user_session(db=db, user_id=user.id, token=token)
         return {"access_token": token, "token_type": "Bearer"}
+    except ExecutorOverloaded:
+        return common_response(
+            ServiceUnavailable(message=LOGIN_BUSY_MESSAGE, retry_after=PASSWORD_HASH_RETRY_AFTER)
+        )
     except Exception as e:
         return common_response(BadRequest(message=str(e)))
 
@@ -112,15 +153,52 @@ async def list_user(
     db: AsyncSession = Depends(get_db),
     page: int = 1,
     page_size: int = 10,
-    token: str = Depends(oauth2_scheme),
+    src: Optional[str] = None,
+    pagination: Literal["offset", "cursor"] = "offset",
+    cursor: Optional[str] = None,
+    with_count: Optional[bool] = None,
+    count: Optional[Literal["exact", "estimated", "cached"]] = None,
+    principal: Principal = Depends(current_principal),
 ):
+    """
+    pagination=cursor (or any ?cursor=): keyset paging with next_cursor /
+    prev_cursor in meta, count only with ?with_count=true.
+    count: counting strategy (default LIST_COUNT_STRATEGY), meta.count_strategy
+    says which one produced meta.count
+    """
     try:
-        data, num_data, num_page = await authRepo.list_user(db=db, page=page, page_size=page_size)
-        print("disini")
+        if pagination == "cursor" or cursor:
+            data, next_cursor, prev_cursor, num_data, count_strategy = await authRepo.list_user_keyset(
+                db=db,
+                page_size=page_size,
+                src=src,
+                cursor=cursor,
+                with_count=bool(with_count),
+                count_strategy=count,
+            )
+            meta = {
+                "page_size": page_size,
+                "next_cursor": next_cursor,
+                "prev_cursor": prev_cursor,
+            }
+            if with_count:
+                meta["count"] = num_data
+                meta["count_strategy"] = count_strategy
+            return common_response(Ok(meta=meta, data=data))
+
+        data, num_data, num_page, count_strategy = await authRepo.list_user(
+            db=db,
+            page=page,
+            page_size=page_size,
+            src=src,
+            with_count=with_count is not False,
+            count_strategy=count,
+        )
         return common_response(
             Ok(
                 meta={
                     "count": num_data,
+                    "count_strategy": count_strategy,
                     "page_count": num_page,
                     "page_size": page_size,
                     "page": page,
@@ -132,6 +210,60 @@ async def list_user(
                 return common_response(BadRequest(message=str(e)))
 
 
+@router.get(
+    "/search-user",
+    responses={
+        "200": {"model": MeSuccessResponse},
+        "400": {"model": BadRequestResponse},
+        "401": {"model": UnauthorizedResponse},
+        "500": {"model": InternalServerErrorResponse},
+    },
+)
+async def search_user(
+    q: str,
+    limit: int = 10,
+    db: AsyncSession = Depends(get_db),
+    principal: Principal = Depends(current_principal),
+):
+    """
+    ranked search on name, email and phone (pg_trgm), no count
+    """
+    try:
+        data = await authRepo.search_user(db=db, q=q, limit=limit)
+        return common_response(Ok(meta={"limit": limit}, data=data))
+    except Exception as e:
+        return common_response(BadRequest(message=str(e)))
+
+
+@router.get(
+    "/export-user",
+    responses={
+        "401": {"model": UnauthorizedResponse},
+        "403": {"model": ForbiddenResponse},
+    },
+)
+async def export_user(
+    format: Literal["csv", "xlsx"] = "csv",
+    src: Optional[str] = None,
+    principal: Principal = Depends(require_permission("user", "view")),
+):
+    """
+    streamed csv / xlsx of the active users, memory stays flat
+    """
+    filename = f"users-{datetime.now().strftime('%Y%m%d%H%M%S')}.{format}"
+    if format == "xlsx":
+        body = userExportRepo.iter_users_xlsx(src=src)
+        media_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    else:
+        body = userExportRepo.iter_users_csv(src=src)
+        media_type = "text/csv; charset=utf-8"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
 @router.get(
     "/detail-user/{user_id}",
     responses={
@@ -145,7 +277,7 @@ async def list_user(
 async def detail_user(
     user_id: str,
     db: AsyncSession = Depends(get_db),
-    token: str = Depends(oauth2_scheme),
+    principal: Principal = Depends(current_principal),
 ):
     try:
         user = await authRepo.get_user_by_id(db=db, user_id=user_id)
@@ -160,13 +292,13 @@ async def detail_user(
                     "name": user.name,
                     "isact": user.isact,
                     "phone": user.phone,
-                    "image": generate_link_download(user.photo),
+                    "image": await generate_link_download(user.photo),
                     "role": {
                         "id": user.roles[0].id if user.roles else None,
                         "name": user.roles[0].name if user.roles else None,
                     },
                     "address": user.address,
-                    "photo": generate_link_download(user.photo),
+                    "photo": await generate_link_download(user.photo),
                 }
             )
         )
@@ -188,13 +320,9 @@ async def edit_user(
     user_id: str,
     request: EditUserRequest,
     db: AsyncSession = Depends(get_db),
-    token: str = Depends(oauth2_scheme),
+    principal: Principal = Depends(current_principal),
 ):
     try:
-        current_user = await get_user_from_jwt_token(db, token)
-        if not current_user:
-            return common_response(Unauthorized())
-
         updated_user = await authRepo.edit_user(db=db, user_id=user_id, request=request)
         if not updated_user:
             return common_response(NotFound(message="User tidak ditemukan"))
@@ -207,13 +335,13 @@ async def edit_user(
                     "name": updated_user.name,
                     "isact": updated_user.isact,
                     "phone": updated_user.phone,
-                    "image": generate_link_download(updated_user.photo),
+                    "image": await generate_link_download(updated_user.photo),
                     "role": {
                         "id": updated_user.roles[0].id if updated_user.roles else None,
                         "name": updated_user.roles[0].name if updated_user.roles else None,
                     },
                     "address": updated_user.address,
-                    "photo": generate_link_download(updated_user.photo),
+                    "photo": await generate_link_download(updated_user.photo),
                 },
                 message="Berhasil mengupdate data user"
             )
@@ -304,6 +432,40 @@ async def sign_up_route(
         traceback.print_exc()
         return common_response(BadRequest(message=str(e)))
     
+@router.post(
+    "/import-user",
+    responses={
+        "201": {"model": CudResponseSchema},
+        "400": {"model": BadRequestResponse},
+        "401": {"model": UnauthorizedResponse},
+        "403": {"model": ForbiddenResponse},
+        "500": {"model": InternalServerErrorResponse},
+    },
+)
+async def import_user(
+    file: UploadFile = File(...),
+    db: AsyncSession = Depends(get_db),
+    principal: Principal = Depends(require_permission("user", "create")),
+):
+    """
+    xlsx with columns email, name and optional phone, address, password,
+    role_id (default 1). Rows without password get a random one (reset via
+    forgot password). Rows with a role the caller does not fully hold are
+    rejected. Returns per-row errors.
+    """
+    try:
+        report = await userBulkRepo.import_users_from_xlsx(
+            db=db, file=file.file, created_by=principal.id, granter=principal
+        )
+        return common_response(
+            CudResponse(data=report, message="Import user selesai")
+        )
+    except Exception as e:
+        import traceback
+
+        traceback.print_exc()
+        return common_response(BadRequest(message=str(e)))
+
 @router.get(
     "/me",
     responses={
@@ -316,15 +478,13 @@ async def sign_up_route(
 async def me(
         request: Request,
         db: AsyncSession = Depends(get_db),
-        token: str = Depends(oauth2_scheme)
+        principal: Principal = Depends(current_principal),
         ):
     try:
-        user = await get_user_from_jwt_token(db, token)
+        user = await authRepo.get_user_by_id(db=db, user_id=principal.id)
         if not user:
             return common_response(Unauthorized())
-        old_token = token
-        print(user)
-        refresh_token = await generate_jwt_token_from_user(user=user)
+        refresh_token = await generate_jwt_token_from_user(user=principal)
         return common_response(
             Ok(
                 data={
@@ -334,13 +494,13 @@ async def me(
                     "isact": user.isact,
                     "phone": user.phone,
                     "refreshed_token": refresh_token,
-                    "image": generate_link_download(user.photo),
+                    "image": await generate_link_download(user.photo),
                     "role": {
                         "id": user.roles[0].id if user.roles else None,
                         "name": user.roles[0].name if user.roles else None,
                     },
                     "address":user.address,
-                    "photo": generate_link_download(user.photo),
+                    "photo": await generate_link_download(user.photo),
                 }
             )
         )
@@ -361,29 +521,16 @@ async def me(
 async def permissions(
     request: Request,
     db: Session = Depends(get_db),
-    token: str = Depends(oauth2_scheme)
+    principal: Principal = Depends(current_principal),
 ):
     try:
-        user = await get_user_from_jwt_token(db, token)
-        if not user:
-            return common_response(Unauthorized())
-        user_permissions = get_user_permissions(db=db, user=user)
+        user_permissions = await effectivePermissionRepo.get_user_effective_permissions(
+            db=db, user_id=principal.id
+        )
         return common_response(
             Ok(
                 data={
-                    "results": [
-                        {
-                            "id": x.id,
-                            "permission": x.name,
-                            "module": {
-                                "id": x.module.id,
-                                "nama": x.module.name,
-                            }
-                            if x.module != None
-                            else None,
-                        }
-                        for x in user_permissions
-                    ]
+                    "results": user_permissions
                 },
                 message="Success get permisson"
             )
@@ -399,15 +546,19 @@ async def permissions(
         "500": {"model": InternalServerErrorResponse},
     },
 )
-async def menu(db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)):
+async def menu(
+    db: Session = Depends(get_db),
+    principal: Principal = Depends(current_principal),
+):
     try:
-        user = await get_user_from_jwt_token(db, token)
-        if not user:
-            return common_response(Unauthorized())
+        body = get_cached_menu(principal.role_ids)
+        if body is None:
+            generation = get_menu_generation()
+            list_menu = await authRepo.generate_menu_tree_for_user(db=db, principal=principal)
+            body = render_menu_body(list_menu)
+            set_cached_menu(principal.role_ids, body, generation)
 
-        list_menu = await authRepo.generate_menu_tree_for_user(db=db, user=user)
-
-        return common_response(Ok(data={"results": list_menu}))
+        return Response(content=body, media_type="application/json")
     except Exception as e:
         import traceback
 
@@ -422,12 +573,13 @@ async def menu(db: Session = Depends(get_db), token: str = Depends(oauth2_scheme
         "500": {"model": InternalServerErrorResponse},
     },
 )
-async def logout_route(db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)):
+async def logout_route(
+    db: Session = Depends(get_db),
+    token: str = Depends(oauth2_scheme),
+    principal: Principal = Depends(current_principal),
+):
     try:
-        user = await get_user_from_jwt_token(db, token)
-        if not user:
-            return common_response(Unauthorized())
-        await authRepo.logout_user(db=db, user=user, token=token)
+        await authRepo.logout_user(db=db, user=principal, token=token)
         return common_response(Ok(message="Successfully logged out."))
     except Exception as e:
         import traceback
@@ -435,6 +587,105 @@ async def logout_route(db: Session = Depends(get_db), token: str = Depends(oauth
         traceback.print_exc()
         return common_response(BadRequest(message=str(e)))
     
+@router.put(
+    "/bulk-user/deactivate",
+    responses={
+        "201": {"model": CudResponseSchema},
+        "400": {"model": BadRequestResponse},
+        "401": {"model": UnauthorizedResponse},
+        "403": {"model": ForbiddenResponse},
+        "500": {"model": InternalServerErrorResponse},
+    },
+)
+async def bulk_deactivate_user(
+    request: BulkUserRequest,
+    db: AsyncSession = Depends(get_db),
+    principal: Principal = Depends(require_permission("user", "delete")),
+):
+    try:
+        data = await userAdminRepo.bulk_set_active(
+            db=db, target=request.target, isact=False, updated_by=principal.id
+        )
+        return common_response(CudResponse(data=data, message="Berhasil menonaktifkan user"))
+    except Exception as e:
+        traceback.print_exc()
+        return common_response(BadRequest(message=str(e)))
+
+@router.put(
+    "/bulk-user/activate",
+    responses={
+        "201": {"model": CudResponseSchema},
+        "400": {"model": BadRequestResponse},
+        "401": {"model": UnauthorizedResponse},
+        "403": {"model": ForbiddenResponse},
+        "500": {"model": InternalServerErrorResponse},
+    },
+)
+async def bulk_activate_user(
+    request: BulkUserRequest,
+    db: AsyncSession = Depends(get_db),
+    principal: Principal = Depends(require_permission("user", "edit")),
+):
+    try:
+        data = await userAdminRepo.bulk_set_active(
+            db=db, target=request.target, isact=True, updated_by=principal.id
+        )
+        return common_response(CudResponse(data=data, message="Berhasil mengaktifkan user"))
+    except Exception as e:
+        traceback.print_exc()
+        return common_response(BadRequest(message=str(e)))
+
+@router.put(
+    "/bulk-user/assign-role",
+    responses={
+        "201": {"model": CudResponseSchema},
+        "400": {"model": BadRequestResponse},
+        "401": {"model": UnauthorizedResponse},
+        "403": {"model": ForbiddenResponse},
+        "500": {"model": InternalServerErrorResponse},
+    },
+)
+async def bulk_assign_role(
+    request: BulkAssignRoleRequest,
+    db: AsyncSession = Depends(get_db),
+    principal: Principal = Depends(require_permission("user", "edit")),
+):
+    try:
+        data = await userAdminRepo.bulk_assign_role(
+            db=db, target=request.target, role_id=request.role_id, updated_by=principal.id
+        )
+        return common_response(CudResponse(data=data, message="Berhasil mengubah role user"))
+    except Exception as e:
+        traceback.print_exc()
+        return common_response(BadRequest(message=str(e)))
+
+@router.put(
+    "/bulk-user/update",
+    responses={
+        "201": {"model": CudResponseSchema},
+        "400": {"model": BadRequestResponse},
+        "401": {"model": UnauthorizedResponse},
+        "403": {"model": ForbiddenResponse},
+        "500": {"model": InternalServerErrorResponse},
+    },
+)
+async def bulk_update_user(
+    request: BulkUpdateUserRequest,
+    db: AsyncSession = Depends(get_db),
+    principal: Principal = Depends(require_permission("user", "edit")),
+):
+    try:
+        data = await userAdminRepo.bulk_update_fields(
+            db=db,
+            target=request.target,
+            fields=request.model_dump(exclude={"target"}),
+            updated_by=principal.id,
+        )
+        return common_response(CudResponse(data=data, message="Berhasil mengupdate data user"))
+    except Exception as e:
+        traceback.print_exc()
+        return common_response(BadRequest(message=str(e)))
+
 @router.get(
     "/role-options",
     responses={
@@ -445,13 +696,9 @@ async def logout_route(db: Session = Depends(get_db), token: str = Depends(oauth
 )
 async def role_options(
     db: AsyncSession = Depends(get_db),
-    token: str = Depends(oauth2_scheme),
+    principal: Principal = Depends(current_principal),
 ):
     try:
-        current_user = await get_user_from_jwt_token(db, token)
-        if not current_user:
-            return common_response(Unauthorized())
-
         role_options = await authRepo.get_role_options(db=db)
         
         return common_response(
@@ -0,0 +1,51 @@
+from fastapi import APIRouter, Request
+from core.file import stream_file_response
+from core.responses import common_response, NotFound, Unauthorized
+from core.storage import verify_download
+from schemas.common import NotFoundResponse, UnauthorizedResponse
+
+router = APIRouter(tags=["File"])
+
+
+async def signed_file_response(
+    request: Request, minio_path: str, expires: int, signature: str, inline: bool
+):
+    if not verify_download(minio_path, expires, signature):
+        return common_response(
+            Unauthorized(message="Link download tidak valid atau sudah kedaluwarsa")
+        )
+    try:
+        response = await stream_file_response(minio_path, headers=request.headers, inline=inline)
+    except ValueError:
+        return common_response(NotFound())
+    if response.status_code == 404:
+        return common_response(NotFound())
+    return response
+
+
+@router.get(
+    "/download/",
+    responses={
+        "401": {"model": UnauthorizedResponse},
+        "404": {"model": NotFoundResponse},
+    },
+)
+async def download(request: Request, minio_path: str, expires: int, signature: str):
+    """
+    signed link from generate_link_download, supports Range (206) and If-None-Match (304)
+    """
+    return await signed_file_response(request, minio_path, expires, signature, inline=False)
+
+
+@router.get(
+    "/preview/",
+    responses={
+        "401": {"model": UnauthorizedResponse},
+        "404": {"model": NotFoundResponse},
+    },
+)
+async def preview(request: Request, minio_path: str, expires: int, signature: str):
+    """
+    same as /download/ but shown inline (images, pdf, video seek)
+    """
+    return await signed_file_response(request, minio_path, expires, signature, inline=True)
@@ -1,4 +1,5 @@
 import traceback
+from typing import Literal, Union
 from fastapi import APIRouter, Depends, Request, BackgroundTasks, UploadFile, File, Form, Request
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
@@ -13,11 +14,9 @@ from core.responses import (
     InternalServerError,
 )
 from models import get_db
-from core.security import get_user_from_jwt_token, generate_jwt_token_from_user
-from core.security import (
-    get_user_from_jwt_token,
-    oauth2_scheme,
-)
+from core.security import generate_jwt_token_from_user
+from core.security import current_principal
+from core.principal import Principal
 from schemas.common import (
     BadRequestResponse,
     UnauthorizedResponse,
@@ -28,6 +27,7 @@ from schemas.common import (
 
 from schemas.rbac import (
     RoleManagementSchema,
+    RoleManagementMatrixSchema,
     UpdatePermissionRequest,
     UpdatePermissionResponse,
     UpdateMultiplePermissionRequest,
@@ -41,7 +41,7 @@ router = APIRouter(tags=["Role Management"])
     "/role-management",
     response_model=RoleManagementSchema,  # Pastikan model responsnya benar
     responses={
-        200: {"model": RoleManagementSchema},
+        200: {"model": Union[RoleManagementSchema, RoleManagementMatrixSchema]},
         400: {"model": BadRequestResponse},
         401: {"model": UnauthorizedResponse},
         404: {"model": NotFoundResponse},
@@ -49,15 +49,18 @@ router = APIRouter(tags=["Role Management"])
     },
 )
 async def role_management(
+    format: Literal["list", "matrix"] = "list",
     db: Session = Depends(get_db),
-    token: str = Depends(oauth2_scheme)
-
+    principal: Principal = Depends(current_principal),
 ):
+    """
+    format=matrix: permission catalogue once + permission_ids per role
+    """
     try:
-        user = await get_user_from_jwt_token(db, token)
-        if not user:
-            return common_response(Unauthorized())
-        data = await rbacRepo.get_role_management(db)
+        if format == "matrix":
+            data = await rbacRepo.get_role_management_matrix(db)
+        else:
+            data = await rbacRepo.get_role_management(db)
         return common_response(
             Ok(data=data)
         )
@@ -82,21 +85,14 @@ async def role_management(
 async def update_multiple_permission(
     request: UpdateMultiplePermissionRequest,
     db: Session = Depends(get_db),
-    token: str = Depends(oauth2_scheme)):
+    principal: Principal = Depends(current_principal),
+):
     try:
-        user = await get_user_from_jwt_token(db, token)
-        if not user:
-            return common_response(Unauthorized())
-        updated_permissions = []
-        for permission in request.permissions:
-            data = await rbacRepo.update_permission(
-                db=db,
-                role_id=permission.role_id,
-                permission_id=permission.permission_id,
-                isact=permission.isact,
-            )
-            updated_permissions.append(data)
-            
+        updated_permissions = await rbacRepo.bulk_update_permissions(
+            db=db,
+            permissions=[permission.model_dump() for permission in request.permissions],
+        )
+
         return common_response(
             CudResponse(data={"updated_permissions": updated_permissions}, message="Permissions updated successfully")
         )
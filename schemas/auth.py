@@ -170,6 +170,25 @@ class EditUserRequest(BaseModel):
     role_id: Optional[int] = None
     isact: Optional[bool] = None
 
+class BulkUserTarget(BaseModel):
+    # user_ids or a filter (src on the name, current role_id), at least one is required
+    user_ids: Optional[List[str]] = None
+    src: Optional[str] = None
+    role_id: Optional[int] = None
+
+class BulkUserRequest(BaseModel):
+    target: BulkUserTarget
+
+class BulkAssignRoleRequest(BaseModel):
+    target: BulkUserTarget
+    role_id: int
+
+class BulkUpdateUserRequest(BaseModel):
+    target: BulkUserTarget
+    phone: Optional[str] = None
+    address: Optional[str] = None
+    status: Optional[bool] = None
+
 class RoleOption(BaseModel):
     id: int
     name: str
@@ -26,6 +26,14 @@ class BadRequestResponse(BaseModel):
     message: str = "Bad Request"
 
 
+class ServiceUnavailableResponse(BaseModel):
+    meta: Optional[Any] = ""
+    data: Optional[Any] = ""
+    status: str = "failed"
+    code: int = 503
+    message: str = "Service Unavailable"
+
+
 class ForbiddenResponse(BaseModel):
     meta: Optional[Any] = ""
     data: Optional[Any] = ""
@@ -21,6 +21,29 @@ class RoleManagementSchema(BaseModel):
     isact: Optional[bool]
 
 
+class PermissionCatalogueSchema(BaseModel):
+    id: int
+    name: str
+    module: Optional[str]
+
+
+class RoleMatrixSchema(BaseModel):
+    role_id: int
+    name: str
+    description: Optional[str]
+    role: Optional[str]
+    access_feature: Optional[str]
+    permission_ids: List[int]
+    created_at: Optional[datetime]
+    updated_at: Optional[datetime]
+    isact: Optional[bool]
+
+
+class RoleManagementMatrixSchema(BaseModel):
+    permissions: List[PermissionCatalogueSchema]
+    roles: List[RoleMatrixSchema]
+
+
 class UpdatePermissionRequest(BaseModel):
     role_id: int
     permission_id: int
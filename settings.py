@@ -34,6 +34,58 @@ JWT_PREFIX = os.environ.get("JWT_PREFIX", "Bearer")
 SECRET_KEY = os.environ.get("SECRET_KEY", "98yt7ftdviuqedfhcu4gr894c2nr")
 ALGORITHM = os.environ.get("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.environ.get("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
+MOBILE_TOKEN_EXPIRE_MINUTES = int(os.environ.get("MOBILE_TOKEN_EXPIRE_MINUTES", 60 * 24 * 30))
+
+# Session table (user_token) daily partitions, keep at least the longest token lifetime
+SESSION_RETENTION_DAYS = int(
+    os.environ.get("SESSION_RETENTION_DAYS", MOBILE_TOKEN_EXPIRE_MINUTES // (60 * 24) + 1)
+)
+SESSION_PARTITION_PREMAKE_DAYS = int(os.environ.get("SESSION_PARTITION_PREMAKE_DAYS", 7))
+
+# Principal cache (verified jwt -> user), per worker
+PRINCIPAL_CACHE_TTL = float(os.environ.get("PRINCIPAL_CACHE_TTL", 5))
+PRINCIPAL_CACHE_MAXSIZE = int(os.environ.get("PRINCIPAL_CACHE_MAXSIZE", 10000))
+
+# seconds between "Stats ..." log lines with cache/pool counters per worker, 0 disables
+STATS_LOG_INTERVAL = float(os.environ.get("STATS_LOG_INTERVAL", 300))
+
+# Rendered /auth/menu per role combination, per worker (dropped on menu/permission changes)
+MENU_CACHE_TTL = float(os.environ.get("MENU_CACHE_TTL", 3600))
+MENU_CACHE_MAXSIZE = int(os.environ.get("MENU_CACHE_MAXSIZE", 1024))
+
+# Bulk user import (xlsx): rows per chunk/transaction, bcrypt on a process pool
+BULK_IMPORT_CHUNK_SIZE = int(os.environ.get("BULK_IMPORT_CHUNK_SIZE", 2000))
+BULK_IMPORT_HASH_WORKERS = int(os.environ.get("BULK_IMPORT_HASH_WORKERS", os.cpu_count() or 1))
+# initial passwords only, users change them on first login
+BULK_IMPORT_BCRYPT_ROUNDS = int(os.environ.get("BULK_IMPORT_BCRYPT_ROUNDS", 10))
+BULK_IMPORT_MAX_ERRORS = int(os.environ.get("BULK_IMPORT_MAX_ERRORS", 1000))
+
+# User export: rows fetched per server-side cursor round-trip
+EXPORT_BATCH_SIZE = int(os.environ.get("EXPORT_BATCH_SIZE", 2000))
+
+# User search (pg_trgm): shorter queries can not use the trigram index
+USER_SEARCH_MIN_LENGTH = int(os.environ.get("USER_SEARCH_MIN_LENGTH", 3))
+USER_SEARCH_MAX_LIMIT = int(os.environ.get("USER_SEARCH_MAX_LIMIT", 100))
+
+# List metadata count: exact | estimated | cached (exact, kept LIST_COUNT_CACHE_TTL seconds per filter)
+LIST_COUNT_STRATEGY = os.environ.get("LIST_COUNT_STRATEGY", "exact")
+if not LIST_COUNT_STRATEGY in ["exact", "estimated", "cached"]:
+    raise Exception(
+        "Invalid LIST_COUNT_STRATEGY, LIST_COUNT_STRATEGY should exact, estimated or cached"
+    )
+LIST_COUNT_CACHE_TTL = float(os.environ.get("LIST_COUNT_CACHE_TTL", 30))
+
+# Catalog cache (role/module/permission/menu) invalidated by LISTEN/NOTIFY
+CATALOG_LISTEN = os.environ.get("CATALOG_LISTEN", "true").lower() == "true"
+CATALOG_LISTEN_RECONNECT_SECONDS = float(os.environ.get("CATALOG_LISTEN_RECONNECT_SECONDS", 5))
+# seconds derived caches (authorization model, menu) are reused while the listener is down
+CATALOG_FALLBACK_TTL = float(os.environ.get("CATALOG_FALLBACK_TTL", 5))
+
+# Password hashing pool (bcrypt releases the GIL, threads are enough)
+PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", 4))
+PASSWORD_HASH_MAX_PENDING = int(os.environ.get("PASSWORD_HASH_MAX_PENDING", 64))
+# Retry-After (seconds) sent with the 503 when the pool is full
+PASSWORD_HASH_RETRY_AFTER = int(os.environ.get("PASSWORD_HASH_RETRY_AFTER", 1))
  
 # Timezone
 TZ = os.environ.get("TZ", "Asia/Jakarta")
@@ -64,6 +116,31 @@ MINIO_ACCESS_KEY = os.environ.get("MINIO_ACCESS_KEY", "")
 MINIO_SECRET_KEY = os.environ.get("MINIO_SECRET_KEY", "")
 MINIO_SECURE = str_to_bool(os.environ.get("MINIO_SECURE", "False"))
 MINIO_BUCKET = os.environ.get("MINIO_BUCKET", "ticketing")
+# set it to skip the bucket location lookup before the first presigned url
+MINIO_REGION = os.environ.get("MINIO_REGION", None)
+
+# Object storage client (core.storage): urllib3 pool + bounded thread pool per worker
+STORAGE_POOL_MAXSIZE = int(os.environ.get("STORAGE_POOL_MAXSIZE", 16))
+STORAGE_CONNECT_TIMEOUT = float(os.environ.get("STORAGE_CONNECT_TIMEOUT", 5))
+STORAGE_READ_TIMEOUT = float(os.environ.get("STORAGE_READ_TIMEOUT", 60))
+STORAGE_MAX_RETRIES = int(os.environ.get("STORAGE_MAX_RETRIES", 3))
+STORAGE_MAX_CONCURRENCY = int(os.environ.get("STORAGE_MAX_CONCURRENCY", STORAGE_POOL_MAXSIZE))
+STORAGE_MAX_PENDING = int(os.environ.get("STORAGE_MAX_PENDING", 256))
+# seconds per call: metadata calls (stat/delete/url) and body transfers (get/put)
+STORAGE_TIMEOUT = float(os.environ.get("STORAGE_TIMEOUT", 15))
+STORAGE_TRANSFER_TIMEOUT = float(os.environ.get("STORAGE_TRANSFER_TIMEOUT", 300))
+# Streaming uploads: S3 multipart part size (>= 5 MiB) and parts uploaded in parallel,
+# memory per upload stays around part size * (parallel + 1)
+STORAGE_UPLOAD_PART_SIZE = max(
+    int(os.environ.get("STORAGE_UPLOAD_PART_SIZE", 8 * 1024 * 1024)), 5 * 1024 * 1024
+)
+STORAGE_UPLOAD_PARALLEL = int(os.environ.get("STORAGE_UPLOAD_PARALLEL", 2))
+# Batch copy/move/delete: objects handled at the same time (keep <= STORAGE_MAX_PENDING)
+STORAGE_BATCH_CONCURRENCY = int(os.environ.get("STORAGE_BATCH_CONCURRENCY", STORAGE_MAX_CONCURRENCY))
+# stat/exists cache per worker, seconds (0 = off): found objects / missing objects
+STORAGE_STAT_CACHE_TTL = float(os.environ.get("STORAGE_STAT_CACHE_TTL", 0))
+STORAGE_STAT_CACHE_NEGATIVE_TTL = float(os.environ.get("STORAGE_STAT_CACHE_NEGATIVE_TTL", 0))
+STORAGE_STAT_CACHE_MAXSIZE = int(os.environ.get("STORAGE_STAT_CACHE_MAXSIZE", 10000))
  
 # Sentry
 SENTRY_DSN = os.environ.get("SENTRY_DSN", None)
@@ -78,9 +155,9 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
  
 # File Storage adapter
 FILE_STORAGE_ADAPTER = os.environ.get("FILE_STORAGE_ADAPTER", "minio")
-if not FILE_STORAGE_ADAPTER in ["local", "minio"]:
+if not FILE_STORAGE_ADAPTER in ["local", "minio", "memory"]:
     raise Exception(
-        "Invalid FILE_STORAGE_ADAPTER, FILE_STORAGE_ADAPTER should local or minio"
+        "Invalid FILE_STORAGE_ADAPTER, FILE_STORAGE_ADAPTER should local, minio or memory"
     )
  
 UPLOAD_DIR = os.path.join(BASE_DIR, "uploads")
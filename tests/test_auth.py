@@ -4,11 +4,14 @@ import pytest
 from datetime import datetime, timedelta
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
 from repository.auth import (
     get_user_by_email,
     check_user_password,
     edit_password,
     list_user,
+    list_user_keyset,
+    search_user,
     get_user_by_id,
     edit_user,
     get_role_options,
@@ -18,8 +21,14 @@ from repository.auth import (
     login,
     check_login_token,
     refresh_token_login,
-    logout_user
+    logout_user,
+    create_user_session,
+    build_menu_tree,
+    generate_menu_tree_for_user,
 )
+from core.security import generate_jwt_token_from_user, hash_session_token
+from core.principal import Principal
+from core.pagination import decode_cursor, encode_cursor
 from models.User import User
 from models.Role import Role
 from schemas.auth import (
@@ -54,7 +63,7 @@ class TestAuth(unittest.IsolatedAsyncioTestCase):
         self.assertEqual(user.name, "Test User")
         mock_db.execute.assert_called_once()
 
-    @patch("repository.auth.validated_user_password")
+    @patch("repository.auth.validated_user_password_async", new_callable=AsyncMock)
     async def test_check_user_password_success(self, mock_validate):
         # Setup mocks
         mock_db = AsyncMock(spec=AsyncSession)
@@ -112,16 +121,17 @@ class TestAuth(unittest.IsolatedAsyncioTestCase):
         ]
         
         # Setup mock behavior
-        mock_db.execute.return_value.all.return_value = mock_users
-        mock_db.execute.return_value.scalar.return_value = 2
+        mock_db.execute.return_value.all = Mock(return_value=mock_users)
+        mock_db.execute.return_value.scalar = Mock(return_value=2)
         
         # Call function
-        users, total, pages = await list_user(mock_db, page=1, page_size=10)
+        users, total, pages, strategy = await list_user(mock_db, page=1, page_size=10)
         
         # Assertions
         self.assertEqual(len(users), 2)
         self.assertEqual(total, 2)
         self.assertEqual(pages, 1)
+        self.assertEqual(strategy, "exact")
         mock_db.execute.assert_called()
 
     async def test_get_user_by_id_success(self):
@@ -135,7 +145,9 @@ class TestAuth(unittest.IsolatedAsyncioTestCase):
         )
         
         # Setup mock behavior
-        mock_db.execute.return_value.scalar_one_or_none.return_value = mock_user
+        mock_result = MagicMock()
+        mock_result.scalar_one_or_none.return_value = mock_user
+        mock_db.execute.return_value = mock_result
         
         # Call function
         user = await get_user_by_id(mock_db, "1")
@@ -159,13 +171,13 @@ class TestAuth(unittest.IsolatedAsyncioTestCase):
 
         # Create mock result object for db.execute
         mock_execute_result_1 = MagicMock()
-        mock_execute_result_1.scalar_one_or_none = AsyncMock(return_value=mock_role)
+        mock_execute_result_1.scalar_one_or_none = Mock(return_value=mock_role)
 
         mock_execute_result_2 = MagicMock()
-        mock_execute_result_2.scalar_one_or_none = AsyncMock(return_value=mock_user)
+        mock_execute_result_2.scalar_one_or_none = Mock(return_value=mock_user)
 
-        # db.execute should return mock results in order (get_user_by_id, then role)
-        mock_db.execute = AsyncMock(side_effect=[mock_execute_result_2, mock_execute_result_1])
+        # db.execute should return mock results in order (get_user_by_id, role, effective permission refresh)
+        mock_db.execute = AsyncMock(side_effect=[mock_execute_result_2, mock_execute_result_1, MagicMock()])
 
         # Call function
         request = EditUserRequest(
@@ -183,6 +195,8 @@ class TestAuth(unittest.IsolatedAsyncioTestCase):
         assert updated_user.name == "Updated User"
         assert updated_user.phone == "1234567890"
         assert updated_user.roles[0].id == 1
+        mock_db.flush.assert_called_once()
+        self.assertEqual(mock_db.execute.call_count, 3)
     
     async def test_get_role_options_success(self):
         # Setup mock
@@ -192,8 +206,8 @@ class TestAuth(unittest.IsolatedAsyncioTestCase):
             Role(id=2, name="User", group="user", isact=True)
         ]
         
-        # Setup mock behavior
-        mock_db.execute.return_value.scalars.return_value = mock_roles
+        # Setup mock behavior (role catalog rows)
+        mock_db.execute.return_value.all = Mock(return_value=mock_roles)
         
         # Call function
         roles = await get_role_options(mock_db)
@@ -209,7 +223,7 @@ class TestAuth(unittest.IsolatedAsyncioTestCase):
         mock_db = AsyncMock(spec=AsyncSession)
         mock_role = Role(id=1, name="User", isact=True)
         
-        mock_db.execute.return_value.scalar = Mock(return_value=mock_role)
+        mock_db.execute.return_value.all = Mock(return_value=[mock_role])
         
         # Call function
         request = SignUpRequest(
@@ -222,7 +236,8 @@ class TestAuth(unittest.IsolatedAsyncioTestCase):
         
         # Assertions
         self.assertTrue(result)
-        mock_db.execute.assert_called_once()
+        # role catalog + user_role insert + user_effective_permission refresh
+        self.assertEqual(mock_db.execute.call_count, 3)
         mock_db.add.assert_called_once()  
         mock_db.commit.assert_called_once()
         
@@ -270,7 +285,7 @@ class TestAuth(unittest.IsolatedAsyncioTestCase):
         mock_db.table().select().eq().execute.assert_called_once()
         mock_db.table().update().eq().execute.assert_called()
 
-    @patch("repository.auth.validated_user_password")
+    @patch("repository.auth.validated_user_password_async", new_callable=AsyncMock)
     async def test_login_success(self, mock_validate):
         # Setup mock
         mock_db = MagicMock()
@@ -316,8 +331,8 @@ class TestAuth(unittest.IsolatedAsyncioTestCase):
         mock_user_token.isact = True
         
         # Setup mock behavior
-        mock_result = AsyncMock()
-        mock_result.scalar = AsyncMock(return_value=mock_user_token)
+        mock_result = MagicMock()
+        mock_result.scalar = Mock(return_value=mock_user_token)
         mock_db.execute.return_value = mock_result
         
         # Call function
@@ -327,4 +342,144 @@ class TestAuth(unittest.IsolatedAsyncioTestCase):
         self.assertEqual(result, "oke")
         mock_db.execute.assert_called_once()
         mock_db.add.assert_called_once()
-        mock_db.commit.assert_called_once() 
\ No newline at end of file
+        mock_db.commit.assert_called_once() 
+
+    async def test_create_user_session_stores_token_hash(self):
+        # Setup mock
+        mock_db = AsyncMock(spec=AsyncSession)
+        mock_db.add = Mock()
+        mock_result = MagicMock()
+        mock_result.scalar = Mock(return_value=None)
+        mock_db.execute.return_value = mock_result
+        token = await generate_jwt_token_from_user(user=User(id="1", email="test@example.com"))
+
+        # Call function
+        result = await create_user_session(mock_db, "1", token)
+
+        # Assertions
+        self.assertEqual(result, "succes")
+        user_token = mock_db.add.call_args[0][0]
+        self.assertEqual(user_token.token_hash, hash_session_token(token))
+        self.assertEqual(len(user_token.token_hash), 64)
+        self.assertIsNotNone(user_token.expires_at)
+        mock_db.commit.assert_called_once()
+
+    def test_build_menu_tree(self):
+        # Setup mock: rows come ordered by (order, id)
+        def menu(id, parent_id, permission_id, is_has_child=False, order_id=0):
+            return Mock(
+                id=id, parent_id=parent_id, permission_id=permission_id,
+                is_has_child=is_has_child, is_show=True, order_id=order_id,
+                url=f"/menu/{id}", icon=None,
+            )
+        rows = [
+            menu(2, None, 1),
+            menu(1, None, 1, is_has_child=True),
+            menu(3, 1, 1),
+            menu(4, 1, 2),                       # no permission
+            menu(5, None, 1, is_has_child=True),  # every child hidden -> pruned
+            menu(6, 5, 2),
+            menu(7, 4, 1),                       # parent hidden
+        ]
+        for row in rows:
+            row.name = f"Menu {row.id}"
+
+        # Call function
+        tree = build_menu_tree(rows, frozenset({1}))
+
+        # Assertions
+        self.assertEqual([x["id"] for x in tree], [2, 1])
+        self.assertFalse(tree[0]["sub"])
+        self.assertEqual([x["id"] for x in tree[1]["sub"]], [3])
+        self.assertEqual(
+            tree[1]["sub"][0],
+            {"id": 3, "title": "Menu 3", "path": "/menu/3", "icon": None, "is_show": True, "sub": False},
+        )
+
+    async def test_generate_menu_tree_for_user_single_query(self):
+        # Setup mock
+        mock_db = AsyncMock(spec=AsyncSession)
+        mock_db.execute.return_value.all = Mock(return_value=[])
+        principal = Principal(
+            id="1", email="test@example.com", name="Test", role_ids=(1,), permission_ids=frozenset({1})
+        )
+
+        # Call function
+        result = await generate_menu_tree_for_user(mock_db, principal)
+
+        # Assertions
+        self.assertEqual(result, [])
+        mock_db.execute.assert_called_once()
+
+    async def test_list_user_keyset_pages(self):
+        # Setup mock: page_size + 1 rows means there is a next page
+        mock_db = AsyncMock(spec=AsyncSession)
+        created_at = datetime(2024, 1, 10)
+        rows = [Mock(id=str(i), created_at=created_at - timedelta(days=i)) for i in range(3)]
+        for row in rows:
+            row.name = f"User {row.id}"
+        mock_db.execute.return_value.all = Mock(return_value=rows)
+
+        # Call function
+        data, next_cursor, prev_cursor, num_data, strategy = await list_user_keyset(mock_db, page_size=2)
+
+        # Assertions
+        self.assertEqual([x["id"] for x in data], ["0", "1"])
+        self.assertEqual(decode_cursor(next_cursor), (rows[1].created_at, "1", "n"))
+        self.assertIsNone(prev_cursor)
+        self.assertIsNone(num_data)
+        mock_db.execute.assert_called_once()
+
+    async def test_list_user_keyset_prev_page(self):
+        # Setup mock: rows come back ascending when reading backwards
+        mock_db = AsyncMock(spec=AsyncSession)
+        created_at = datetime(2024, 1, 10)
+        rows = [Mock(id=str(i), created_at=created_at + timedelta(days=i)) for i in range(2)]
+        for row in rows:
+            row.name = f"User {row.id}"
+        mock_db.execute.return_value.all = Mock(return_value=rows)
+        mock_db.execute.return_value.scalar = Mock(return_value=40)
+
+        # Call function
+        cursor = encode_cursor(created_at - timedelta(days=1), "x", "p")
+        data, next_cursor, prev_cursor, num_data, strategy = await list_user_keyset(
+            mock_db, page_size=2, cursor=cursor, with_count=True
+        )
+
+        # Assertions
+        self.assertEqual([x["id"] for x in data], ["1", "0"])
+        self.assertEqual(decode_cursor(next_cursor)[1:], ("0", "n"))
+        self.assertIsNone(prev_cursor)
+        self.assertEqual(num_data, 40)
+        self.assertEqual(strategy, "exact")
+
+    async def test_list_user_keyset_invalid_cursor(self):
+        mock_db = AsyncMock(spec=AsyncSession)
+        with self.assertRaises(ValueError):
+            await list_user_keyset(mock_db, cursor="not-a-cursor")
+        mock_db.execute.assert_not_called()
+
+    async def test_search_user_ranked(self):
+        # Setup mock
+        mock_db = AsyncMock(spec=AsyncSession)
+        row = Mock(id="1", email="rafi@example.com", phone="0812", score=0.75)
+        row.name = "Rafi"
+        mock_db.execute.return_value.all = Mock(return_value=[row])
+
+        # Call function
+        result = await search_user(mock_db, " rafi ", limit=1000)
+
+        # Assertions
+        self.assertEqual(result, [
+            {"id": "1", "name": "Rafi", "email": "rafi@example.com", "phone": "0812", "score": 0.75}
+        ])
+        query = mock_db.execute.call_args.args[0]
+        sql = str(query.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+        # every column is bounded by a KNN scan before the ranking
+        self.assertEqual(sql.count("<->> 'rafi'"), 3)
+        self.assertEqual(sql.count("LIMIT 100"), 4)
+
+    async def test_search_user_short_query(self):
+        mock_db = AsyncMock(spec=AsyncSession)
+        self.assertEqual(await search_user(mock_db, "ra"), [])
+        mock_db.execute.assert_not_called()
@@ -0,0 +1,120 @@
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+from sqlalchemy.ext.asyncio import AsyncSession
+from core.catalog import CatalogCache, CatalogListener, on_catalog_changed
+from core.menu_cache import get_cached_menu, get_menu_generation, menu_cache, set_cached_menu
+
+
+class TestCatalogCache(unittest.IsolatedAsyncioTestCase):
+    async def test_loads_once_while_enabled(self):
+        # Setup mock
+        cache = CatalogCache()
+        cache.enabled = True
+        mock_db = AsyncMock(spec=AsyncSession)
+        mock_db.execute.return_value.all = MagicMock(return_value=[(1, "Admin")])
+
+        # Call function
+        first = await cache.get(mock_db, "role")
+        second = await cache.get(mock_db, "role")
+
+        # Assertions
+        self.assertEqual(first, ((1, "Admin"),))
+        self.assertIs(first, second)
+        mock_db.execute.assert_called_once()
+
+    async def test_invalidate_reloads_only_that_table(self):
+        # Setup mock
+        cache = CatalogCache()
+        cache.enabled = True
+        mock_db = AsyncMock(spec=AsyncSession)
+        mock_db.execute.return_value.all = MagicMock(return_value=[])
+        await cache.get(mock_db, "role")
+        await cache.get(mock_db, "menu")
+
+        # Call function
+        cache.invalidate("menu")
+        await cache.get(mock_db, "role")
+        await cache.get(mock_db, "menu")
+
+        # Assertions
+        self.assertEqual(mock_db.execute.call_count, 3)
+
+    async def test_nothing_cached_without_listener(self):
+        # Setup mock
+        cache = CatalogCache()
+        mock_db = AsyncMock(spec=AsyncSession)
+        mock_db.execute.return_value.all = MagicMock(return_value=[])
+
+        # Call function
+        await cache.get(mock_db, "permission")
+        await cache.get(mock_db, "permission")
+
+        # Assertions
+        self.assertEqual(mock_db.execute.call_count, 2)
+
+    async def test_invalidation_during_load_is_not_cached(self):
+        # Setup mock
+        cache = CatalogCache()
+        cache.enabled = True
+        mock_db = AsyncMock(spec=AsyncSession)
+
+        async def execute(query):
+            cache.invalidate("role")
+            result = MagicMock()
+            result.all.return_value = [(1, "old")]
+            return result
+        mock_db.execute = AsyncMock(side_effect=execute)
+
+        # Call function
+        await cache.get(mock_db, "role")
+        await cache.get(mock_db, "role")
+
+        # Assertions
+        self.assertEqual(mock_db.execute.call_count, 2)
+
+    @patch("core.catalog.invalidate_menu_cache")
+    @patch("core.catalog.invalidate_principal_cache")
+    @patch("core.catalog.invalidate_authorization_model")
+    @patch("core.catalog.catalog")
+    def test_on_catalog_changed(self, mock_catalog, mock_model, mock_principal, mock_menu):
+        # Call function
+        on_catalog_changed("role")
+        on_catalog_changed("role_permission")
+        on_catalog_changed("module")
+
+        # Assertions
+        invalidated = [x.args[0] for x in mock_catalog.invalidate.call_args_list]
+        self.assertEqual(invalidated, ["role", "module", "permission"])
+        self.assertEqual(mock_model.call_count, 2)
+        self.assertEqual(mock_principal.call_count, 2)
+        self.assertEqual(mock_menu.call_count, 2)
+
+
+class TestCatalogListener(unittest.IsolatedAsyncioTestCase):
+    @patch("core.catalog.asyncpg.connect", new_callable=AsyncMock)
+    async def test_on_connect_warms_after_listening(self, mock_connect):
+        # Setup mock
+        connection = MagicMock()
+        connection.add_listener = AsyncMock()
+        connection.close = AsyncMock()
+        connection.is_closed.return_value = False
+        mock_connect.return_value = connection
+        seen = {}
+
+        async def on_connect():
+            set_cached_menu((1,), b"menu", get_menu_generation())
+            seen["ttl_left"] = menu_cache._data[(1,)][1] - menu_cache._clock()
+            seen["cached"] = get_cached_menu((1,))
+            # drop the connection so _listen_once returns
+            connection.add_termination_listener.call_args.args[0](connection)
+
+        listener = CatalogListener("postgresql://test", on_connect=on_connect)
+
+        # Call function
+        await listener._listen_once()
+
+        # Assertions
+        self.assertEqual(seen["cached"], b"menu")
+        self.assertGreater(seen["ttl_left"], 60)
+        self.assertIsNone(get_cached_menu((1,)))
+        connection.close.assert_called_once()
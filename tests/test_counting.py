@@ -0,0 +1,131 @@
+import unittest
+from unittest.mock import AsyncMock, MagicMock, Mock
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from core.counting import count_cache, count_rows
+from models.User import User
+from repository.auth import count_user
+
+
+class TestCountRows(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        count_cache.clear()
+        self.query = select(User.id).filter(User.isact == True)
+
+    async def test_exact(self):
+        # Setup mock
+        mock_db = AsyncMock(spec=AsyncSession)
+        mock_db.execute.return_value.scalar = Mock(return_value=42)
+
+        # Call function
+        result = await count_rows(mock_db, self.query, strategy="exact")
+
+        # Assertions
+        self.assertEqual(result, (42, "exact"))
+        self.assertIn("count(*)", str(mock_db.execute.call_args.args[0]))
+
+    async def test_estimated_uses_explain(self):
+        # Setup mock
+        mock_db = AsyncMock(spec=AsyncSession)
+        mock_db.execute.return_value.scalar = Mock(return_value='[{"Plan": {"Plan Rows": 1000}}]')
+
+        # Call function
+        result = await count_rows(mock_db, self.query, strategy="estimated")
+
+        # Assertions
+        self.assertEqual(result, (1000, "estimated"))
+        self.assertTrue(str(mock_db.execute.call_args.args[0]).startswith("EXPLAIN (FORMAT JSON)"))
+
+    async def test_estimated_uses_reltuples_for_whole_table(self):
+        # Setup mock
+        mock_db = AsyncMock(spec=AsyncSession)
+        mock_db.execute.return_value.scalar = Mock(return_value=1234.0)
+
+        # Call function
+        result = await count_rows(mock_db, select(User.id), strategy="estimated", table="user")
+
+        # Assertions
+        self.assertEqual(result, (1234, "estimated"))
+        mock_db.execute.assert_called_once()
+
+    async def test_estimated_with_filter_is_exact(self):
+        # Setup mock
+        mock_db = AsyncMock(spec=AsyncSession)
+        mock_db.execute.return_value.scalar = Mock(return_value=3)
+
+        # Call function
+        result = await count_rows(mock_db, self.query, strategy="estimated", filtered=True)
+
+        # Assertions
+        self.assertEqual(result, (3, "exact"))
+
+    async def test_cached_per_filter(self):
+        # Setup mock
+        mock_db = AsyncMock(spec=AsyncSession)
+        mock_db.execute.return_value.scalar = Mock(return_value=7)
+
+        # Call function
+        first = await count_rows(mock_db, self.query, strategy="cached", cache_key=("user", "a"))
+        second = await count_rows(mock_db, self.query, strategy="cached", cache_key=("user", "a"))
+        await count_rows(mock_db, self.query, strategy="cached", cache_key=("user", "b"))
+
+        # Assertions
+        self.assertEqual(first, (7, "cached"))
+        self.assertEqual(second, (7, "cached"))
+        self.assertEqual(mock_db.execute.call_count, 2)
+
+    async def test_unknown_strategy(self):
+        mock_db = AsyncMock(spec=AsyncSession)
+        with self.assertRaises(ValueError):
+            await count_rows(mock_db, self.query, strategy="guess")
+
+
+class TestCountUser(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        count_cache.clear()
+
+    async def test_estimated_without_filter_uses_active_index_reltuples(self):
+        # Setup mock
+        mock_db = AsyncMock(spec=AsyncSession)
+        mock_db.execute.return_value.scalar = Mock(return_value=1000000.0)
+
+        # Call function
+        result = await count_user(mock_db, count_strategy="estimated")
+
+        # Assertions
+        self.assertEqual(result, (1000000, "estimated"))
+        mock_db.execute.assert_called_once()
+        self.assertIn("pg_class", str(mock_db.execute.call_args.args[0]))
+        self.assertEqual(
+            mock_db.execute.call_args.args[1], {"table": "ix_user_active_created_at_id"}
+        )
+
+    async def test_estimated_with_search_is_exact(self):
+        # Setup mock
+        mock_db = AsyncMock(spec=AsyncSession)
+        mock_db.execute.return_value.scalar = Mock(return_value=3)
+
+        # Call function
+        result = await count_user(mock_db, src="rafi", count_strategy="estimated")
+
+        # Assertions
+        self.assertEqual(result, (3, "exact"))
+        self.assertNotIn("pg_class", str(mock_db.execute.call_args.args[0]))
+
+    async def test_estimated_falls_back_to_explain_before_analyze(self):
+        # Setup mock, reltuples is -1 until the index is vacuumed/analyzed
+        mock_db = AsyncMock(spec=AsyncSession)
+        reltuples = MagicMock()
+        reltuples.scalar = Mock(return_value=-1.0)
+        plan = MagicMock()
+        plan.scalar = Mock(return_value='[{"Plan": {"Plan Rows": 900}}]')
+        mock_db.execute = AsyncMock(side_effect=[reltuples, plan])
+
+        # Call function
+        result = await count_user(mock_db, count_strategy="estimated")
+
+        # Assertions
+        self.assertEqual(result, (900, "estimated"))
+        explained = str(mock_db.execute.call_args.args[0])
+        self.assertTrue(explained.startswith("EXPLAIN (FORMAT JSON)"))
+        self.assertIn("isact = true", explained)
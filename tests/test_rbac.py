@@ -0,0 +1,204 @@
+import unittest
+from unittest.mock import AsyncMock, MagicMock, Mock, patch
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import AsyncSession
+from repository.effective_permission import (
+    effective_permission_upsert,
+    get_user_effective_permissions,
+    refresh_effective_permissions,
+)
+from repository.rbac import (
+    get_role_management,
+    get_role_management_matrix,
+    update_permission,
+    bulk_update_permissions,
+)
+from models.Role import Role
+from models.Permission import Permission
+from schemas.rbac import RoleMatrixSchema
+
+
+class TestEffectivePermission(unittest.IsolatedAsyncioTestCase):
+    def test_upsert_is_one_statement(self):
+        sql = str(effective_permission_upsert().compile(dialect=postgresql.dialect()))
+        self.assertIn("INSERT INTO user_effective_permission", sql)
+        self.assertIn("ON CONFLICT (user_id) DO UPDATE", sql)
+
+    async def test_refresh_needs_a_scope(self):
+        # Setup mock
+        mock_db = AsyncMock(spec=AsyncSession)
+
+        # Call function
+        await refresh_effective_permissions(mock_db)
+        await refresh_effective_permissions(mock_db, role_ids=[1])
+
+        # Assertions
+        mock_db.execute.assert_called_once()
+
+    async def test_get_user_effective_permissions(self):
+        # Setup mock
+        mock_db = AsyncMock(spec=AsyncSession)
+        mock_db.execute.return_value.scalar = Mock(return_value=[
+            {"id": 2, "name": "edit", "module_id": None, "module": None},
+            {"id": 1, "name": "view", "module_id": 3, "module": "user"},
+        ])
+
+        # Call function
+        result = await get_user_effective_permissions(mock_db, "user-1")
+
+        # Assertions
+        self.assertEqual(result, [
+            {"id": 1, "permission": "view", "module": {"id": 3, "nama": "user"}},
+            {"id": 2, "permission": "edit", "module": None},
+        ])
+        mock_db.execute.assert_called_once()
+
+
+class TestRbac(unittest.IsolatedAsyncioTestCase):
+    async def test_get_role_management_two_queries(self):
+        # Setup mock
+        mock_db = AsyncMock(spec=AsyncSession)
+        roles = [
+            Role(id=1, name="Admin", group="admin", isact=True),
+            Role(id=2, name="User", group="user", isact=True),
+            Role(id=3, name="Guest", group="user", isact=True),
+        ]
+        role_result = MagicMock()
+        role_result.scalars.return_value.all.return_value = roles
+        perm_result = MagicMock()
+        perm_result.all.return_value = [(1, 10, "user"), (1, 11, None), (2, 10, "user")]
+        mock_db.execute = AsyncMock(side_effect=[role_result, perm_result])
+
+        # Call function
+        result = await get_role_management(mock_db)
+
+        # Assertions
+        self.assertEqual(mock_db.execute.call_count, 2)
+        self.assertEqual([r["role_id"] for r in result], [1, 2, 3])
+        self.assertEqual(result[0]["permissions"], [
+            {"permission_id": 10, "module": "user", "access": True},
+            {"permission_id": 11, "module": None, "access": True},
+        ])
+        self.assertEqual(result[2]["permissions"], [])
+
+    async def test_get_role_management_matrix(self):
+        # Setup mock
+        mock_db = AsyncMock(spec=AsyncSession)
+        catalogue_result = MagicMock()
+        catalogue_result.all.return_value = [
+            Mock(id=10, module="user", isact=True),
+            Mock(id=11, module=None, isact=True),
+            Mock(id=12, module=None, isact=False),
+        ]
+        catalogue_result.all.return_value[0].name = "view"
+        catalogue_result.all.return_value[1].name = "edit"
+        role_row = Mock(
+            id=1, description=None, group="admin", access_feature=None,
+            created_at=None, updated_at=None, isact=True, permission_ids=[10, 11],
+        )
+        role_row.name = "Admin"
+        role_result = MagicMock()
+        role_result.all.return_value = [role_row]
+        mock_db.execute = AsyncMock(side_effect=[catalogue_result, role_result])
+
+        # Call function
+        result = await get_role_management_matrix(mock_db)
+
+        # Assertions
+        self.assertEqual(mock_db.execute.call_count, 2)
+        self.assertEqual(result["permissions"], [
+            {"id": 10, "name": "view", "module": "user"},
+            {"id": 11, "name": "edit", "module": None},
+        ])
+        self.assertEqual(result["roles"][0]["permission_ids"], [10, 11])
+        self.assertEqual(result["roles"][0]["role"], "admin")
+        self.assertEqual(
+            set(result["roles"][0]), set(RoleMatrixSchema.model_fields)
+        )
+
+    @patch("repository.rbac.invalidate_principal_cache")
+    @patch("repository.rbac.invalidate_authorization_model")
+    @patch("repository.rbac.refresh_effective_permissions", new_callable=AsyncMock)
+    async def test_update_permission_refreshes_role_members(
+        self, mock_refresh, mock_invalidate_model, mock_invalidate_cache
+    ):
+        # Setup mock
+        mock_db = AsyncMock(spec=AsyncSession)
+        role_result = MagicMock()
+        role_result.scalar_one_or_none = Mock(return_value=Role(id=1, name="Admin"))
+        permission_result = MagicMock()
+        permission_result.scalar_one_or_none = Mock(return_value=Permission(id=2, name="view"))
+        existing_result = MagicMock()
+        existing_result.scalar_one_or_none = Mock(return_value=None)
+        mock_db.execute = AsyncMock(
+            side_effect=[role_result, permission_result, existing_result, MagicMock()]
+        )
+
+        # Call function
+        result = await update_permission(mock_db, role_id=1, permission_id=2, isact=True)
+
+        # Assertions
+        self.assertEqual(result, {"role_id": 1, "permission_id": 2, "isact": True})
+        mock_refresh.assert_awaited_once_with(mock_db, role_ids=[1])
+        mock_db.commit.assert_called_once()
+        mock_invalidate_model.assert_called_once()
+        mock_invalidate_cache.assert_called_once()
+
+    @patch("repository.rbac.invalidate_principal_cache")
+    @patch("repository.rbac.invalidate_authorization_model")
+    @patch("repository.rbac.refresh_effective_permissions", new_callable=AsyncMock)
+    async def test_bulk_update_permissions_single_upsert(
+        self, mock_refresh, mock_invalidate_model, mock_invalidate_cache
+    ):
+        # Setup mock
+        mock_db = AsyncMock(spec=AsyncSession)
+        role_result = MagicMock()
+        role_result.scalars.return_value.all.return_value = [1, 2]
+        permission_result = MagicMock()
+        permission_result.scalars.return_value.all.return_value = [10, 11]
+        upsert_result = MagicMock()
+        upsert_result.all.return_value = [
+            Mock(role_id=2, permission_id=10, isact=True),
+            Mock(role_id=1, permission_id=11, isact=False),
+            Mock(role_id=1, permission_id=10, isact=True),
+        ]
+        mock_db.execute = AsyncMock(side_effect=[role_result, permission_result, upsert_result])
+
+        # Call function
+        result = await bulk_update_permissions(mock_db, [
+            {"role_id": 1, "permission_id": 10, "isact": False},
+            {"role_id": 1, "permission_id": 11, "isact": False},
+            {"role_id": 2, "permission_id": 10, "isact": True},
+            {"role_id": 1, "permission_id": 10, "isact": True},
+        ])
+
+        # Assertions
+        self.assertEqual(mock_db.execute.call_count, 3)
+        upsert = str(mock_db.execute.call_args_list[2].args[0].compile(dialect=postgresql.dialect()))
+        self.assertIn("ON CONFLICT (role_id, permission_id) DO UPDATE", upsert)
+        self.assertEqual(result, [
+            {"role_id": 1, "permission_id": 10, "isact": True},
+            {"role_id": 1, "permission_id": 11, "isact": False},
+            {"role_id": 2, "permission_id": 10, "isact": True},
+        ])
+        mock_refresh.assert_awaited_once_with(mock_db, role_ids=[1, 2])
+        mock_db.commit.assert_called_once()
+
+    async def test_bulk_update_permissions_unknown_role(self):
+        # Setup mock
+        mock_db = AsyncMock(spec=AsyncSession)
+        role_result = MagicMock()
+        role_result.scalars.return_value.all.return_value = [1]
+        mock_db.execute = AsyncMock(side_effect=[role_result])
+
+        # Call function
+        with self.assertRaises(ValueError) as ctx:
+            await bulk_update_permissions(mock_db, [
+                {"role_id": 1, "permission_id": 10, "isact": True},
+                {"role_id": 3, "permission_id": 10, "isact": True},
+            ])
+
+        # Assertions
+        self.assertIn("Role dengan ID 3 tidak ditemukan", str(ctx.exception))
+        mock_db.commit.assert_not_called()
+        mock_db.rollback.assert_called_once()
@@ -0,0 +1,538 @@
+import asyncio
+import threading
+import unittest
+from unittest.mock import AsyncMock, MagicMock, Mock, patch
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import AsyncSession
+from core.cache import TTLCache
+from core.executor import BoundedExecutor, ExecutorOverloaded
+from core.security import (
+    generate_hash_password_async,
+    generate_jwt_token_from_user,
+    get_principal_from_jwt_token,
+    get_user_from_jwt_token,
+    current_principal,
+    hash_session_token,
+    require_permission,
+    invalidate_cached_token,
+    invalidate_cached_user,
+    is_user_has_permission,
+    principal_cache,
+    session_token_clause,
+    validated_user_password_async,
+)
+from core.session_partitions import session_partition_name
+from core.principal import Principal
+import core.authorization as authorization
+from core.authorization import (
+    compile_authorization_model,
+    get_authorization_model,
+    get_loaded_authorization_model,
+    invalidate_authorization_model,
+    set_authorization_listening,
+)
+from core.menu_cache import (
+    get_cached_menu,
+    get_menu_generation,
+    invalidate_menu_cache,
+    menu_cache,
+    render_menu_body,
+    set_cached_menu,
+    set_menu_listening,
+)
+from core.metrics import format_stats, log_runtime_stats
+from core.responses import common_response, Ok
+from repository.auth import warm_menu_cache
+from models import get_db
+import main
+from datetime import date
+from models.User import User
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTTLCache(unittest.TestCase):
+    def test_hit_miss_and_expiry(self):
+        # Setup cache
+        clock = FakeClock()
+        cache = TTLCache(maxsize=10, ttl=5, clock=clock)
+
+        # Call function
+        cache.set("a", 1)
+        first = cache.get("a")
+        clock.now = 6
+        second = cache.get("a")
+
+        # Assertions
+        self.assertEqual(first, 1)
+        self.assertIsNone(second)
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 1)
+
+    def test_lru_eviction(self):
+        # Setup cache
+        cache = TTLCache(maxsize=2, ttl=60)
+
+        # Call function
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        # Assertions
+        self.assertEqual(cache.get("a"), 1)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_delete_tag(self):
+        # Setup cache
+        cache = TTLCache(maxsize=10, ttl=60)
+        cache.set("t1", 1, tag="user-1")
+        cache.set("t2", 2, tag="user-1")
+        cache.set("t3", 3, tag="user-2")
+
+        # Call function
+        cache.delete_tag("user-1")
+
+        # Assertions
+        self.assertIsNone(cache.get("t1"))
+        self.assertIsNone(cache.get("t2"))
+        self.assertEqual(cache.get("t3"), 3)
+
+
+class TestPrincipalCache(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        principal_cache.clear()
+
+    async def test_get_user_from_jwt_token_is_not_cached(self):
+        # Setup mock
+        mock_db = AsyncMock(spec=AsyncSession)
+        mock_user = User(id="user-1", email="test@example.com", isact=True)
+        mock_user_token = MagicMock()
+        mock_user_token.isact = True
+        mock_token_result = MagicMock()
+        mock_token_result.scalar = Mock(return_value=mock_user_token)
+        mock_user_result = MagicMock()
+        mock_user_result.scalar = Mock(return_value=mock_user)
+        mock_db.execute = AsyncMock(
+            side_effect=[mock_token_result, mock_user_result, mock_token_result, mock_user_result]
+        )
+        token = await generate_jwt_token_from_user(user=mock_user)
+
+        # Call function
+        first = await get_user_from_jwt_token(mock_db, token)
+        second = await get_user_from_jwt_token(mock_db, token)
+
+        # Assertions
+        self.assertIs(first, mock_user)
+        self.assertIs(second, mock_user)
+        self.assertEqual(mock_db.execute.call_count, 4)
+        self.assertEqual(len(principal_cache), 0)
+
+    @patch("core.security.get_authorization_model", new_callable=AsyncMock)
+    async def test_get_principal_from_jwt_token_single_query(self, mock_get_model):
+        # Setup mock
+        mock_get_model.return_value = compile_authorization_model([(3, "view", "user", 1)])
+        mock_db = AsyncMock(spec=AsyncSession)
+        row = {
+            "id": "user-1",
+            "email": "test@example.com",
+            "name": "Test User",
+            "role_ids": [1],
+            "permission_ids": [3, 5],
+        }
+        mock_result = MagicMock()
+        mock_result.mappings.return_value.first.return_value = row
+        mock_db.execute = AsyncMock(return_value=mock_result)
+        token = await generate_jwt_token_from_user(user=User(id="user-1", email="test@example.com"))
+
+        # Call function
+        first = await get_principal_from_jwt_token(mock_db, token)
+        second = await get_principal_from_jwt_token(mock_db, token)
+
+        # Assertions
+        self.assertIsInstance(first, Principal)
+        self.assertEqual(first.permission_ids, frozenset({3, 5}))
+        self.assertTrue(first.has_permission_id(3))
+        self.assertEqual(first.permission_bits, 1 << 3)
+        self.assertIs(first, second)
+        with self.assertRaises(AttributeError):
+            first.email = "other@example.com"
+        mock_db.execute.assert_called_once()
+
+    async def test_invalidation(self):
+        # Setup cache
+        mock_user = User(id="user-1", email="test@example.com", isact=True)
+        token = await generate_jwt_token_from_user(user=mock_user)
+        other = await generate_jwt_token_from_user(user=User(id="user-2", email="b@example.com"))
+        principal_cache.set(("principal", hash_session_token(token)), {"id": "user-1"}, tag="user-1")
+        principal_cache.set(("principal", hash_session_token(other)), {"id": "user-2"}, tag="user-2")
+
+        # Call function
+        invalidate_cached_token(token)
+        invalidate_cached_user("user-2")
+
+        # Assertions
+        self.assertEqual(len(principal_cache), 0)
+
+
+class TestPasswordHasher(unittest.IsolatedAsyncioTestCase):
+    async def test_hash_and_verify_async(self):
+        # Call function
+        hashed = await generate_hash_password_async("password123")
+        valid = await validated_user_password_async(hashed, "password123")
+        invalid = await validated_user_password_async(hashed, "wrong")
+
+        # Assertions
+        self.assertTrue(valid)
+        self.assertFalse(invalid)
+
+    async def test_bounded_executor_rejects_when_full(self):
+        # Setup executor with one slot held by a blocked job
+        executor = BoundedExecutor(name="test", max_workers=1, max_pending=1)
+        release = threading.Event()
+        running = asyncio.ensure_future(executor.run(release.wait, 5))
+        await asyncio.sleep(0.01)
+
+        # Call function
+        with self.assertRaises(ExecutorOverloaded):
+            await executor.run(lambda: None)
+        release.set()
+        await running
+
+        # Assertions
+        stats = executor.stats()
+        self.assertEqual(stats["rejected"], 1)
+        self.assertEqual(stats["completed"], 1)
+        self.assertEqual(stats["pending"], 0)
+        executor.shutdown()
+
+
+class TestSessionToken(unittest.IsolatedAsyncioTestCase):
+    async def test_session_token_clause_prunes_by_issue_day(self):
+        # Setup token
+        token = await generate_jwt_token_from_user(user=User(id="1", email="test@example.com"))
+
+        # Call function
+        clause = str(session_token_clause(token))
+
+        # Assertions
+        self.assertIn("user_token.token_hash", clause)
+        self.assertIn("user_token.issued_at", clause)
+
+    def test_session_partition_name(self):
+        self.assertEqual(session_partition_name(date(2026, 1, 5)), "user_token_p20260105")
+
+
+class TestCurrentPrincipal(unittest.TestCase):
+    def setUp(self):
+        self.principal = Principal(
+            id="user-1",
+            email="test@example.com",
+            name="Test User",
+            role_ids=(1,),
+            permission_ids=frozenset({3}),
+        )
+        self.app = FastAPI(exception_handlers=main.app.exception_handlers)
+
+        async def nested(principal: Principal = Depends(current_principal)):
+            return principal
+
+        @self.app.get("/whoami")
+        async def whoami(
+            principal: Principal = Depends(current_principal),
+            again: Principal = Depends(nested),
+        ):
+            return {"id": principal.id, "same": principal is again}
+
+        async def fake_db():
+            yield MagicMock()
+
+        @self.app.get("/users")
+        async def users(principal: Principal = Depends(require_permission("user", "view"))):
+            return {"id": principal.id}
+
+        self.app.dependency_overrides[get_db] = fake_db
+        self.client = TestClient(self.app)
+
+    @patch("core.security.get_principal_from_jwt_token", new_callable=AsyncMock)
+    def test_resolves_once_per_request(self, mock_get_principal):
+        # Setup mock
+        mock_get_principal.return_value = self.principal
+
+        # Call function
+        response = self.client.get("/whoami", headers={"Authorization": "Bearer token"})
+
+        # Assertions
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"id": "user-1", "same": True})
+        mock_get_principal.assert_called_once()
+
+    @patch("core.security.get_authorization_model", new_callable=AsyncMock)
+    @patch("core.security.get_principal_from_jwt_token", new_callable=AsyncMock)
+    def test_require_permission(self, mock_get_principal, mock_get_model):
+        # Setup mock, principal holds permission 3 = role/view only
+        mock_get_principal.return_value = self.principal
+        mock_get_model.return_value = compile_authorization_model([
+            (3, "view", "role", 1),
+            (4, "view", "user", 2),
+        ])
+        allowed = Principal(
+            id="user-2",
+            email="b@example.com",
+            name="B",
+            role_ids=(2,),
+            permission_ids=frozenset({4}),
+            permission_bits=1 << 4,
+        )
+
+        # Call function
+        denied_response = self.client.get("/users", headers={"Authorization": "Bearer token"})
+        mock_get_principal.return_value = allowed
+        allowed_response = self.client.get("/users", headers={"Authorization": "Bearer token"})
+
+        # Assertions
+        self.assertEqual(denied_response.status_code, 403)
+        self.assertEqual(allowed_response.status_code, 200)
+
+    @patch("core.security.get_principal_from_jwt_token", new_callable=AsyncMock)
+    def test_invalid_session_is_unauthorized(self, mock_get_principal):
+        # Setup mock
+        mock_get_principal.return_value = None
+
+        # Call function
+        response = self.client.get("/whoami", headers={"Authorization": "Bearer token"})
+
+        # Assertions
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json(), {"message": "Unauthorized"})
+
+
+class TestAuthorizationModel(unittest.TestCase):
+    def setUp(self):
+        # (permission_id, permission_name, module_name, role_id)
+        self.model = compile_authorization_model([
+            (1, "view", "user", 10),
+            (2, "edit", "user", 20),
+            (3, "view", "role", 10),
+            (4, "delete", "role", None),
+        ])
+
+    def test_bits_for_roles_is_or_of_role_bitsets(self):
+        self.assertEqual(self.model.bits_for_roles([10]), (1 << 1) | (1 << 3))
+        self.assertEqual(self.model.bits_for_roles([10, 20]), (1 << 1) | (1 << 2) | (1 << 3))
+        self.assertEqual(self.model.bits_for_roles([99]), 0)
+
+    def test_allows(self):
+        bits = self.model.bits_for_roles([10])
+        self.assertTrue(self.model.allows(bits, "user", "view"))
+        self.assertFalse(self.model.allows(bits, "user", "edit"))
+        self.assertFalse(self.model.allows(bits, "role", "delete"))
+        self.assertFalse(self.model.allows(bits, "unknown", "view"))
+
+    def test_module_bits(self):
+        bits = self.model.bits_for_roles([10, 20])
+        self.assertEqual(self.model.module_bits(bits, "role"), 1 << 3)
+
+
+class TestAuthorizationModelLifecycle(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        set_authorization_listening(False)
+
+    def tearDown(self):
+        set_authorization_listening(False)
+
+    @patch("core.authorization.load_authorization_model", new_callable=AsyncMock)
+    async def test_kept_while_listening(self, mock_load):
+        # Setup mock
+        mock_load.side_effect = lambda db: compile_authorization_model([])
+        set_authorization_listening(True)
+        mock_db = AsyncMock(spec=AsyncSession)
+
+        # Call function
+        first = await get_authorization_model(mock_db)
+        with patch("core.authorization.time.monotonic", return_value=authorization._loaded_at + 3600):
+            second = await get_authorization_model(mock_db)
+
+        # Assertions
+        self.assertIs(first, second)
+        mock_load.assert_called_once()
+
+    @patch("core.authorization.load_authorization_model", new_callable=AsyncMock)
+    async def test_expires_without_listener(self, mock_load):
+        # Setup mock
+        mock_load.side_effect = lambda db: compile_authorization_model([])
+        mock_db = AsyncMock(spec=AsyncSession)
+
+        # Call function
+        first = await get_authorization_model(mock_db)
+        self.assertIs(get_loaded_authorization_model(), first)
+        with patch("core.authorization.time.monotonic", return_value=authorization._loaded_at + 3600):
+            expired = get_loaded_authorization_model()
+            second = await get_authorization_model(mock_db)
+
+        # Assertions
+        self.assertIsNone(expired)
+        self.assertIsNot(first, second)
+        self.assertEqual(mock_load.call_count, 2)
+
+    @patch("core.authorization.load_authorization_model", new_callable=AsyncMock)
+    async def test_has_permission_loads_model_on_cold_worker(self, mock_load):
+        # Setup mock
+        mock_load.side_effect = lambda db: compile_authorization_model([(4, "view", "user", 2)])
+        principal = Principal(
+            id="user-2", email="b@example.com", name="B",
+            role_ids=(2,), permission_ids=frozenset({4}), permission_bits=1 << 4,
+        )
+
+        # Call function
+        allowed = await is_user_has_permission(AsyncMock(spec=AsyncSession), principal, "view", "user")
+        denied = await is_user_has_permission(AsyncMock(spec=AsyncSession), principal, "edit", "user")
+
+        # Assertions
+        self.assertTrue(allowed)
+        self.assertFalse(denied)
+        mock_load.assert_called_once()
+
+    @patch("core.authorization.load_authorization_model", new_callable=AsyncMock)
+    async def test_invalidation_during_load_is_not_kept(self, mock_load):
+        # Setup mock
+        def load(db):
+            invalidate_authorization_model()
+            return compile_authorization_model([])
+
+        mock_load.side_effect = load
+        set_authorization_listening(True)
+
+        # Call function
+        model = await get_authorization_model(AsyncMock(spec=AsyncSession))
+
+        # Assertions
+        self.assertIsNotNone(model)
+        self.assertIsNone(get_loaded_authorization_model())
+
+
+class TestMenuCache(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        set_menu_listening(False)
+
+    def tearDown(self):
+        set_menu_listening(False)
+
+    def test_short_ttl_without_listener(self):
+        # Setup cache
+        now = [1000.0]
+        with patch.object(menu_cache, "_clock", lambda: now[0]):
+            set_cached_menu((1,), b"menu", get_menu_generation())
+
+            # Call function
+            now[0] += 60
+            cached = get_cached_menu((1,))
+
+        # Assertions
+        self.assertIsNone(cached)
+
+    def test_full_ttl_while_listening(self):
+        # Setup cache
+        set_menu_listening(True)
+        now = [1000.0]
+        with patch.object(menu_cache, "_clock", lambda: now[0]):
+            set_cached_menu((1,), b"menu", get_menu_generation())
+
+            # Call function
+            now[0] += 60
+            cached = get_cached_menu((1,))
+
+        # Assertions
+        self.assertEqual(cached, b"menu")
+
+    def test_listener_state_change_clears_cache(self):
+        set_menu_listening(True)
+        set_cached_menu((1,), b"menu", get_menu_generation())
+        set_menu_listening(False)
+        self.assertIsNone(get_cached_menu((1,)))
+
+    def test_keyed_by_role_set(self):
+        body = render_menu_body([{"id": 1}])
+        set_cached_menu((2, 1), body, get_menu_generation())
+        self.assertEqual(get_cached_menu((1, 2)), body)
+        self.assertEqual(body, common_response(Ok(data={"results": [{"id": 1}]})).body)
+
+    def test_stale_build_is_not_cached(self):
+        generation = get_menu_generation()
+        invalidate_menu_cache()
+        set_cached_menu((1,), b"stale", generation)
+        self.assertIsNone(get_cached_menu((1,)))
+
+    async def test_warm_menu_cache(self):
+        # Setup mock
+        mock_db = AsyncMock(spec=AsyncSession)
+        menu_row = Mock(
+            id=1, parent_id=None, permission_id=5, is_has_child=False,
+            is_show=True, order_id=0, url="/", icon=None,
+        )
+        menu_row.name = "Home"
+        menu_result = MagicMock()
+        menu_result.all.return_value = [menu_row]
+        combination_result = MagicMock()
+        combination_result.all.return_value = [([1], [5]), ([2], [])]
+        mock_db.execute = AsyncMock(side_effect=[menu_result, combination_result])
+
+        # Call function
+        warmed = await warm_menu_cache(mock_db)
+
+        # Assertions
+        self.assertEqual(warmed, 2)
+        self.assertEqual(mock_db.execute.call_count, 2)
+        self.assertIn(b'"title":"Home"', get_cached_menu([1]))
+        self.assertIn(b'"results":[]', get_cached_menu([2]))
+
+
+class TestRuntimeStats(unittest.TestCase):
+    def test_format_stats(self):
+        line = format_stats("principal_cache", {"hits": 3, "misses": 1, "hit_ratio": 0.75, "ttl": 5})
+        self.assertEqual(line, "principal_cache hits=3 misses=1 hit_ratio=0.75")
+
+    @patch("core.metrics.logger")
+    def test_log_runtime_stats(self, mock_logger):
+        log_runtime_stats()
+        lines = [call.args[0] for call in mock_logger.info.call_args_list]
+        self.assertEqual(
+            [line.split()[1] for line in lines],
+            ["principal_cache", "password_hasher", "menu_cache", "stat_cache", "catalog"],
+        )
+        self.assertIn("saved_ms=", lines[0])
+
+
+class TestLoginOverloaded(unittest.TestCase):
+    def setUp(self):
+        async def fake_db():
+            yield MagicMock()
+
+        main.app.dependency_overrides[get_db] = fake_db
+        self.client = TestClient(main.app)
+
+    def tearDown(self):
+        main.app.dependency_overrides.pop(get_db, None)
+
+    @patch("repository.auth.check_user_password", new_callable=AsyncMock)
+    def test_full_hasher_is_503_with_retry_after(self, mock_check):
+        # Setup mock
+        mock_check.side_effect = ExecutorOverloaded("bcrypt executor is busy")
+
+        # Call function
+        login = self.client.post("/auth/login", json={"email": "a@x.id", "password": "secret"})
+        token = self.client.post("/auth/token", data={"username": "a@x.id", "password": "secret"})
+
+        # Assertions
+        for response in [login, token]:
+            self.assertEqual(response.status_code, 503)
+            self.assertEqual(response.headers["Retry-After"], "1")
+            self.assertEqual(response.json()["code"], 503)
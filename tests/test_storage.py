@@ -0,0 +1,552 @@
+import asyncio
+import hashlib
+import tempfile
+import time
+import unittest
+import zipfile
+from unittest.mock import MagicMock, patch
+import bcrypt
+from fastapi import FastAPI, UploadFile
+from fastapi.testclient import TestClient
+from minio import S3Error
+from core.cache import TTLCache
+from core import file as file_helper
+from core.file import parse_range, stream_file_response
+from core.storage import (
+    LocalStorage,
+    MemoryStorage,
+    MinioStorage,
+    StorageTimeout,
+    run_batch,
+    run_blocking,
+    set_storage,
+    sign_download,
+)
+from routes.file import router as file_router
+
+
+def s3_error(code: str) -> S3Error:
+    return S3Error(code, code, "/bucket/path", "req", "host", MagicMock())
+
+
+class FakeUpload:
+    """
+    async read(size) over bytes, like UploadFile
+    """
+
+    def __init__(self, data: bytes, content_type: str = "application/pdf"):
+        self.data = data
+        self.offset = 0
+        self.content_type = content_type
+        self.reads = []
+
+    async def read(self, size: int = -1) -> bytes:
+        end = len(self.data) if size < 0 else self.offset + size
+        chunk = self.data[self.offset:end]
+        self.offset += len(chunk)
+        self.reads.append(size)
+        return chunk
+
+
+def fake_put_object(bucket_name, object_name, data, length, part_size, **kwargs):
+    # reads the stream the way minio does for length=-1
+    parts = []
+    while True:
+        part = data.read(part_size + 1)
+        if not part:
+            break
+        parts.append(len(part))
+    result = MagicMock()
+    result.etag = "etag-1"
+    result.parts = parts
+    return result
+
+
+class TestMemoryStorage(unittest.IsolatedAsyncioTestCase):
+    async def test_put_get_move_delete(self):
+        storage = MemoryStorage()
+
+        await storage.put_bytes("data/a.txt", b"abc", content_type="text/plain")
+        await storage.move("data/a.txt", "data/b.txt")
+
+        self.assertIsNone(await storage.get_bytes("data/a.txt"))
+        self.assertEqual(await storage.get_bytes("data/b.txt"), b"abc")
+        self.assertEqual(await storage.list("data/"), ["data/b.txt"])
+        await storage.delete("data/b.txt")
+        self.assertFalse(await storage.exists("data/b.txt"))
+        with self.assertRaises(FileNotFoundError):
+            await storage.move("data/b.txt", "data/c.txt")
+
+
+    async def test_move_prefix(self):
+        storage = MemoryStorage()
+        for name in ["tmp/a.png", "tmp/sub/b.png", "tmpx/c.png"]:
+            await storage.put_bytes(name, b"1")
+
+        result = await storage.move_prefix("tmp/", "profile/")
+
+        self.assertEqual(sorted(result.done), ["tmp/a.png", "tmp/sub/b.png"])
+        self.assertEqual(
+            await storage.list(), ["profile/a.png", "profile/sub/b.png", "tmpx/c.png"]
+        )
+
+    async def test_move_many_keeps_sources_that_failed(self):
+        storage = MemoryStorage()
+        await storage.put_bytes("a", b"1")
+
+        result = await storage.move_many([("a", "b"), ("missing", "c")])
+
+        self.assertEqual(result.done, ["a"])
+        self.assertEqual(list(result.failed), ["missing"])
+        self.assertEqual(await storage.list(), ["b"])
+
+
+class TestRunBatch(unittest.IsolatedAsyncioTestCase):
+    async def test_bounded_concurrency(self):
+        running = 0
+        peak = 0
+
+        async def call():
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+        result = await run_batch([(str(i), call) for i in range(20)], concurrency=4)
+
+        self.assertEqual(len(result.done), 20)
+        self.assertEqual(peak, 4)
+
+
+class TestLocalStorage(unittest.IsolatedAsyncioTestCase):
+    async def test_roundtrip(self):
+        with tempfile.TemporaryDirectory() as folder:
+            storage = LocalStorage(folder=folder, base_url="http://api")
+
+            await storage.put_bytes("profile/x.png", b"png")
+            await storage.move("profile/x.png", "archive/x.png")
+
+            self.assertFalse(await storage.exists("profile/x.png"))
+            self.assertEqual(await storage.get_bytes("archive/x.png"), b"png")
+            self.assertEqual(await storage.list(), ["archive/x.png"])
+            url = await storage.url("archive/x.png")
+            self.assertTrue(url.startswith("http://api/minio/download/?minio_path=archive/x.png&"))
+            self.assertEqual(storage.local_file("archive/x.png"), f"{folder}/archive/x.png")
+
+    async def test_rejects_paths_outside_folder(self):
+        storage = LocalStorage(folder="/srv/storage")
+
+        with self.assertRaises(ValueError):
+            storage.full_path("../settings.py")
+        with self.assertRaises(ValueError):
+            storage.full_path("/etc/passwd")
+
+    async def test_open_range(self):
+        with tempfile.TemporaryDirectory() as folder:
+            storage = LocalStorage(folder=folder)
+            await storage.put_bytes("a.txt", b"0123456789")
+
+            chunks = await storage.open_range("a.txt", offset=2, length=5)
+
+            self.assertEqual(b"".join([x async for x in chunks]), b"23456")
+            info = await storage.stat("a.txt")
+            self.assertEqual((info.size, info.content_type), (10, "text/plain"))
+
+    async def test_copy(self):
+        with tempfile.TemporaryDirectory() as folder:
+            storage = LocalStorage(folder=folder)
+            await storage.put_bytes("a/x.txt", b"x")
+
+            await storage.copy("a/x.txt", "b/x.txt")
+
+            self.assertEqual(await storage.list(), ["a/x.txt", "b/x.txt"])
+            with self.assertRaises(FileNotFoundError):
+                await storage.copy("a/none.txt", "b/none.txt")
+
+    async def test_put_stream(self):
+        with tempfile.TemporaryDirectory() as folder:
+            storage = LocalStorage(folder=folder)
+            body = b"a" * (3 * 1024 * 1024 + 7)
+
+            result = await storage.put_stream("video/v.mp4", FakeUpload(body))
+
+            self.assertEqual(result.size, len(body))
+            self.assertEqual(result.sha256, hashlib.sha256(body).hexdigest())
+            self.assertEqual(await storage.get_bytes("video/v.mp4"), body)
+            self.assertEqual(await storage.list(), ["video/v.mp4"])
+
+
+class TestMinioStorage(unittest.IsolatedAsyncioTestCase):
+    async def test_missing_object(self):
+        # Setup mock
+        client = MagicMock()
+        client.stat_object.side_effect = s3_error("NoSuchKey")
+        client.get_object.side_effect = s3_error("NoSuchKey")
+        storage = MinioStorage(bucket="bucket", client=client)
+
+        # Call function / Assertions
+        self.assertFalse(await storage.exists("nope"))
+        self.assertIsNone(await storage.get_bytes("nope"))
+        client.stat_object.assert_called_once_with(bucket_name="bucket", object_name="nope")
+
+    async def test_other_errors_raise(self):
+        client = MagicMock()
+        client.stat_object.side_effect = s3_error("AccessDenied")
+        storage = MinioStorage(bucket="bucket", client=client)
+
+        with self.assertRaises(S3Error):
+            await storage.exists("secret")
+
+    async def test_get_bytes_releases_connection(self):
+        client = MagicMock()
+        response = client.get_object.return_value
+        response.read.return_value = b"body"
+        storage = MinioStorage(bucket="bucket", client=client)
+
+        self.assertEqual(await storage.get_bytes("a"), b"body")
+        response.close.assert_called_once()
+        response.release_conn.assert_called_once()
+
+    async def test_bucket_checked_once(self):
+        client = MagicMock()
+        client.bucket_exists.return_value = True
+        storage = MinioStorage(bucket="bucket", client=client)
+
+        await storage.put_bytes("a", b"1")
+        await storage.put_bytes("b", b"2")
+
+        client.bucket_exists.assert_called_once()
+        self.assertEqual(client.put_object.call_count, 2)
+
+    async def test_put_stream_multipart(self):
+        # Setup mock
+        client = MagicMock()
+        client.put_object.side_effect = fake_put_object
+        storage = MinioStorage(bucket="bucket", client=client, part_size=1024, parallel_uploads=4)
+        body = bytes(range(256)) * 20
+        upload = FakeUpload(body)
+
+        # Call function
+        result = await storage.put_stream("docs/a.pdf", upload, content_type="application/pdf")
+
+        # Assertions
+        self.assertEqual(result.size, len(body))
+        self.assertEqual(result.sha256, hashlib.sha256(body).hexdigest())
+        self.assertEqual(result.etag, "etag-1")
+        kwargs = client.put_object.call_args.kwargs
+        self.assertEqual(kwargs["length"], -1)
+        self.assertEqual(kwargs["part_size"], 1024)
+        self.assertEqual(kwargs["num_parallel_uploads"], 4)
+        # never more than one part read at a time
+        self.assertTrue(all(0 < size <= 1025 for size in upload.reads))
+
+    async def test_put_stream_timeout_cancels_reader(self):
+        client = MagicMock()
+        readers = []
+
+        def slow_put(data, **kwargs):
+            readers.append(data)
+            time.sleep(0.2)
+
+        client.put_object.side_effect = lambda **kwargs: slow_put(**kwargs)
+        storage = MinioStorage(bucket="bucket", client=client, transfer_timeout=0.05)
+
+        with self.assertRaises(StorageTimeout):
+            await storage.put_stream("a", FakeUpload(b"x"))
+        self.assertTrue(readers[0].cancelled)
+        with self.assertRaises(IOError):
+            readers[0].read(1)
+
+    async def test_server_side_move(self):
+        # Setup mock
+        client = MagicMock()
+        client.remove_objects.return_value = iter([])
+        storage = MinioStorage(bucket="bucket", client=client)
+
+        # Call function
+        await storage.move("tmp/a.png", "profile/a.png")
+
+        # Assertions
+        kwargs = client.copy_object.call_args.kwargs
+        self.assertEqual(kwargs["object_name"], "profile/a.png")
+        self.assertEqual(
+            (kwargs["source"].bucket_name, kwargs["source"].object_name), ("bucket", "tmp/a.png")
+        )
+        client.get_object.assert_not_called()
+        client.remove_object.assert_called_once_with(bucket_name="bucket", object_name="tmp/a.png")
+
+    async def test_delete_many_multi_delete(self):
+        client = MagicMock()
+        failed = MagicMock()
+        failed.name, failed.message = "b", "Access Denied"
+        client.remove_objects.return_value = iter([failed])
+        storage = MinioStorage(bucket="bucket", client=client)
+
+        result = await storage.delete_many(["a", "b", "c"])
+
+        self.assertEqual(result.done, ["a", "c"])
+        self.assertEqual(result.failed, {"b": "Access Denied"})
+        client.remove_objects.assert_called_once()
+        client.remove_object.assert_not_called()
+
+    async def test_stat_many_uses_head_only(self):
+        # Setup mock
+        client = MagicMock()
+
+        def stat_object(bucket_name, object_name):
+            if object_name == "gone.pdf":
+                raise s3_error("NoSuchKey")
+            obj = MagicMock()
+            obj.size, obj.etag, obj.content_type = 3, f"e-{object_name}", "application/pdf"
+            return obj
+
+        client.stat_object.side_effect = stat_object
+        storage = MinioStorage(bucket="bucket", client=client)
+
+        # Call function
+        infos = await storage.stat_many(["a.pdf", "gone.pdf", "a.pdf", "b.pdf"], cached=False)
+
+        # Assertions
+        self.assertEqual(list(infos), ["a.pdf", "gone.pdf", "b.pdf"])
+        self.assertIsNone(infos["gone.pdf"])
+        self.assertEqual((infos["b.pdf"].size, infos["b.pdf"].etag), (3, "e-b.pdf"))
+        self.assertEqual(client.stat_object.call_count, 3)
+        client.get_object.assert_not_called()
+
+    async def test_open_range_pins_etag_and_releases(self):
+        # Setup mock
+        client = MagicMock()
+        response = client.get_object.return_value
+        response.read.side_effect = [b"abc", b""]
+        storage = MinioStorage(bucket="bucket", client=client)
+
+        # Call function
+        chunks = await storage.open_range("v.mp4", offset=10, length=3, etag="e1")
+        body = b"".join([x async for x in chunks])
+
+        # Assertions
+        self.assertEqual(body, b"abc")
+        client.get_object.assert_called_once_with(
+            bucket_name="bucket",
+            object_name="v.mp4",
+            offset=10,
+            length=3,
+            request_headers={"If-Match": '"e1"'},
+        )
+        response.release_conn.assert_called_once()
+
+    async def test_calls_do_not_block_the_loop(self):
+        client = MagicMock()
+        client.stat_object.side_effect = lambda **kwargs: time.sleep(0.2) or MagicMock()
+        storage = MinioStorage(bucket="bucket", client=client)
+
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        await storage.exists("slow")
+        task.cancel()
+
+        self.assertGreater(ticks, 5)
+
+
+class TestRunBlocking(unittest.IsolatedAsyncioTestCase):
+    async def test_timeout(self):
+        with self.assertRaises(StorageTimeout):
+            await run_blocking(0.05, time.sleep, 0.3)
+
+
+class TestFileHelpers(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.storage = MemoryStorage()
+        set_storage(self.storage)
+
+    def tearDown(self):
+        set_storage(None)
+
+    async def test_upload_and_link(self):
+        upload = FakeUpload(b"img", content_type="image/png")
+
+        path = await file_helper.upload_file(upload, "profile/u.png")
+
+        self.assertEqual(path, "profile/u.png")
+        self.assertEqual(self.storage.objects["profile/u.png"], (b"img", "image/png"))
+        self.assertTrue(await file_helper.is_file_exists("profile/u.png"))
+        self.assertEqual(
+            await file_helper.generate_link_download("profile/u.png"), "memory://profile/u.png"
+        )
+        self.assertEqual(await file_helper.adapter_img_to_base_64("profile/u.png"), "aW1n")
+
+    async def test_upload_zip_streams_members(self):
+        # Setup upload, a spooled file like the one starlette hands over
+        spooled = tempfile.SpooledTemporaryFile()
+        with zipfile.ZipFile(spooled, "w") as archive:
+            archive.writestr("License (6).lic", b"lisensi-6")
+            archive.writestr("readme.txt", b"hello")
+        upload = UploadFile(file=spooled, filename="data.zip")
+
+        # Call function
+        with patch.object(upload, "read", side_effect=AssertionError("archive read whole")):
+            result = await file_helper.upload_zip(upload, "rafi")
+
+        # Assertions
+        self.assertEqual([x["file_name"] for x in result], ["License (6).lic", "readme.txt"])
+        self.assertEqual(result[0]["file_maping"], "6")
+        self.assertIsNone(result[1]["file_maping"])
+        self.assertEqual(self.storage.objects[result[0]["file_path"]][0], b"lisensi-6")
+        self.assertTrue(
+            bcrypt.checkpw(str(b"lisensi-6").encode(), result[0]["lisensi_hash"].encode())
+        )
+
+    async def test_link_download_swallows_errors(self):
+        with patch.object(self.storage, "url", side_effect=StorageTimeout("slow")):
+            self.assertIsNone(await file_helper.generate_link_download("x"))
+
+
+class TestParseRange(unittest.TestCase):
+    def test_ranges(self):
+        self.assertIsNone(parse_range(None, 100))
+        self.assertIsNone(parse_range("bytes=0-1,5-6", 100))
+        self.assertEqual(parse_range("bytes=10-", 100), (10, 99))
+        self.assertEqual(parse_range("bytes=10-19", 100), (10, 19))
+        self.assertEqual(parse_range("bytes=90-500", 100), (90, 99))
+        self.assertEqual(parse_range("bytes=-30", 100), (70, 99))
+        for header in ["bytes=100-", "bytes=5-2", "bytes=a-b", "bytes=-0"]:
+            with self.assertRaises(ValueError):
+                parse_range(header, 100)
+        for header in ["bytes=0-", "bytes=-5"]:
+            with self.assertRaises(ValueError):
+                parse_range(header, 0)
+
+
+class TestStreamFileResponse(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.storage = MemoryStorage()
+        await self.storage.put_bytes("doc/a.pdf", b"0123456789", content_type="application/pdf")
+        self.etag = (await self.storage.stat("doc/a.pdf")).etag
+
+    async def body(self, response):
+        return b"".join([x async for x in response.body_iterator])
+
+    async def test_full_and_partial(self):
+        full = await stream_file_response("doc/a.pdf", storage=self.storage)
+        partial = await stream_file_response(
+            "doc/a.pdf", headers={"range": "bytes=2-4"}, storage=self.storage
+        )
+
+        self.assertEqual(full.status_code, 200)
+        self.assertEqual(full.headers["content-length"], "10")
+        self.assertEqual(full.headers["etag"], f'"{self.etag}"')
+        self.assertEqual(full.media_type, "application/pdf")
+        self.assertEqual(await self.body(full), b"0123456789")
+        self.assertEqual(partial.status_code, 206)
+        self.assertEqual(partial.headers["content-range"], "bytes 2-4/10")
+        self.assertEqual(partial.headers["content-length"], "3")
+        self.assertEqual(await self.body(partial), b"234")
+
+    async def test_conditional(self):
+        not_modified = await stream_file_response(
+            "doc/a.pdf", headers={"if-none-match": f'"{self.etag}"'}, storage=self.storage
+        )
+        stale_if_range = await stream_file_response(
+            "doc/a.pdf", headers={"range": "bytes=2-4", "if-range": '"old"'}, storage=self.storage
+        )
+        unsatisfiable = await stream_file_response(
+            "doc/a.pdf", headers={"range": "bytes=50-"}, storage=self.storage
+        )
+        missing = await stream_file_response("doc/none.pdf", storage=self.storage)
+
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(stale_if_range.status_code, 200)
+        self.assertEqual(unsatisfiable.status_code, 416)
+        self.assertEqual(unsatisfiable.headers["content-range"], "bytes */10")
+        self.assertEqual(missing.status_code, 404)
+
+    async def test_suffix_range_of_empty_file(self):
+        await self.storage.put_bytes("doc/empty.txt", b"", content_type="text/plain")
+
+        response = await stream_file_response(
+            "doc/empty.txt", headers={"range": "bytes=-5"}, storage=self.storage
+        )
+
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response.headers["content-range"], "bytes */0")
+
+
+class TestDownloadRoute(unittest.TestCase):
+    def setUp(self):
+        self.storage = MemoryStorage()
+        asyncio.run(self.storage.put_bytes("v/clip.mp4", b"x" * 100, content_type="video/mp4"))
+        set_storage(self.storage)
+        app = FastAPI()
+        app.include_router(file_router, prefix="/minio")
+        self.client = TestClient(app)
+
+    def tearDown(self):
+        set_storage(None)
+
+    def test_signed_range_request(self):
+        expires = int(time.time()) + 60
+        params = {
+            "minio_path": "v/clip.mp4",
+            "expires": expires,
+            "signature": sign_download("v/clip.mp4", expires),
+        }
+
+        response = self.client.get("/minio/preview/", params=params, headers={"Range": "bytes=0-9"})
+        forged = self.client.get("/minio/download/", params={**params, "signature": "0" * 64})
+
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.content, b"x" * 10)
+        self.assertTrue(response.headers["content-disposition"].startswith("inline"))
+        self.assertEqual(forged.status_code, 401)
+
+
+class TestStatCache(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        patches = [
+            patch("core.storage.stat_cache", TTLCache(maxsize=100, ttl=5)),
+            patch("core.storage.STORAGE_STAT_CACHE_TTL", 5),
+            patch("core.storage.STORAGE_STAT_CACHE_NEGATIVE_TTL", 1),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+        self.storage = MemoryStorage()
+
+    async def test_positive_and_negative_entries(self):
+        with patch.object(self.storage, "load_stat", wraps=self.storage.load_stat) as load_stat:
+            self.assertFalse(await self.storage.exists("a"))
+            self.assertFalse(await self.storage.exists("a"))
+            await self.storage.put_bytes("a", b"1")
+            self.assertTrue(await self.storage.exists("a"))
+            self.assertTrue(await self.storage.exists("a"))
+            self.assertTrue(await self.storage.exists("a", cached=False))
+
+        self.assertEqual(load_stat.call_count, 3)
+
+    async def test_writes_forget(self):
+        await self.storage.put_bytes("a", b"1")
+        self.assertTrue(await self.storage.exists("a"))
+
+        await self.storage.move("a", "b")
+
+        self.assertFalse(await self.storage.exists("a"))
+        self.assertTrue(await self.storage.exists("b"))
+
+    async def test_stat_files(self):
+        set_storage(self.storage)
+        self.addCleanup(set_storage, None)
+        await self.storage.put_bytes("doc/a.pdf", b"123", content_type="application/pdf")
+
+        result = await file_helper.stat_files(["doc/a.pdf", "doc/b.pdf"])
+
+        self.assertEqual(result["doc/a.pdf"]["size"], 3)
+        self.assertEqual(result["doc/a.pdf"]["content_type"], "application/pdf")
+        self.assertIsNone(result["doc/b.pdf"])
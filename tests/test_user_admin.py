@@ -0,0 +1,202 @@
+import unittest
+from unittest.mock import AsyncMock, MagicMock, Mock, patch
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import AsyncSession
+from core.authorization import compile_authorization_model
+from core.principal import Principal
+from models import get_db
+import main
+from repository.user_admin import bulk_assign_role, bulk_set_active, bulk_update_fields
+from schemas.auth import BulkUserTarget
+
+
+def update_result(user_ids):
+    result = MagicMock()
+    result.scalars.return_value.all.return_value = user_ids
+    return result
+
+
+class TestUserAdmin(unittest.IsolatedAsyncioTestCase):
+    @patch("repository.user_admin.invalidate_cached_user")
+    async def test_deactivate_revokes_sessions(self, mock_invalidate):
+        # Setup mock
+        mock_db = AsyncMock(spec=AsyncSession)
+        revoke_result = MagicMock(rowcount=5)
+        mock_db.execute = AsyncMock(side_effect=[update_result(["u1", "u2"]), revoke_result])
+
+        # Call function
+        result = await bulk_set_active(
+            mock_db, BulkUserTarget(user_ids=["u1", "u2", "gone"]), isact=False, updated_by="admin"
+        )
+
+        # Assertions
+        self.assertEqual(result, {"updated": 2, "revoked_sessions": 5})
+        self.assertEqual(mock_db.execute.call_count, 2)
+        self.assertIn("UPDATE user_token", str(mock_db.execute.call_args_list[1].args[0]))
+        mock_db.commit.assert_called_once()
+        self.assertEqual(mock_invalidate.call_count, 2)
+
+    @patch("repository.user_admin.invalidate_cached_user")
+    @patch("repository.user_admin.refresh_effective_permissions", new_callable=AsyncMock)
+    @patch("repository.user_admin.get_catalog_rows", new_callable=AsyncMock)
+    async def test_assign_role(self, mock_catalog, mock_refresh, mock_invalidate):
+        # Setup mock
+        mock_catalog.return_value = [Mock(id=3, isact=True)]
+        mock_db = AsyncMock(spec=AsyncSession)
+        mock_db.execute = AsyncMock(side_effect=[
+            update_result(["u1", "u2"]), MagicMock(), MagicMock(), MagicMock(rowcount=1)
+        ])
+
+        # Call function
+        result = await bulk_assign_role(
+            mock_db, BulkUserTarget(src="budi"), role_id=3, updated_by="admin"
+        )
+
+        # Assertions
+        self.assertEqual(result, {"updated": 2, "revoked_sessions": 1})
+        delete_stmt = mock_db.execute.call_args_list[1].args[0]
+        self.assertIn("DELETE FROM user_role", str(delete_stmt))
+        self.assertEqual(
+            mock_db.execute.call_args_list[2].args[1],
+            [{"emp_id": "u1", "role_id": 3}, {"emp_id": "u2", "role_id": 3}],
+        )
+        mock_refresh.assert_awaited_once_with(mock_db, user_ids=["u1", "u2"])
+        mock_db.commit.assert_called_once()
+
+    @patch("repository.user_admin.get_catalog_rows", new_callable=AsyncMock)
+    async def test_assign_unknown_role(self, mock_catalog):
+        mock_catalog.return_value = [Mock(id=3, isact=True)]
+        mock_db = AsyncMock(spec=AsyncSession)
+        with self.assertRaises(ValueError):
+            await bulk_assign_role(mock_db, BulkUserTarget(user_ids=["u1"]), role_id=9, updated_by="admin")
+        mock_db.execute.assert_not_called()
+
+    async def test_empty_target_is_refused(self):
+        mock_db = AsyncMock(spec=AsyncSession)
+        with self.assertRaises(ValueError):
+            await bulk_set_active(mock_db, BulkUserTarget(), isact=False, updated_by="admin")
+        mock_db.commit.assert_not_called()
+
+    @patch("repository.user_admin.invalidate_cached_user")
+    async def test_update_fields_no_revoke(self, mock_invalidate):
+        # Setup mock
+        mock_db = AsyncMock(spec=AsyncSession)
+        mock_db.execute = AsyncMock(side_effect=[update_result(["u1"])])
+
+        # Call function
+        result = await bulk_update_fields(
+            mock_db,
+            BulkUserTarget(role_id=2),
+            fields={"address": "Jl. Baru", "phone": None, "name": "ignored"},
+            updated_by="admin",
+        )
+
+        # Assertions
+        self.assertEqual(result, {"updated": 1, "revoked_sessions": 0})
+        params = mock_db.execute.call_args.args[0].compile().params
+        self.assertEqual(params["address"], "Jl. Baru")
+        self.assertNotIn("name", params)
+
+
+class TestBulkUserRoutes(unittest.TestCase):
+    def setUp(self):
+        async def fake_db():
+            yield MagicMock()
+
+        main.app.dependency_overrides[get_db] = fake_db
+        self.client = TestClient(main.app)
+        # permission 1 = user/view, 2 = user/edit, 3 = user/delete, 4 = user/create
+        self.model = compile_authorization_model([
+            (1, "view", "user", 1),
+            (2, "edit", "user", 2),
+            (3, "delete", "user", 2),
+            (4, "create", "user", 2),
+        ])
+        self.viewer = Principal(
+            id="user-1", email="a@example.com", name="A",
+            role_ids=(1,), permission_ids=frozenset({1}), permission_bits=1 << 1,
+        )
+        self.admin = Principal(
+            id="admin-1", email="b@example.com", name="B",
+            role_ids=(2,), permission_ids=frozenset({2, 3, 4}),
+            permission_bits=(1 << 2) | (1 << 3) | (1 << 4),
+        )
+
+    def tearDown(self):
+        main.app.dependency_overrides.pop(get_db, None)
+
+    @patch("repository.user_admin.bulk_update_fields", new_callable=AsyncMock)
+    @patch("repository.user_admin.bulk_assign_role", new_callable=AsyncMock)
+    @patch("repository.user_admin.bulk_set_active", new_callable=AsyncMock)
+    @patch("core.security.get_authorization_model", new_callable=AsyncMock)
+    @patch("core.security.get_principal_from_jwt_token", new_callable=AsyncMock)
+    def test_requires_user_permission(
+        self, mock_get_principal, mock_get_model, mock_set_active, mock_assign, mock_update
+    ):
+        # Setup mock
+        mock_get_principal.return_value = self.viewer
+        mock_get_model.return_value = self.model
+        mock_set_active.return_value = {"updated": 1, "revoked_sessions": 0}
+        mock_assign.return_value = {"updated": 1}
+        mock_update.return_value = {"updated": 1}
+        target = {"target": {"src": "a"}}
+        requests = [
+            ("/auth/bulk-user/deactivate", target),
+            ("/auth/bulk-user/activate", target),
+            ("/auth/bulk-user/assign-role", {**target, "role_id": 2}),
+            ("/auth/bulk-user/update", {**target, "phone": "08123"}),
+        ]
+        headers = {"Authorization": "Bearer token"}
+
+        # Call function
+        denied = [self.client.put(url, json=body, headers=headers) for url, body in requests]
+        mock_get_principal.return_value = self.admin
+        allowed = [self.client.put(url, json=body, headers=headers) for url, body in requests]
+
+        # Assertions
+        self.assertEqual([x.status_code for x in denied], [403, 403, 403, 403])
+        self.assertEqual([x.status_code for x in allowed], [201, 201, 201, 201])
+        self.assertEqual(mock_set_active.call_count, 2)
+        mock_assign.assert_called_once()
+        mock_update.assert_called_once()
+
+    @patch("repository.user_bulk.import_users_from_xlsx", new_callable=AsyncMock)
+    @patch("core.security.get_authorization_model", new_callable=AsyncMock)
+    @patch("core.security.get_principal_from_jwt_token", new_callable=AsyncMock)
+    def test_import_requires_create_permission(self, mock_get_principal, mock_get_model, mock_import):
+        # Setup mock
+        mock_get_principal.return_value = self.viewer
+        mock_get_model.return_value = self.model
+        mock_import.return_value = {"total": 0, "created": 0, "failed": 0, "errors": []}
+        files = {"file": ("users.xlsx", b"xlsx", "application/octet-stream")}
+        headers = {"Authorization": "Bearer token"}
+
+        # Call function
+        denied = self.client.post("/auth/import-user", files=files, headers=headers)
+        mock_get_principal.return_value = self.admin
+        allowed = self.client.post("/auth/import-user", files=files, headers=headers)
+
+        # Assertions
+        self.assertEqual(denied.status_code, 403)
+        self.assertEqual(allowed.status_code, 201)
+        self.assertIs(mock_import.call_args.kwargs["granter"], self.admin)
+
+    @patch("repository.user_export.iter_users_csv")
+    @patch("core.security.get_authorization_model", new_callable=AsyncMock)
+    @patch("core.security.get_principal_from_jwt_token", new_callable=AsyncMock)
+    def test_export_requires_view_permission(self, mock_get_principal, mock_get_model, mock_iter_csv):
+        # Setup mock
+        mock_get_principal.return_value = self.admin
+        mock_get_model.return_value = self.model
+        mock_iter_csv.return_value = iter([b"id,email\r\n"])
+        headers = {"Authorization": "Bearer token"}
+
+        # Call function
+        denied = self.client.get("/auth/export-user", headers=headers)
+        mock_get_principal.return_value = self.viewer
+        allowed = self.client.get("/auth/export-user", headers=headers)
+
+        # Assertions
+        self.assertEqual(denied.status_code, 403)
+        self.assertEqual(allowed.status_code, 200)
+        self.assertEqual(allowed.content, b"id,email\r\n")
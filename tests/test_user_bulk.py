@@ -0,0 +1,186 @@
+import asyncio
+import unittest
+from io import BytesIO
+from unittest.mock import AsyncMock, MagicMock, Mock, patch
+import bcrypt
+from openpyxl import Workbook
+from sqlalchemy.ext.asyncio import AsyncSession
+from core.authorization import compile_authorization_model
+from core.executor import BoundedExecutor, ExecutorOverloaded
+from core.principal import Principal
+from repository.user_bulk import hash_passwords_parallel, import_users_from_xlsx, iter_xlsx_rows
+
+
+def make_xlsx(rows):
+    workbook = Workbook()
+    sheet = workbook.active
+    for row in rows:
+        sheet.append(row)
+    file = BytesIO()
+    workbook.save(file)
+    file.seek(0)
+    return file
+
+
+thread_hasher = BoundedExecutor(name="bcrypt-test", max_workers=2, max_pending=4)
+
+
+class TestUserBulkImport(unittest.IsolatedAsyncioTestCase):
+    def test_iter_xlsx_rows_requires_columns(self):
+        file = make_xlsx([["nama", "phone"], ["A", "1"]])
+        with self.assertRaises(ValueError):
+            list(iter_xlsx_rows(file))
+
+    def test_iter_xlsx_rows_skips_blank_rows(self):
+        file = make_xlsx([["Email", "Name", "Other"], ["a@x.id", "A", "z"], [None, None, None], ["b@x.id", "B"]])
+        rows = list(iter_xlsx_rows(file))
+        self.assertEqual(rows, [
+            (2, {"email": "a@x.id", "name": "A"}),
+            (4, {"email": "b@x.id", "name": "B"}),
+        ])
+
+    @patch("repository.user_bulk.bulk_password_hasher", thread_hasher)
+    async def test_hash_passwords_parallel_keeps_order(self):
+        hashed = await hash_passwords_parallel(["a", "b", "c"])
+        self.assertEqual(len(hashed), 3)
+        for password, hash in zip(["a", "b", "c"], hashed):
+            self.assertTrue(bcrypt.checkpw(password.encode(), hash.encode()))
+
+    @patch("repository.user_bulk.bulk_password_hasher", thread_hasher)
+    async def test_concurrent_imports_wait_for_the_hasher(self):
+        # Setup mock
+        passwords = ["a", "b", "c", "d"]
+
+        # Call function
+        with patch("repository.user_bulk.bulk_hash_slots", asyncio.Semaphore(2)):
+            results = await asyncio.gather(*[hash_passwords_parallel(passwords) for _ in range(4)])
+
+        # Assertions
+        self.assertEqual([len(x) for x in results], [4, 4, 4, 4])
+        self.assertLessEqual(thread_hasher.stats()["max_pending_seen"], thread_hasher.max_pending)
+
+    @patch("repository.user_bulk.refresh_effective_permissions", new_callable=AsyncMock)
+    @patch("repository.user_bulk.copy_users", new_callable=AsyncMock)
+    @patch("repository.user_bulk.hash_passwords_parallel", new_callable=AsyncMock)
+    @patch("repository.user_bulk.get_catalog_rows", new_callable=AsyncMock)
+    async def test_hash_failure_fails_only_that_chunk(self, mock_catalog, mock_hash, mock_copy, mock_refresh):
+        # Setup mock
+        mock_catalog.return_value = [Mock(id=1, isact=True)]
+        mock_hash.side_effect = [ExecutorOverloaded("busy"), ["hash:b"]]
+        mock_db = AsyncMock(spec=AsyncSession)
+        existing = MagicMock()
+        existing.scalars.return_value.all.return_value = []
+        mock_db.execute = AsyncMock(return_value=existing)
+        file = make_xlsx([["email", "name"], ["a@x.id", "A"], ["b@x.id", "B"]])
+
+        # Call function
+        report = await import_users_from_xlsx(mock_db, file, created_by="admin", chunk_size=1)
+
+        # Assertions
+        self.assertEqual(report["created"], 1)
+        self.assertEqual(report["failed"], 1)
+        self.assertEqual(report["errors"][0]["row"], 2)
+        self.assertEqual(mock_db.commit.call_count, 1)
+
+    @patch("repository.user_bulk.refresh_effective_permissions", new_callable=AsyncMock)
+    @patch("repository.user_bulk.copy_users", new_callable=AsyncMock)
+    @patch("repository.user_bulk.hash_passwords_parallel", new_callable=AsyncMock)
+    @patch("repository.user_bulk.get_catalog_rows", new_callable=AsyncMock)
+    async def test_import_reports_row_errors(self, mock_catalog, mock_hash, mock_copy, mock_refresh):
+        # Setup mock
+        mock_catalog.return_value = [Mock(id=1, isact=True), Mock(id=2, isact=False)]
+        mock_hash.side_effect = lambda passwords: [f"hash:{x}" for x in passwords]
+        mock_db = AsyncMock(spec=AsyncSession)
+        existing = MagicMock()
+        existing.scalars.return_value.all.return_value = ["old@x.id"]
+        mock_db.execute = AsyncMock(return_value=existing)
+        file = make_xlsx([
+            ["email", "name", "password", "role_id"],
+            ["new@x.id", "New", "secret", 1],
+            ["not-an-email", "Bad", None, None],
+            ["NEW@x.id", "Again", None, None],
+            ["old@x.id", "Old", None, None],
+            ["role@x.id", "Role", None, 2],
+            ["other@x.id", "Other", None, None],
+        ])
+
+        # Call function
+        report = await import_users_from_xlsx(mock_db, file, created_by="admin", chunk_size=4)
+
+        # Assertions
+        self.assertEqual(report["total"], 6)
+        self.assertEqual(report["created"], 2)
+        self.assertEqual(report["failed"], 4)
+        self.assertEqual(
+            [(x["row"], x["message"]) for x in report["errors"]],
+            [
+                (3, "Email tidak valid"),
+                (4, "Email duplikat di file"),
+                (5, "Email sudah terdaftar"),
+                (6, "Role 2 tidak ditemukan"),
+            ],
+        )
+        written = [row for call in mock_copy.call_args_list for row in call.args[1]]
+        self.assertEqual([x["email"] for x in written], ["new@x.id", "other@x.id"])
+        self.assertEqual(written[0]["password"], "hash:secret")
+        self.assertEqual(mock_db.commit.call_count, 2)
+
+    @patch("repository.user_bulk.refresh_effective_permissions", new_callable=AsyncMock)
+    @patch("repository.user_bulk.copy_users", new_callable=AsyncMock)
+    @patch("repository.user_bulk.hash_passwords_parallel", new_callable=AsyncMock)
+    @patch("repository.user_bulk.get_catalog_rows", new_callable=AsyncMock)
+    async def test_failed_chunk_is_reported(self, mock_catalog, mock_hash, mock_copy, mock_refresh):
+        # Setup mock
+        mock_catalog.return_value = [Mock(id=1, isact=True)]
+        mock_hash.side_effect = lambda passwords: passwords
+        mock_copy.side_effect = Exception("duplicate key")
+        mock_db = AsyncMock(spec=AsyncSession)
+        existing = MagicMock()
+        existing.scalars.return_value.all.return_value = []
+        mock_db.execute = AsyncMock(return_value=existing)
+        file = make_xlsx([["email", "name"], ["a@x.id", "A"], ["b@x.id", "B"]])
+
+        # Call function
+        report = await import_users_from_xlsx(mock_db, file, created_by="admin")
+
+        # Assertions
+        self.assertEqual(report["created"], 0)
+        self.assertEqual(report["failed"], 2)
+        mock_db.rollback.assert_called_once()
+        mock_db.commit.assert_not_called()
+
+    @patch("repository.user_bulk.get_authorization_model", new_callable=AsyncMock)
+    @patch("repository.user_bulk.refresh_effective_permissions", new_callable=AsyncMock)
+    @patch("repository.user_bulk.copy_users", new_callable=AsyncMock)
+    @patch("repository.user_bulk.hash_passwords_parallel", new_callable=AsyncMock)
+    @patch("repository.user_bulk.get_catalog_rows", new_callable=AsyncMock)
+    async def test_rows_cannot_grant_more_than_the_importer_holds(
+        self, mock_catalog, mock_hash, mock_copy, mock_refresh, mock_get_model
+    ):
+        # Setup mock, role 1 = user/view, role 9 = admin (user/view + user/delete)
+        mock_catalog.return_value = [Mock(id=1, isact=True), Mock(id=9, isact=True)]
+        mock_get_model.return_value = compile_authorization_model([
+            (1, "view", "user", 1),
+            (1, "view", "user", 9),
+            (2, "delete", "user", 9),
+        ])
+        mock_hash.side_effect = lambda passwords: passwords
+        mock_db = AsyncMock(spec=AsyncSession)
+        existing = MagicMock()
+        existing.scalars.return_value.all.return_value = []
+        mock_db.execute = AsyncMock(return_value=existing)
+        importer = Principal(
+            id="importer", email="i@x.id", name="I",
+            role_ids=(1,), permission_ids=frozenset({1}), permission_bits=1 << 1,
+        )
+        file = make_xlsx([["email", "name", "role_id"], ["a@x.id", "A", 1], ["b@x.id", "B", 9]])
+
+        # Call function
+        report = await import_users_from_xlsx(mock_db, file, created_by="importer", granter=importer)
+
+        # Assertions
+        self.assertEqual(report["created"], 1)
+        self.assertEqual(
+            [(x["row"], x["message"]) for x in report["errors"]],
+            [(3, "Role 9 tidak boleh diberikan")],
+        )
@@ -0,0 +1,38 @@
+import unittest
+from datetime import datetime
+from io import BytesIO
+from unittest.mock import patch
+from openpyxl import load_workbook
+from repository.user_export import iter_users_csv, iter_users_xlsx
+
+ROWS = [
+    [("1", "a@x.id", "A", "0811", "Jl. A", datetime(2024, 1, 1))],
+    [("2", "b@x.id", "B, Jr", "0812", "", datetime(2024, 1, 2))],
+]
+
+
+async def fake_stream(src=None, batch_size=None):
+    for rows in ROWS:
+        yield rows
+
+
+class TestUserExport(unittest.IsolatedAsyncioTestCase):
+    @patch("repository.user_export.stream_user_rows", fake_stream)
+    async def test_csv_chunk_per_batch(self):
+        chunks = [chunk async for chunk in iter_users_csv()]
+
+        self.assertEqual(len(chunks), 2)
+        text = b"".join(chunks).decode("utf-8-sig")
+        lines = text.splitlines()
+        self.assertEqual(lines[0], "id,email,name,phone,address,created_at")
+        self.assertEqual(lines[2], '2,b@x.id,"B, Jr",0812,,2024-01-02 00:00:00')
+
+    @patch("repository.user_export.stream_user_rows", fake_stream)
+    async def test_xlsx(self):
+        body = b"".join([chunk async for chunk in iter_users_xlsx()])
+
+        sheet = load_workbook(BytesIO(body), read_only=True).active
+        rows = list(sheet.iter_rows(values_only=True))
+        self.assertEqual(rows[0], ("id", "email", "name", "phone", "address", "created_at"))
+        self.assertEqual(rows[1][:3], ("1", "a@x.id", "A"))
+        self.assertEqual(len(rows), 3)